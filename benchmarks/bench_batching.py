@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from config import config
+from benchmarks.fakes import FakeBot, FakeChat, FakeContext, FakeLLMServer, FakeMessage, FakeUpdate, FakeUser, StubSearchService
+from benchmarks.loadtest import PLAIN_PROMPTS, SEARCH_PROMPTS, configure_bot, git_revision, percentiles
+
+
+class CallCounter:
+    def __init__(self):
+        self.calls = 0
+    
+    def wrap(self, owner, name: str) -> None:
+        original = getattr(owner, name)
+        
+        async def wrapper(*args, **kwargs):
+            self.calls += 1
+            return await original(*args, **kwargs)
+        
+        setattr(owner, name, wrapper)
+
+
+def build_schedule(args: argparse.Namespace, bot: FakeBot) -> list[tuple[float, FakeUpdate]]:
+    rng = random.Random(args.seed)
+    schedule = []
+    for burst in range(args.bursts):
+        burst_start = burst * args.burst_gap_ms / 1000
+        for group in range(args.groups):
+            chat = FakeChat(-1_000_000 - group, "supergroup")
+            for _ in range(args.burst_size):
+                user = FakeUser(rng.randint(1, args.users))
+                prompts = SEARCH_PROMPTS if rng.random() < args.search_ratio else PLAIN_PROMPTS
+                message = FakeMessage(
+                    f"@{FakeBot.username} {rng.choice(prompts)}", user, chat, send_latency_ms=args.send_latency_ms
+                )
+                offset = burst_start + rng.uniform(0, args.burst_spread_ms / 1000)
+                schedule.append((offset, FakeUpdate(message)))
+    schedule.sort(key=lambda item: item[0])
+    return schedule
+
+
+async def measure(window_ms: int, args: argparse.Namespace) -> dict:
+    llm = FakeLLMServer(latency_ms=args.llm_latency_ms, token_ms=args.llm_token_ms, completion_tokens=args.llm_tokens)
+    await llm.start()
+    
+    workdir = tempfile.mkdtemp(prefix=f"bench-batching-{window_ms}-")
+    configure_bot(os.path.join(workdir, "bot.db"), llm.base_url)
+    config.MENTION_BATCH_WINDOW_MS = window_ms
+    config.MENTION_BATCH_MAX_SIZE = args.max_batch
+    config.MENTION_BATCH_LLM_CONCURRENCY = args.llm_concurrency
+    config.CANCEL_SUPERSEDED = False
+    
+    from src.app import TelegramBot
+    
+    bot = TelegramBot()
+    search = StubSearchService(latency_ms=args.search_latency_ms)
+    bot.message_handler.search = search
+    bot.mention_batcher.search = search
+    await bot.database.connect()
+    
+    history_queries = CallCounter()
+    history_queries.wrap(bot.database, "get_conversation_history")
+    history_queries.wrap(bot.database, "get_conversation_histories")
+    
+    fake_bot = FakeBot(send_latency_ms=args.send_latency_ms)
+    schedule = build_schedule(args, fake_bot)
+    latencies: list[float] = []
+    errors = 0
+    start = time.perf_counter()
+    
+    async def deliver(offset: float, update: FakeUpdate) -> None:
+        nonlocal errors
+        await asyncio.sleep(max(0.0, start + offset - time.perf_counter()))
+        arrived = time.perf_counter()
+        try:
+            await bot.message_handler.handle_message(update, FakeContext(fake_bot))
+            await bot.send_scheduler.flush(update.effective_chat.id)
+            if not update.message.replies:
+                errors += 1
+        except Exception:
+            errors += 1
+        latencies.append((time.perf_counter() - arrived) * 1000)
+    
+    await asyncio.gather(*(deliver(offset, update) for offset, update in schedule))
+    elapsed = time.perf_counter() - start
+    
+    llm_stats = await llm.fetch_stats()
+    await bot.database.close()
+    await bot.ai_service.client.close()
+    await llm.stop()
+    
+    return {
+        "window_ms": window_ms,
+        "mentions": len(schedule),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(schedule) / elapsed, 2),
+        "latency_ms": percentiles(latencies),
+        "upstream": {
+            "llm_requests": llm_stats["requests"],
+            "search_calls": search.calls,
+            "history_queries": history_queries.calls
+        }
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    logging.disable(logging.WARNING)
+    results = [await measure(window_ms, args) for window_ms in (0, args.window_ms)]
+    return {
+        "benchmark": "batching",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "unbatched": results[0],
+        "batched": results[1]
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Group mention throughput with and without batching")
+    parser.add_argument("--window-ms", type=int, default=500)
+    parser.add_argument("--max-batch", type=int, default=10)
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--burst-size", type=int, default=10)
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--burst-spread-ms", type=float, default=1500.0)
+    parser.add_argument("--burst-gap-ms", type=float, default=5000.0)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--search-ratio", type=float, default=0.5)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-token-ms", type=float, default=0.5)
+    parser.add_argument("--llm-tokens", type=int, default=120)
+    parser.add_argument("--search-latency-ms", type=float, default=300.0)
+    parser.add_argument("--send-latency-ms", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
+
+
+if __name__ == "__main__":
+    main()
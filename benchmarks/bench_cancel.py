@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from config import config
+from benchmarks.fakes import FakeBot, FakeChat, FakeContext, FakeLLMServer, FakeMessage, FakeUpdate, FakeUser, StubSearchService
+from benchmarks.loadtest import PLAIN_PROMPTS, configure_bot, git_revision, percentiles
+
+
+def build_schedule(args: argparse.Namespace) -> list[tuple[float, FakeUpdate]]:
+    rng = random.Random(args.seed)
+    schedule = []
+    for conversation in range(args.conversations):
+        user = FakeUser(conversation + 1)
+        chat = FakeChat(-1_000_000 - conversation % args.groups, "supergroup")
+        offset = rng.uniform(0, args.duration_s)
+        for _ in range(args.followups + 1):
+            message = FakeMessage(f"@{FakeBot.username} {rng.choice(PLAIN_PROMPTS)}", user, chat, send_latency_ms=0)
+            schedule.append((offset, FakeUpdate(message)))
+            offset += rng.uniform(0, args.followup_gap_ms / 1000)
+    schedule.sort(key=lambda item: item[0])
+    return schedule
+
+
+async def measure(cancel: bool, args: argparse.Namespace) -> dict:
+    llm = FakeLLMServer(
+        latency_ms=args.llm_latency_ms, token_ms=args.llm_token_ms, completion_tokens=args.llm_tokens
+    )
+    await llm.start()
+    
+    workdir = tempfile.mkdtemp(prefix="bench-cancel-")
+    configure_bot(os.path.join(workdir, "bot.db"), llm.base_url)
+    config.CANCEL_SUPERSEDED = cancel
+    
+    from src.app import TelegramBot
+    
+    bot = TelegramBot()
+    bot.message_handler.search = StubSearchService(latency_ms=0)
+    await bot.database.connect()
+    
+    schedule = build_schedule(args)
+    latest: dict[int, FakeMessage] = {}
+    for _, update in schedule:
+        latest[update.effective_user.id] = update.message
+    
+    fake_bot = FakeBot(send_latency_ms=0)
+    final_latencies: list[float] = []
+    start = time.perf_counter()
+    
+    async def deliver(offset: float, update: FakeUpdate) -> None:
+        await asyncio.sleep(max(0.0, start + offset - time.perf_counter()))
+        arrived = time.perf_counter()
+        await bot.message_handler.handle_message(update, FakeContext(fake_bot))
+        await bot.send_scheduler.flush(update.effective_chat.id)
+        if latest[update.effective_user.id] is update.message:
+            final_latencies.append((time.perf_counter() - arrived) * 1000)
+    
+    await asyncio.gather(*(deliver(offset, update) for offset, update in schedule))
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(args.llm_latency_ms / 1000 + args.llm_tokens * args.llm_token_ms / 1000)
+    
+    stale = 0
+    for _, update in schedule:
+        message = update.message
+        if message.replies and latest[update.effective_user.id] is not message:
+            stale += 1
+    replies = sum(1 for _, update in schedule if update.message.replies)
+    
+    llm_stats = await llm.fetch_stats()
+    await bot.database.close()
+    await bot.ai_service.client.close()
+    await llm.stop()
+    
+    return {
+        "mode": "cancel" if cancel else "finish",
+        "messages": len(schedule),
+        "replies": replies,
+        "answers_to_earlier_messages": stale,
+        "elapsed_s": round(elapsed, 3),
+        "final_reply_latency_ms": percentiles(final_latencies),
+        "upstream": {
+            "llm_requests": llm_stats["requests"],
+            "llm_aborted": llm_stats["aborted"],
+            "completion_tokens_sent": llm_stats["tokens_sent"]
+        }
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    logging.disable(logging.WARNING)
+    return {
+        "benchmark": "cancel",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": [await measure(False, args), await measure(True, args)]
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Follow-up messages with and without cancelling superseded generations")
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--followups", type=int, default=2)
+    parser.add_argument("--followup-gap-ms", type=float, default=1500.0)
+    parser.add_argument("--duration-s", type=float, default=5.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0)
+    parser.add_argument("--llm-token-ms", type=float, default=5.0)
+    parser.add_argument("--llm-tokens", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
+
+
+if __name__ == "__main__":
+    main()
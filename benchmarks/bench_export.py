@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Optional
+
+from benchmarks.loadtest import git_revision, percentiles
+from src.database import Database
+from src.services import ExportService
+
+
+async def populate(database: Database, args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    now = int(time.time())
+    content = "mesaj içeriği " * (args.message_size // 14)
+    for offset in range(0, args.messages, 10000):
+        rows = [
+            (rng.randint(1, 1000), -rng.randint(1, 200), "user", content, 0, now - rng.randint(0, 86400 * 30))
+            for _ in range(min(10000, args.messages - offset))
+        ]
+        by_connection: dict[int, list[tuple]] = {}
+        for row in rows:
+            by_connection.setdefault(id(database._messages(row[1])), []).append(row)
+        for connection in database._message_connections():
+            await connection.executemany(
+                "INSERT INTO messages (user_id, chat_id, role, content, tokens_used, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                by_connection.get(id(connection), [])
+            )
+            await connection.commit()
+
+
+async def write_probe(database: Database, stop: asyncio.Event, latencies: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await database.add_message(1, -1, "user", "probe")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def measure(mode: str, database: Database, exporter: ExportService, args: argparse.Namespace) -> dict:
+    latencies: list[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(write_probe(database, stop, latencies))
+    tracemalloc.start()
+    start = time.perf_counter()
+    
+    if mode == "fetchall":
+        rows = 0
+        for connection in database._message_connections():
+            cursor = await connection.execute("SELECT * FROM messages")
+            rows += len([dict(row) for row in await cursor.fetchall()])
+        size = 0
+    else:
+        result = await exporter.export("messages", mode)
+        rows, size = result.rows, result.size
+        os.remove(result.path)
+    
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stop.set()
+    await probe
+    
+    return {
+        "mode": mode,
+        "rows": rows,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed),
+        "file_mb": round(size / 1024 / 1024, 2),
+        "peak_python_mb": round(peak / 1024 / 1024, 2),
+        "concurrent_write_ms": percentiles(latencies)
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    logging.disable(logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="bench-export-")
+    database = Database(os.path.join(workdir, "bot.db"), shards=args.shards)
+    await database.connect()
+    await populate(database, args)
+    exporter = ExportService(database, os.path.join(workdir, "exports"), batch_size=args.batch_size)
+    
+    try:
+        results = [await measure(mode, database, exporter, args) for mode in ("fetchall", "jsonl", "csv")]
+    finally:
+        await database.close()
+    
+    return {
+        "benchmark": "export",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Streaming export versus fetchall: memory and write latency")
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--message-size", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
+
+
+if __name__ == "__main__":
+    main()
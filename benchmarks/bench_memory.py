@@ -0,0 +1,92 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from typing import Optional
+
+from src.services.memory import ConversationIndex
+
+WORDS = (
+    "hava durumu istanbul ankara maç skor dolar euro altın borsa tarif yemek film dizi kitap "
+    "python kod hata sunucu veritabanı tatil uçak otel bilet fiyat telefon bilgisayar oyun "
+    "müzik konser doktor ilaç spor koşu antrenman proje toplantı rapor sınav ders okul"
+).split()
+
+
+def make_vocabulary(size: int) -> tuple[list[str], list[float]]:
+    words = WORDS + [f"kelime{i}" for i in range(max(0, size - len(WORDS)))]
+    return words, [1 / rank for rank in range(1, len(words) + 1)]
+
+
+def make_turn(rng: random.Random, vocabulary: tuple[list[str], list[float]], length: int) -> str:
+    words, weights = vocabulary
+    return " ".join(rng.choices(words, weights, k=length))
+
+
+def measure(turns: int, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(args.vocabulary)
+    texts = [make_turn(rng, vocabulary, rng.randint(5, args.turn_words)) for _ in range(turns)]
+    
+    start = time.perf_counter()
+    index = ConversationIndex()
+    for i, text in enumerate(texts):
+        index.add("user" if i % 2 == 0 else "assistant", text)
+    build_ms = (time.perf_counter() - start) * 1000
+    
+    timings = []
+    for _ in range(args.iterations):
+        query = make_turn(rng, vocabulary, args.query_words)
+        start = time.perf_counter()
+        index.search(query, args.top_k, args.exclude_recent)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    
+    return {
+        "turns": turns,
+        "build_ms": round(build_ms, 2),
+        "recall_p50_ms": round(timings[len(timings) // 2], 3),
+        "recall_p99_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 3),
+        "recall_max_ms": round(timings[-1], 3)
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    return {
+        "benchmark": "memory",
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": [measure(turns, args) for turns in args.turns]
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Relevance recall latency by conversation length")
+    parser.add_argument("--turns", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--turn-words", type=int, default=60)
+    parser.add_argument("--vocabulary", type=int, default=20000,
+                        help="Distinct words, drawn with Zipf frequencies like natural text")
+    parser.add_argument("--query-words", type=int, default=12)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--exclude-recent", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    report = run(args)
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import json
+import time
+
+from src.utils.metrics import MetricsRegistry
+
+
+def _bench(label: str, func, iterations: int) -> dict:
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter_ns() - start
+    return {"name": label, "iterations": iterations, "ns_per_op": round(elapsed / iterations, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Metrics recording overhead micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    args = parser.parse_args()
+    
+    registry = MetricsRegistry()
+    counter = registry.counter("bench_total", "bench counter")
+    labelled = registry.counter("bench_labelled_total", "bench counter", ("op",))
+    histogram = registry.histogram("bench_seconds", "bench histogram", ("op",))
+    child = histogram.labels("add_message")
+    
+    def noop():
+        pass
+    
+    def timer():
+        with child.time():
+            pass
+    
+    results = [
+        _bench("baseline_call", noop, args.iterations),
+        _bench("counter_inc", counter.inc, args.iterations),
+        _bench("counter_labels_inc", lambda: labelled.labels("add_message").inc(), args.iterations),
+        _bench("histogram_observe", lambda: child.observe(0.0042), args.iterations),
+        _bench("histogram_labels_observe", lambda: histogram.labels("add_message").observe(0.0042), args.iterations),
+        _bench("histogram_timer", timer, args.iterations),
+    ]
+    
+    start = time.perf_counter()
+    rendered = registry.render()
+    results.append({
+        "name": "render",
+        "iterations": 1,
+        "ms_per_op": round((time.perf_counter() - start) * 1000, 3),
+        "bytes": len(rendered)
+    })
+    
+    print(json.dumps({"benchmark": "metrics", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from typing import Optional
+
+from config import config
+from benchmarks.loadtest import PLAIN_PROMPTS, SEARCH_PROMPTS, git_revision, percentiles
+from src.services.prompt import PromptBuilder
+
+SEARCH_RESULTS = [
+    {"title": f"Sonuç {i}", "url": f"https://example.com/{i}", "content": "güncel içerik " * 40}
+    for i in range(5)
+]
+
+
+def measure(history_step: int, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    builder = PromptBuilder(config.SYSTEM_PROMPT, args.context_window, history_step)
+    histories: dict[int, list[dict]] = {user_id: [] for user_id in range(args.conversations)}
+    ratios: list[float] = []
+    prompt_messages: list[int] = []
+    build_ms: list[float] = []
+    reused = total = 0
+    
+    for _ in range(args.turns):
+        for user_id, history in histories.items():
+            searching = rng.random() < args.search_ratio
+            text = rng.choice(SEARCH_PROMPTS if searching else PLAIN_PROMPTS)
+            start = time.perf_counter()
+            prompt = builder.build(
+                text, history[-builder.history_limit:], SEARCH_RESULTS if searching else None,
+                conversation=(user_id, 0)
+            )
+            build_ms.append((time.perf_counter() - start) * 1000)
+            ratios.append(prompt.reuse_ratio)
+            prompt_messages.append(len(prompt.messages))
+            reused += prompt.reused_bytes
+            total += prompt.total_bytes
+            history.append({"role": "user", "content": text})
+            history.append({"role": "assistant", "content": "yanıt " * rng.randint(20, args.reply_words)})
+    
+    ratios.sort()
+    return {
+        "history_step": history_step,
+        "prompts": len(ratios),
+        "reused_bytes_ratio": round(reused / total, 3) if total else 0.0,
+        "reuse_ratio_p50": round(ratios[len(ratios) // 2], 3),
+        "reuse_ratio_p10": round(ratios[len(ratios) // 10], 3),
+        "avg_prompt_messages": round(sum(prompt_messages) / len(prompt_messages), 1),
+        "avg_prompt_kb": round(total / len(ratios) / 1024, 2),
+        "build_ms": percentiles(build_ms)
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    return {
+        "benchmark": "prompt",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": [measure(step, args) for step in args.history_steps]
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Prompt prefix reuse by history step")
+    parser.add_argument("--history-steps", type=int, nargs="+", default=[0, 10])
+    parser.add_argument("--context-window", type=int, default=20)
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--search-ratio", type=float, default=0.3)
+    parser.add_argument("--reply-words", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    report = run(args)
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
+
+
+if __name__ == "__main__":
+    main()
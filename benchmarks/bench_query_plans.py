@@ -0,0 +1,161 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import aiosqlite
+
+from src.database.migrations import LATEST_VERSION, continue_rebuilds, migrate
+
+QUERIES = {
+    "conversation_history": (
+        """SELECT role, content FROM messages WHERE user_id = ? AND chat_id = ?
+           ORDER BY created_at DESC LIMIT 20""",
+        """SELECT role, content FROM messages WHERE user_id = ? AND chat_id = ?
+           ORDER BY id DESC LIMIT 20""",
+        lambda rng, args: (rng.randint(1, args.users), -rng.randint(1, args.chats))
+    ),
+    "user_by_username": (
+        "SELECT * FROM users WHERE username = ?",
+        "SELECT * FROM users WHERE username = ? COLLATE NOCASE",
+        lambda rng, args: (f"user{rng.randint(1, args.users)}",)
+    ),
+    "oversized_conversations": (
+        """SELECT user_id, chat_id, COUNT(*) FROM messages
+           GROUP BY user_id, chat_id HAVING COUNT(*) > 100""",
+        """SELECT user_id, chat_id, COUNT(*) FROM messages
+           GROUP BY user_id, chat_id HAVING COUNT(*) > 100""",
+        lambda rng, args: ()
+    ),
+}
+
+
+async def populate(connection: aiosqlite.Connection, args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    start = datetime.now() - timedelta(days=60)
+    await connection.executemany(
+        "INSERT INTO users (user_id, username, first_name, last_name, created_at, updated_at) VALUES (?, ?, ?, '', ?, ?)",
+        [
+            (user_id, f"user{user_id}", f"User {user_id}", start.isoformat(), start.isoformat())
+            for user_id in range(1, args.users + 1)
+        ]
+    )
+    await connection.executemany(
+        "INSERT INTO stats (user_id, last_active) VALUES (?, ?)",
+        [(user_id, start.isoformat()) for user_id in range(1, args.users + 1)]
+    )
+    
+    step = timedelta(days=60) / args.messages
+    batch = []
+    for i in range(args.messages):
+        batch.append((
+            rng.randint(1, args.users),
+            -rng.randint(1, args.chats),
+            "user" if i % 2 == 0 else "assistant",
+            "x" * rng.randint(20, 400),
+            (start + step * i).isoformat()
+        ))
+        if len(batch) >= 10000:
+            await connection.executemany(
+                "INSERT INTO messages (user_id, chat_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)", batch
+            )
+            batch = []
+    if batch:
+        await connection.executemany(
+            "INSERT INTO messages (user_id, chat_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)", batch
+        )
+    await connection.commit()
+
+
+async def measure(connection: aiosqlite.Connection, args: argparse.Namespace, variant: int) -> dict:
+    results = {}
+    for name, (legacy_sql, current_sql, make_params) in QUERIES.items():
+        sql = legacy_sql if variant == 0 else current_sql
+        rng = random.Random(args.seed)
+        params = make_params(rng, args)
+        
+        cursor = await connection.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        plan = [row[3] for row in await cursor.fetchall()]
+        
+        timings = []
+        for _ in range(args.iterations):
+            params = make_params(rng, args)
+            start = time.perf_counter()
+            cursor = await connection.execute(sql, params)
+            await cursor.fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        
+        results[name] = {
+            "plan": plan,
+            "p50_ms": round(timings[len(timings) // 2], 3),
+            "p99_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 3)
+        }
+    return results
+
+
+async def run(args: argparse.Namespace) -> dict:
+    logging.disable(logging.WARNING)
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-plans-"), "bench.db")
+    connection = await aiosqlite.connect(path)
+    await migrate(connection, target=1)
+    await populate(connection, args)
+    before = await measure(connection, args, variant=0)
+    
+    start = time.perf_counter()
+    applied = await migrate(connection, batch_size=args.batch_size)
+    migration_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    while await continue_rebuilds(connection, args.batch_size):
+        pass
+    backfill_seconds = time.perf_counter() - start
+    after = await measure(connection, args, variant=1)
+    await connection.close()
+    
+    return {
+        "benchmark": "query_plans",
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "schema_version": LATEST_VERSION,
+        "migrations_applied": applied,
+        "migration_seconds": round(migration_seconds, 3),
+        "backfill_seconds": round(backfill_seconds, 3),
+        "before": before,
+        "after": after
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare query plans and latency before and after schema migrations")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--chats", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import sys
+import time
+from typing import Optional
+
+from benchmarks.loadtest import git_revision, percentiles
+from src.services import SearchService
+
+
+class SlowSearchService(SearchService):
+    def __init__(self, latencies_ms: dict[str, float], overlap: float, rng: random.Random, **kwargs):
+        super().__init__(**kwargs)
+        self.latencies_ms = latencies_ms
+        self.overlap = overlap
+        self.rng = rng
+    
+    async def _results(self, kind: str, query: str, max_results: int) -> list[dict]:
+        latency = self.latencies_ms[kind]
+        await asyncio.sleep(self.rng.uniform(latency * 0.8, latency * 1.2) / 1000)
+        results = []
+        for i in range(max_results):
+            shared = self.rng.random() < self.overlap
+            source = "shared" if shared else kind
+            results.append({
+                "title": f"{query} {source} headline number {i}",
+                "href": f"https://www.example.com/{source}/{i}/?utm_source={kind}",
+                "body": "snippet"
+            })
+        return results
+    
+    async def search_web(self, query: str, max_results: int = 5) -> list[dict]:
+        return await self._results("web", query, max_results)
+    
+    async def search_news(self, query: str, max_results: int = 5) -> list[dict]:
+        return await self._results("news", query, max_results)
+
+
+async def measure(name: str, news_ms: float, args: argparse.Namespace) -> dict:
+    service = SlowSearchService(
+        {"web": args.web_ms, "news": news_ms}, args.overlap, random.Random(args.seed),
+        branch_timeout=args.branch_timeout, max_queries=args.queries
+    )
+    queries = [f"query {i}" for i in range(args.queries)]
+    sequential, fanout, counts = [], [], []
+    
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        for query in queries:
+            await service._branch("web", query, 5)
+            await service._branch("news", query, 5)
+        sequential.append((time.perf_counter() - start) * 1000)
+        
+        start = time.perf_counter()
+        results = await service.search(queries, news=True)
+        fanout.append((time.perf_counter() - start) * 1000)
+        counts.append(len(results))
+    
+    return {
+        "scenario": name,
+        "news_ms": news_ms,
+        "sequential_ms": percentiles(sequential),
+        "fanout_ms": percentiles(fanout),
+        "avg_results": round(sum(counts) / len(counts), 2)
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    logging.disable(logging.WARNING)
+    return {
+        "benchmark": "search",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": [
+            await measure("all_branches_in_time", args.news_ms, args),
+            await measure("news_branch_times_out", args.branch_timeout * 1000 * 2, args)
+        ]
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Sequential versus parallel web and news search")
+    parser.add_argument("--web-ms", type=float, default=300.0)
+    parser.add_argument("--news-ms", type=float, default=450.0)
+    parser.add_argument("--branch-timeout", type=float, default=1.0)
+    parser.add_argument("--queries", type=int, default=2)
+    parser.add_argument("--overlap", type=float, default=0.3,
+                        help="Share of results that appear in both web and news")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import sys
+import time
+from typing import Optional
+
+from telegram.error import RetryAfter
+
+from benchmarks.fakes import FakeChat, FakeMessage, FakeUser
+from benchmarks.loadtest import git_revision, percentiles
+from src.utils.send_scheduler import SendScheduler
+
+
+class FloodingTelegram:
+    def __init__(self, flooded_chat: int, flood_seconds: int, send_latency_ms: float):
+        self.flooded_chat = flooded_chat
+        self.flood_seconds = flood_seconds
+        self.send_latency_ms = send_latency_ms
+        self.flood_until = 0.0
+        self.sent = 0
+        self.chat_actions = 0
+        self.retry_after = 0
+    
+    def wrap(self, message: FakeMessage) -> FakeMessage:
+        original = message.reply_text
+        
+        async def reply_text(text: str, **kwargs):
+            if message.chat.id == self.flooded_chat:
+                now = time.monotonic()
+                if not self.flood_until:
+                    self.flood_until = now + self.flood_seconds
+                if now < self.flood_until:
+                    self.retry_after += 1
+                    raise RetryAfter(max(1, round(self.flood_until - now)))
+            self.sent += 1
+            return await original(text, **kwargs)
+        
+        message.reply_text = reply_text
+        return message
+    
+    async def send_chat_action(self, chat_id: int, action: str, **kwargs) -> bool:
+        await asyncio.sleep(self.send_latency_ms / 1000)
+        self.chat_actions += 1
+        return True
+
+
+async def measure(scheduled: bool, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    flooded = -1_000_000
+    telegram = FloodingTelegram(flooded, args.flood_seconds, args.send_latency_ms)
+    scheduler = SendScheduler(
+        global_rate=args.global_rate, group_rate_per_minute=0, private_rate=0, max_retries=args.max_retries
+    )
+    chats = [FakeChat(flooded, "supergroup")] + [FakeChat(-1_000_001 - i, "supergroup") for i in range(args.chats - 1)]
+    latencies: dict[str, list[float]] = {"flooded": [], "others": []}
+    handler: dict[str, list[float]] = {"flooded": [], "others": []}
+    errors = {"flooded": 0, "others": 0}
+    start = time.perf_counter()
+    
+    async def deliver(offset: float, chat: FakeChat) -> None:
+        await asyncio.sleep(offset)
+        group = "flooded" if chat.id == flooded else "others"
+        message = telegram.wrap(FakeMessage("hi", FakeUser(1), chat, send_latency_ms=args.send_latency_ms))
+        sent = time.perf_counter()
+        if scheduled:
+            await scheduler.typing(telegram, chat.id, True)
+            delivery = scheduler.reply(message, "yanıt")
+            handler[group].append((time.perf_counter() - sent) * 1000)
+            if await delivery is None:
+                errors[group] += 1
+        else:
+            try:
+                await telegram.send_chat_action(chat_id=chat.id, action="typing")
+                await message.reply_text("yanıt")
+            except RetryAfter:
+                errors[group] += 1
+            handler[group].append((time.perf_counter() - sent) * 1000)
+        latencies[group].append((time.perf_counter() - sent) * 1000)
+    
+    await asyncio.gather(*(
+        deliver(rng.uniform(0, args.duration_s), rng.choice(chats)) for _ in range(args.messages)
+    ))
+    
+    return {
+        "mode": "scheduled" if scheduled else "direct",
+        "elapsed_s": round(time.perf_counter() - start, 3),
+        "delivered": telegram.sent,
+        "errors": errors,
+        "retry_after_responses": telegram.retry_after,
+        "chat_actions": telegram.chat_actions,
+        "flooded_latency_ms": percentiles(latencies["flooded"]),
+        "others_latency_ms": percentiles(latencies["others"]),
+        "flooded_handler_ms": percentiles(handler["flooded"]),
+        "others_handler_ms": percentiles(handler["others"])
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    logging.disable(logging.WARNING)
+    return {
+        "benchmark": "send",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": [await measure(False, args), await measure(True, args)]
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Outbound sends with one flooded group, direct versus scheduled")
+    parser.add_argument("--messages", type=int, default=400)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--duration-s", type=float, default=5.0)
+    parser.add_argument("--flood-seconds", type=int, default=3)
+    parser.add_argument("--global-rate", type=float, default=100.0)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--send-latency-ms", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
+
+
+if __name__ == "__main__":
+    main()
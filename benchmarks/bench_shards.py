@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from src.database import Database
+
+
+async def measure(shards: int, args: argparse.Namespace) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"bench-shards-{shards}-")
+    database = Database(os.path.join(workdir, "bot.db"), shards=shards)
+    await database.connect()
+    for connection in database.connections():
+        await connection.execute(f"PRAGMA synchronous = {args.synchronous}")
+    
+    rng = random.Random(args.seed)
+    content = "x" * args.message_size
+    writes = [(rng.randint(1, args.users), -rng.randint(1, args.chats)) for _ in range(args.writes)]
+    queue = iter(writes)
+    
+    async def writer() -> None:
+        for user_id, chat_id in queue:
+            await database.add_message(user_id, chat_id, "user", content)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(writer() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    
+    await database.close()
+    return {
+        "shards": shards,
+        "writes": args.writes,
+        "elapsed_s": round(elapsed, 3),
+        "writes_per_second": round(args.writes / elapsed, 1)
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    logging.disable(logging.WARNING)
+    results = [await measure(shards, args) for shards in args.shards]
+    baseline = results[0]["writes_per_second"]
+    for result in results:
+        result["speedup"] = round(result["writes_per_second"] / baseline, 2)
+    return {
+        "benchmark": "shards",
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Message write throughput by shard count")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--writes", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--message-size", type=int, default=300)
+    parser.add_argument("--synchronous", choices=("OFF", "NORMAL", "FULL"), default="FULL",
+                        help="SQLite synchronous level; FULL makes every commit wait for fsync")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
+
+
+if __name__ == "__main__":
+    main()
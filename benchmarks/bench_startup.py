@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+MODES = ("eager_cold", "lazy_cold", "lazy_warm")
+
+
+async def populate(path: str, args: argparse.Namespace) -> None:
+    from src.database import Database
+    
+    database = Database(path)
+    await database.connect()
+    now = int(time.time()) - args.conversations * args.turns
+    content = "önceki konuşmadan bir mesaj " * (args.message_size // 28)
+    rows = []
+    for conversation in range(args.conversations):
+        for turn in range(args.turns):
+            role = "user" if turn % 2 == 0 else "assistant"
+            rows.append((conversation + 1, -100 - conversation, role, f"{content} {turn}", 0, now + len(rows)))
+    connection = database._messages(-100)
+    await connection.executemany(
+        "INSERT INTO messages (user_id, chat_id, role, content, tokens_used, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        rows
+    )
+    await connection.commit()
+    await database.close()
+
+
+async def child(mode: str, args: argparse.Namespace) -> dict:
+    started = time.perf_counter()
+    if mode == "eager_cold":
+        import duckduckgo_search
+        import openai
+    from src.app import TelegramBot
+    imported = time.perf_counter() - started
+    
+    from benchmarks.fakes import FakeBot, FakeChat, FakeContext, FakeLLMServer, FakeMessage, FakeUpdate, FakeUser, StubSearchService
+    from benchmarks.loadtest import configure_bot
+    from config import config
+    
+    logging.disable(logging.WARNING)
+    llm = FakeLLMServer(
+        latency_ms=args.llm_latency_ms,
+        token_ms=0,
+        completion_tokens=20,
+        jitter=0,
+        connect_latency_ms=args.connect_latency_ms
+    )
+    await llm.start()
+    configure_bot(args.database, llm.base_url)
+    config.WARMUP_CONVERSATIONS = args.conversations
+    if mode == "eager_cold":
+        config.LLM_KEEPALIVE_SECONDS = 5
+    
+    bot = TelegramBot(started)
+    bot.message_handler.search = StubSearchService(latency_ms=0)
+    await bot.database.connect()
+    if mode == "lazy_warm":
+        await bot.warm_up()
+    else:
+        await bot.load_state()
+    ready = time.perf_counter() - started
+    
+    await asyncio.sleep(args.idle_s)
+    fake_bot = FakeBot(send_latency_ms=0)
+    latencies = []
+    first_update = int(time.time() * 1000)
+    for offset, user_id in enumerate((args.conversations, args.conversations - 1)):
+        chat = FakeChat(-100 - user_id + 1, "supergroup")
+        message = FakeMessage(f"@{FakeBot.username} bana kısa bir şiir yaz", FakeUser(user_id), chat, send_latency_ms=0)
+        start = time.perf_counter()
+        await bot.message_handler.handle_message(FakeUpdate(message, first_update + offset), FakeContext(fake_bot))
+        await bot.send_scheduler.flush(chat.id)
+        latencies.append((time.perf_counter() - start) * 1000)
+    
+    await bot.ai_service.client.close()
+    await bot.database.close()
+    await llm.stop()
+    return {
+        "import_s": imported,
+        "ready_s": ready,
+        "first_request_ms": latencies[0],
+        "second_request_ms": latencies[1],
+        "llm_connections": llm.connections,
+        "steps": bot.startup.steps
+    }
+
+
+def spawn(mode: str, args: argparse.Namespace) -> dict:
+    command = [
+        sys.executable, "-m", "benchmarks.bench_startup", "--child", mode, "--database", args.database,
+        "--conversations", str(args.conversations), "--llm-latency-ms", str(args.llm_latency_ms),
+        "--connect-latency-ms", str(args.connect_latency_ms), "--idle-s", str(args.idle_s)
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(mode: str, samples: list[dict]) -> dict:
+    def median(key: str, scale: float = 1.0) -> float:
+        return round(statistics.median(sample[key] for sample in samples) * scale, 1)
+    
+    return {
+        "mode": mode,
+        "runs": len(samples),
+        "import_ms": median("import_s", 1000),
+        "ready_ms": median("ready_s", 1000),
+        "first_request_ms": median("first_request_ms"),
+        "second_request_ms": median("second_request_ms"),
+        "llm_connections": max(sample["llm_connections"] for sample in samples),
+        "warm_up_steps_ms": {
+            step: round(statistics.median(sample["steps"].get(step, 0.0) for sample in samples) * 1000, 1)
+            for step in samples[0]["steps"] if step != "import"
+        }
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    from benchmarks.loadtest import git_revision
+    
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    args.database = os.path.join(workdir, "bot.db")
+    asyncio.run(populate(args.database, args))
+    
+    results = []
+    for mode in MODES:
+        samples = [spawn(mode, args) for _ in range(args.runs)]
+        results.append(summarize(mode, samples))
+    
+    return {
+        "benchmark": "startup",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "child", "database")},
+        "results": results
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cold start and first-request latency with eager imports, lazy imports and warm-up")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--message-size", type=int, default=200)
+    parser.add_argument("--llm-latency-ms", type=float, default=100.0)
+    parser.add_argument("--connect-latency-ms", type=float, default=150.0)
+    parser.add_argument("--idle-s", type=float, default=1.0)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.child:
+        sys.stdout.write(json.dumps(asyncio.run(child(args.child, args))) + "\n")
+        return
+    
+    report = run(args)
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
+
+
+if __name__ == "__main__":
+    main()
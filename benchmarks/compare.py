@@ -0,0 +1,81 @@
+import argparse
+import json
+import sys
+from typing import Optional
+
+HIGHER_IS_BETTER = {"throughput_rps"}
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def flatten(report: dict) -> dict[str, float]:
+    metrics: dict[str, float] = {}
+    if "throughput_rps" in report:
+        metrics["throughput_rps"] = report["throughput_rps"]
+    for key in ("p50", "p90", "p99"):
+        if key in report.get("latency_ms", {}):
+            metrics[f"latency_ms.{key}"] = report["latency_ms"][key]
+    for stage, values in report.get("stages_ms", {}).items():
+        for key in ("p50", "p99"):
+            if key in values:
+                metrics[f"stages_ms.{stage}.{key}"] = values[key]
+    if "commits_per_request" in report.get("db", {}):
+        metrics["db.commits_per_request"] = report["db"]["commits_per_request"]
+    if "traced_growth_kb" in report.get("memory", {}):
+        metrics["memory.traced_growth_kb"] = report["memory"]["traced_growth_kb"]
+    return metrics
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> tuple[list[list[str]], list[str]]:
+    base = flatten(baseline)
+    cand = flatten(candidate)
+    rows = []
+    regressions = []
+    for name in sorted(set(base) | set(cand)):
+        old = base.get(name)
+        new = cand.get(name)
+        if old is None or new is None:
+            rows.append([name, str(old), str(new), "n/a", ""])
+            continue
+        
+        change = (new - old) / old * 100 if old else 0.0
+        worse = change < -threshold if name in HIGHER_IS_BETTER else change > threshold
+        if worse and not name.startswith("memory."):
+            regressions.append(name)
+        rows.append([name, f"{old:g}", f"{new:g}", f"{change:+.1f}%", "REGRESSION" if worse else ""])
+    return rows, regressions
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark JSON reports")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed change in percent before flagging")
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    args = parser.parse_args(argv)
+    
+    baseline = load(args.baseline)
+    candidate = load(args.candidate)
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    
+    if args.json:
+        print(json.dumps({
+            "baseline": baseline.get("revision"),
+            "candidate": candidate.get("revision"),
+            "rows": [dict(zip(("metric", "baseline", "candidate", "change", "flag"), row)) for row in rows],
+            "regressions": regressions
+        }, indent=2))
+    else:
+        header = ["metric", baseline.get("revision") or "baseline", candidate.get("revision") or "candidate", "change", ""]
+        widths = [max(len(str(row[i])) for row in rows + [header]) for i in range(len(header))]
+        for row in [header] + rows:
+            print("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)).rstrip())
+    
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
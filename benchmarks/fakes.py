@@ -0,0 +1,377 @@
+import asyncio
+import itertools
+import json
+import multiprocessing
+import random
+import time
+import urllib.request
+from datetime import datetime, timezone
+from typing import Optional
+
+from src.services import SearchService
+
+
+class FakeLLMServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 200.0,
+        token_ms: float = 5.0,
+        completion_tokens: int = 120,
+        jitter: float = 0.2,
+        latency_samples: Optional[list[float]] = None,
+        connect_latency_ms: float = 0.0
+    ):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.token_ms = token_ms
+        self.completion_tokens = completion_tokens
+        self.jitter = jitter
+        self.latency_samples = latency_samples or []
+        self.connect_latency_ms = connect_latency_ms
+        self.connections = 0
+        self.aborted = 0
+        self.tokens_sent = 0
+        self.requests = 0
+        self.streams = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: set[asyncio.Task] = set()
+        self._ids = itertools.count(1)
+    
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+    
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+    
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            for task in list(self._handlers):
+                task.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+    
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "streams": self.streams,
+            "connections": self.connections,
+            "aborted": self.aborted,
+            "tokens_sent": self.tokens_sent
+        }
+    
+    async def fetch_stats(self) -> dict:
+        return self.stats()
+    
+    def _delay(self, base_ms: float) -> float:
+        spread = base_ms * self.jitter
+        return max(0.0, random.uniform(base_ms - spread, base_ms + spread)) / 1000
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        self.connections += 1
+        try:
+            if self.connect_latency_ms:
+                await asyncio.sleep(self.connect_latency_ms / 1000)
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                
+                length = int(headers.get("content-length", "0"))
+                body = json.loads(await reader.readexactly(length)) if length else {}
+                
+                if b"/chat/completions" in request_line:
+                    await self._completion(body, writer, reader)
+                elif b"/stats" in request_line:
+                    self._write_json(writer, 200, self.stats())
+                elif b"/models" in request_line:
+                    self._write_json(writer, 200, {
+                        "object": "list",
+                        "data": [{"id": "fake", "object": "model", "created": 0, "owned_by": "fake"}]
+                    })
+                else:
+                    self._write_json(writer, 404, {"error": {"message": "not found"}})
+                await writer.drain()
+                
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+    
+    def _write_json(self, writer: asyncio.StreamWriter, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data
+        )
+    
+    async def _completion(self, body: dict, writer: asyncio.StreamWriter, reader: asyncio.StreamReader) -> None:
+        self.requests += 1
+        completion_id = f"chatcmpl-{next(self._ids)}"
+        model = body.get("model", "fake")
+        max_tokens = body.get("max_tokens") or self.completion_tokens
+        tokens = min(self.completion_tokens, max_tokens)
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+        
+        if self.latency_samples:
+            await asyncio.sleep(random.choice(self.latency_samples) / 1000)
+        else:
+            await asyncio.sleep(self._delay(self.latency_ms))
+        
+        if not body.get("stream"):
+            await asyncio.sleep(self._delay(self.token_ms) * tokens)
+            if reader.at_eof():
+                self.aborted += 1
+                return
+            self.tokens_sent += tokens
+            self._write_json(writer, 200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(["lorem"] * tokens)},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": tokens,
+                    "total_tokens": prompt_tokens + tokens
+                }
+            })
+            return
+        
+        self.streams += 1
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        
+        def chunk(payload: str) -> bytes:
+            data = f"data: {payload}\n\n".encode("utf-8")
+            return f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n"
+        
+        for i in range(tokens):
+            if reader.at_eof():
+                self.aborted += 1
+                return
+            self.tokens_sent += 1
+            writer.write(chunk(json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": "lorem "}, "finish_reason": None}]
+            })))
+            await writer.drain()
+            await asyncio.sleep(self._delay(self.token_ms))
+        
+        writer.write(chunk(json.dumps({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        })))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            writer.write(chunk(json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": tokens,
+                    "total_tokens": prompt_tokens + tokens
+                }
+            })))
+        writer.write(chunk("[DONE]"))
+        writer.write(b"0\r\n\r\n")
+
+
+def _serve_llm(options: dict, ready: multiprocessing.Queue) -> None:
+    async def serve() -> None:
+        server = FakeLLMServer(**options)
+        await server.start()
+        ready.put(server.port)
+        await asyncio.Event().wait()
+    
+    asyncio.run(serve())
+
+
+class FakeLLMProcess:
+    def __init__(self, **options):
+        self.options = options
+        self.host = options.get("host", "127.0.0.1")
+        self.port = 0
+        self._process: Optional[multiprocessing.Process] = None
+    
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+    
+    async def start(self) -> None:
+        ctx = multiprocessing.get_context("spawn")
+        ready = ctx.Queue()
+        self._process = ctx.Process(target=_serve_llm, args=(self.options, ready), daemon=True)
+        self._process.start()
+        self.port = await asyncio.to_thread(ready.get, True, 30)
+    
+    def _read_stats(self) -> dict:
+        with urllib.request.urlopen(f"{self.base_url}/stats", timeout=5) as response:
+            return json.loads(response.read())
+    
+    async def fetch_stats(self) -> dict:
+        return await asyncio.to_thread(self._read_stats)
+    
+    async def stop(self) -> None:
+        if self._process:
+            self._process.terminate()
+            await asyncio.to_thread(self._process.join, 5)
+            self._process = None
+
+
+class StubSearchService(SearchService):
+    def __init__(
+        self,
+        latency_ms: float = 300.0,
+        results: int = 5,
+        jitter: float = 0.2,
+        latency_samples: Optional[list[float]] = None
+    ):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.results = results
+        self.jitter = jitter
+        self.latency_samples = latency_samples or []
+        self.calls = 0
+    
+    async def _fake_results(self, query: str, max_results: int, kind: str) -> list[dict]:
+        self.calls += 1
+        if self.latency_samples:
+            await asyncio.sleep(random.choice(self.latency_samples) / 1000)
+        else:
+            spread = self.latency_ms * self.jitter
+            await asyncio.sleep(max(0.0, random.uniform(self.latency_ms - spread, self.latency_ms + spread)) / 1000)
+        return [
+            {
+                "title": f"{kind} result {i} for {query[:30]}",
+                "href": f"https://example.com/{kind}/{abs(hash((query, i)))}",
+                "body": "Synthetic search snippet " * 4
+            }
+            for i in range(min(max_results, self.results))
+        ]
+    
+    async def search_web(self, query: str, max_results: int = 5) -> list[dict]:
+        return await self._fake_results(query, max_results, "web")
+    
+    async def search_news(self, query: str, max_results: int = 5) -> list[dict]:
+        return await self._fake_results(query, max_results, "news")
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.username = f"user{user_id}"
+        self.first_name = f"User {user_id}"
+        self.last_name = None
+        self.is_bot = False
+
+
+class FakeChat:
+    def __init__(self, chat_id: int, chat_type: str):
+        self.id = chat_id
+        self.type = chat_type
+
+
+class FakeMessage:
+    _ids = itertools.count(1)
+    
+    def __init__(
+        self,
+        text: str,
+        user: FakeUser,
+        chat: FakeChat,
+        reply_to_message: Optional["FakeMessage"] = None,
+        send_latency_ms: float = 30.0,
+        date: Optional[datetime] = None
+    ):
+        self.message_id = next(self._ids)
+        self.text = text
+        self.from_user = user
+        self.chat = chat
+        self.chat_id = chat.id
+        self.reply_to_message = reply_to_message
+        self.date = date or datetime.now(timezone.utc)
+        self.send_latency_ms = send_latency_ms
+        self.replies: list[str] = []
+    
+    async def reply_text(self, text: str, **kwargs) -> "FakeMessage":
+        await asyncio.sleep(self.send_latency_ms / 1000)
+        self.replies.append(text)
+        return FakeMessage(text, FakeUser(FakeBot.id), self.chat, send_latency_ms=self.send_latency_ms)
+    
+    async def reply_document(self, document, **kwargs) -> "FakeMessage":
+        await asyncio.sleep(self.send_latency_ms / 1000)
+        self.replies.append(f"<document {kwargs.get('filename', '')}>")
+        return FakeMessage("", FakeUser(FakeBot.id), self.chat, send_latency_ms=self.send_latency_ms)
+
+
+class FakeBot:
+    id = 1000
+    username = "loadtest_bot"
+    
+    def __init__(self, send_latency_ms: float = 30.0):
+        self.send_latency_ms = send_latency_ms
+        self.chat_actions = 0
+    
+    async def send_chat_action(self, chat_id: int, action: str, **kwargs) -> bool:
+        await asyncio.sleep(self.send_latency_ms / 1000)
+        self.chat_actions += 1
+        return True
+    
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> FakeMessage:
+        await asyncio.sleep(self.send_latency_ms / 1000)
+        return FakeMessage(text, FakeUser(self.id), FakeChat(chat_id, "private"), send_latency_ms=self.send_latency_ms)
+
+
+class FakeUpdate:
+    _ids = itertools.count(1)
+    
+    def __init__(self, message: FakeMessage, update_id: Optional[int] = None):
+        self.update_id = update_id if update_id is not None else next(self._ids)
+        self.message = message
+        self.effective_message = message
+        self.effective_user = message.from_user
+        self.effective_chat = message.chat
+        self.edited_message = None
+        self.callback_query = None
+        self.my_chat_member = None
+        self.chat_member = None
+
+
+class FakeContext:
+    def __init__(self, bot: FakeBot, args: Optional[list[str]] = None):
+        self.bot = bot
+        self.args = args or []
+        self.error = None
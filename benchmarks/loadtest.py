@@ -0,0 +1,255 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Optional
+
+from config import config
+from src.utils.tracing import configure_tracing, get_trace_buffer
+from benchmarks.fakes import (
+    FakeBot, FakeChat, FakeContext, FakeLLMProcess, FakeLLMServer, FakeMessage, FakeUpdate, FakeUser,
+    StubSearchService
+)
+
+SEARCH_PROMPTS = [
+    "bugün dolar kuru ne kadar?",
+    "latest news about the election?",
+    "what is the weather today in Istanbul?",
+]
+PLAIN_PROMPTS = [
+    "bana kısa bir şiir yaz",
+    "explain recursion like I'm five",
+    "merhaba, nasılsın",
+    "summarize the plot of Hamlet in three sentences",
+]
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+    
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 3)
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, timeout=5
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def configure_bot(database_path: str, llm_base_url: str) -> None:
+    config.DATABASE_PATH = database_path
+    config.LORA_BASE_URL = llm_base_url
+    config.LORA_API_KEY = config.LORA_API_KEY or "loadtest"
+    config.BOT_USERNAME = FakeBot.username
+    config.RATE_LIMIT_USER = 10 ** 9
+    config.RATE_LIMIT_GROUP = 10 ** 9
+    config.TOKEN_QUOTA_USER_MINUTE = 0
+    config.TOKEN_QUOTA_USER_DAY = 0
+    config.TOKEN_QUOTA_GROUP_MINUTE = 0
+    config.TOKEN_QUOTA_GROUP_DAY = 0
+    config.SEND_GLOBAL_RATE = 0
+    config.SEND_GROUP_RATE_PER_MINUTE = 0
+    config.SEND_PRIVATE_RATE = 0
+    config.METRICS_PORT = 0
+    config.LOG_ASYNC = False
+
+
+class CommitCounter:
+    def __init__(self):
+        self.commits = 0
+    
+    def attach(self, connection) -> None:
+        original = connection.commit
+        
+        async def commit():
+            self.commits += 1
+            return await original()
+        
+        connection.commit = commit
+
+
+def build_workload(args: argparse.Namespace, bot: FakeBot) -> list[FakeUpdate]:
+    rng = random.Random(args.seed)
+    updates = []
+    for _ in range(args.requests):
+        user = FakeUser(rng.randint(1, args.users))
+        if rng.random() < args.group_ratio:
+            chat = FakeChat(-1_000_000 - rng.randint(1, args.chats), "supergroup")
+        else:
+            chat = FakeChat(user.id, "private")
+        
+        prompts = SEARCH_PROMPTS if rng.random() < args.search_ratio else PLAIN_PROMPTS
+        text = rng.choice(prompts)
+        
+        if rng.random() < args.reply_ratio:
+            previous = FakeMessage("earlier answer", FakeUser(bot.id), chat, send_latency_ms=args.send_latency_ms)
+            message = FakeMessage(text, user, chat, reply_to_message=previous, send_latency_ms=args.send_latency_ms)
+        else:
+            message = FakeMessage(f"@{FakeBot.username} {text}", user, chat, send_latency_ms=args.send_latency_ms)
+        updates.append(FakeUpdate(message))
+    return updates
+
+
+async def run(args: argparse.Namespace) -> dict:
+    logging.disable(logging.WARNING)
+    
+    llm_class = FakeLLMServer if args.llm_in_process else FakeLLMProcess
+    llm = llm_class(
+        latency_ms=args.llm_latency_ms,
+        token_ms=args.llm_token_ms,
+        completion_tokens=args.llm_tokens
+    )
+    await llm.start()
+    
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    configure_bot(os.path.join(workdir, "bot.db"), llm.base_url)
+    configure_tracing(args.requests + 16)
+    
+    from src.app import TelegramBot
+    
+    bot = TelegramBot()
+    search = StubSearchService(latency_ms=args.search_latency_ms)
+    bot.message_handler.search = search
+    bot.command_handler.search = search
+    await bot.database.connect()
+    
+    commits = CommitCounter()
+    for connection in bot.database.connections():
+        commits.attach(connection)
+    
+    fake_bot = FakeBot(send_latency_ms=args.send_latency_ms)
+    updates = build_workload(args, fake_bot)
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+    
+    async def drive(update: FakeUpdate) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await bot.message_handler.handle_message(update, FakeContext(fake_bot))
+                await bot.send_scheduler.flush(update.effective_chat.id)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+    
+    warmup = updates[:args.warmup]
+    for update in warmup:
+        await drive(update)
+    latencies.clear()
+    commits.commits = 0
+    configure_tracing(args.requests + 16)
+    
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(drive(update) for update in updates[args.warmup:]))
+    elapsed = time.perf_counter() - start
+    
+    memory_after, memory_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    stage_samples: dict[str, list[float]] = {}
+    for trace in get_trace_buffer():
+        for name, duration in trace.span_durations().items():
+            stage_samples.setdefault(name, []).append(duration)
+    
+    measured = len(latencies)
+    llm_stats = await llm.fetch_stats()
+    await bot.database.close()
+    await bot.ai_service.client.close()
+    await llm.stop()
+    
+    return {
+        "benchmark": "loadtest",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {
+            key: value for key, value in vars(args).items()
+            if key not in ("output",)
+        },
+        "requests": measured,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(measured / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles(latencies),
+        "stages_ms": {name: percentiles(values) for name, values in sorted(stage_samples.items())},
+        "db": {
+            "commits": commits.commits,
+            "commits_per_request": round(commits.commits / measured, 2) if measured else 0.0
+        },
+        "upstream": {
+            "llm_requests": llm_stats["requests"],
+            "search_calls": search.calls
+        },
+        "memory": {
+            "traced_growth_kb": round((memory_after - memory_before) / 1024, 1),
+            "traced_peak_kb": round(memory_peak / 1024, 1),
+            "maxrss_growth_kb": rss_after - rss_before
+        }
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="End-to-end load test against fake Telegram, LLM and search backends")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--group-ratio", type=float, default=0.5)
+    parser.add_argument("--search-ratio", type=float, default=0.3)
+    parser.add_argument("--reply-ratio", type=float, default=0.3)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-token-ms", type=float, default=0.5)
+    parser.add_argument("--llm-tokens", type=int, default=120)
+    parser.add_argument("--llm-in-process", action="store_true", help="Run the fake LLM server on the benchmark's own event loop")
+    parser.add_argument("--search-latency-ms", type=float, default=300.0)
+    parser.add_argument("--send-latency-ms", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
+
+
+if __name__ == "__main__":
+    main()
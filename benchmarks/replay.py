@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from src.utils.tracing import configure_tracing, get_trace_buffer
+from src.utils.traffic_recorder import read_recording
+from benchmarks.fakes import (
+    FakeBot, FakeChat, FakeContext, FakeLLMProcess, FakeLLMServer, FakeMessage, FakeUpdate, FakeUser,
+    StubSearchService
+)
+from benchmarks.loadtest import CommitCounter, configure_bot, git_revision, percentiles
+
+FILLER = "lorem ipsum dolor sit amet consectetur adipiscing elit "
+SEARCH_PREFIX = "bugün "
+
+
+def load_records(paths: list[str], limit: Optional[int] = None) -> list[dict]:
+    records = []
+    for path in paths:
+        records.extend(read_recording(path))
+    records.sort(key=lambda record: record["ts"])
+    return records[:limit] if limit else records
+
+
+def synthesize_text(length: int, searched: bool) -> str:
+    prefix = SEARCH_PREFIX if searched else ""
+    length = max(length, len(prefix) + 1)
+    body = (FILLER * (length // len(FILLER) + 1))[:length - len(prefix)]
+    return prefix + body
+
+
+def upstream_samples(records: list[dict], *names: str) -> list[float]:
+    return [
+        record["upstream_ms"][name]
+        for record in records
+        for name in names
+        if name in record.get("upstream_ms", {})
+    ]
+
+
+class IdentityMap:
+    def __init__(self, start: int = 1):
+        self._ids: dict[str, int] = {}
+        self._next = start
+    
+    def get(self, key: Optional[str]) -> int:
+        key = key or ""
+        if key not in self._ids:
+            self._ids[key] = self._next
+            self._next += 1
+        return self._ids[key]
+
+
+def build_updates(records: list[dict], bot: FakeBot, send_latency_ms: float) -> list[tuple[float, FakeUpdate]]:
+    users = IdentityMap()
+    chats = IdentityMap()
+    origin = records[0]["ts"] if records else 0.0
+    timeline = []
+    for record in records:
+        user = FakeUser(users.get(record["user"]))
+        if record.get("chat_type") in ("group", "supergroup"):
+            chat = FakeChat(-1_000_000 - chats.get(record["chat"]), record["chat_type"])
+        else:
+            chat = FakeChat(user.id, "private")
+        
+        text = synthesize_text(record.get("length", 0), record.get("searched", False))
+        if record.get("is_reply"):
+            previous = FakeMessage("earlier answer", FakeUser(bot.id), chat, send_latency_ms=send_latency_ms)
+            message = FakeMessage(text, user, chat, reply_to_message=previous, send_latency_ms=send_latency_ms)
+        else:
+            message = FakeMessage(f"@{FakeBot.username} {text}", user, chat, send_latency_ms=send_latency_ms)
+        timeline.append((record["ts"] - origin, FakeUpdate(message)))
+    return timeline
+
+
+async def run(args: argparse.Namespace) -> dict:
+    logging.disable(logging.WARNING)
+    
+    records = load_records(args.recording, args.limit)
+    if not records:
+        raise SystemExit("Recording is empty")
+    
+    llm_class = FakeLLMServer if args.llm_in_process else FakeLLMProcess
+    llm = llm_class(
+        token_ms=0.0,
+        completion_tokens=args.llm_tokens,
+        latency_samples=upstream_samples(records, "llm", "extract_query") or None
+    )
+    await llm.start()
+    
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    configure_bot(os.path.join(workdir, "bot.db"), llm.base_url)
+    configure_tracing(len(records) + 16)
+    
+    from src.app import TelegramBot
+    
+    bot = TelegramBot()
+    search = StubSearchService(latency_samples=upstream_samples(records, "web_search") or None)
+    bot.message_handler.search = search
+    bot.command_handler.search = search
+    await bot.database.connect()
+    
+    commits = CommitCounter()
+    for connection in bot.database.connections():
+        commits.attach(connection)
+    
+    fake_bot = FakeBot(send_latency_ms=args.send_latency_ms)
+    timeline = build_updates(records, fake_bot, args.send_latency_ms)
+    latencies: list[float] = []
+    lateness: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency if args.speed <= 0 else len(timeline))
+    
+    async def drive(update: FakeUpdate) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await bot.message_handler.handle_message(update, FakeContext(fake_bot))
+                await bot.send_scheduler.flush(update.effective_chat.id)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+    
+    start = time.perf_counter()
+    tasks = []
+    for offset, update in timeline:
+        if args.speed > 0:
+            delay = offset / args.speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lateness.append(max(0.0, -delay) * 1000)
+        tasks.append(asyncio.create_task(drive(update)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    
+    stage_samples: dict[str, list[float]] = {}
+    for trace in get_trace_buffer():
+        for name, duration in trace.span_durations().items():
+            stage_samples.setdefault(name, []).append(duration)
+    
+    llm_stats = await llm.fetch_stats()
+    await bot.database.close()
+    await bot.ai_service.client.close()
+    await llm.stop()
+    
+    measured = len(latencies)
+    return {
+        "benchmark": "replay",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {
+            key: value for key, value in vars(args).items()
+            if key not in ("output",)
+        },
+        "requests": measured,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "recorded_span_s": round(timeline[-1][0], 3),
+        "throughput_rps": round(measured / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles(latencies),
+        "recorded_latency_ms": percentiles([record["duration_ms"] for record in records]),
+        "schedule_lateness_ms": percentiles(lateness),
+        "stages_ms": {name: percentiles(values) for name, values in sorted(stage_samples.items())},
+        "db": {
+            "commits": commits.commits,
+            "commits_per_request": round(commits.commits / measured, 2) if measured else 0.0
+        },
+        "upstream": {
+            "llm_requests": llm_stats["requests"],
+            "search_calls": search.calls
+        }
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay a recorded traffic file against fake backends")
+    parser.add_argument("recording", nargs="+", help="One or more traffic-*.jsonl.gz files")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time compression factor; 0 replays as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=50, help="In-flight cap when --speed is 0")
+    parser.add_argument("--limit", type=int, help="Replay only the first N records")
+    parser.add_argument("--llm-tokens", type=int, default=120)
+    parser.add_argument("--llm-in-process", action="store_true", help="Run the fake LLM server on the replay's own event loop")
+    parser.add_argument("--send-latency-ms", type=float, default=30.0)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    data = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
+
+
+if __name__ == "__main__":
+    main()
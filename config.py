@@ -20,13 +20,103 @@ class Config:
     RATE_LIMIT_GROUP: int = int(os.getenv("RATE_LIMIT_GROUP", "30"))
     RATE_LIMIT_WINDOW: int = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
     
+    TOKEN_QUOTA_USER_MINUTE: int = int(os.getenv("TOKEN_QUOTA_USER_MINUTE", "20000"))
+    TOKEN_QUOTA_USER_DAY: int = int(os.getenv("TOKEN_QUOTA_USER_DAY", "200000"))
+    TOKEN_QUOTA_GROUP_MINUTE: int = int(os.getenv("TOKEN_QUOTA_GROUP_MINUTE", "60000"))
+    TOKEN_QUOTA_GROUP_DAY: int = int(os.getenv("TOKEN_QUOTA_GROUP_DAY", "1000000"))
+    TOKEN_QUOTA_PERSIST_INTERVAL: int = int(os.getenv("TOKEN_QUOTA_PERSIST_INTERVAL", "60"))
+    
+    BAN_SNAPSHOT_PATH: str = os.getenv("BAN_SNAPSHOT_PATH", "")
+    BAN_SNAPSHOT_INTERVAL: int = int(os.getenv("BAN_SNAPSHOT_INTERVAL", "10"))
+    
+    SEND_GLOBAL_RATE: float = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+    SEND_GROUP_RATE_PER_MINUTE: float = float(os.getenv("SEND_GROUP_RATE_PER_MINUTE", "20"))
+    SEND_PRIVATE_RATE: float = float(os.getenv("SEND_PRIVATE_RATE", "1"))
+    SEND_CHAT_BURST: int = int(os.getenv("SEND_CHAT_BURST", "3"))
+    SEND_MAX_RETRIES: int = int(os.getenv("SEND_MAX_RETRIES", "3"))
+    SEND_QUEUE_SIZE: int = int(os.getenv("SEND_QUEUE_SIZE", "100"))
+    SEND_SHUTDOWN_TIMEOUT: float = float(os.getenv("SEND_SHUTDOWN_TIMEOUT", "5"))
+    
+    UPDATE_DEDUP_WINDOW: int = int(os.getenv("UPDATE_DEDUP_WINDOW", "1000"))
+    STALE_UPDATE_SECONDS: int = int(os.getenv("STALE_UPDATE_SECONDS", "0"))
+    STALE_UPDATE_NOTIFY: bool = os.getenv("STALE_UPDATE_NOTIFY", "false").lower() == "true"
+    
+    CONCURRENT_UPDATES: int = int(os.getenv("CONCURRENT_UPDATES", "1"))
+    CANCEL_SUPERSEDED: bool = (os.getenv("CANCEL_SUPERSEDED") or str(CONCURRENT_UPDATES > 1)).lower() == "true"
+    MENTION_BATCH_WINDOW_MS: int = int(os.getenv("MENTION_BATCH_WINDOW_MS", "0"))
+    MENTION_BATCH_MAX_SIZE: int = int(os.getenv("MENTION_BATCH_MAX_SIZE", "10"))
+    MENTION_BATCH_LLM_CONCURRENCY: int = int(os.getenv("MENTION_BATCH_LLM_CONCURRENCY", "8"))
+    
+    SEARCH_BRANCH_TIMEOUT: float = float(os.getenv("SEARCH_BRANCH_TIMEOUT", "4.0"))
+    SEARCH_NEWS_ENABLED: bool = os.getenv("SEARCH_NEWS_ENABLED", "true").lower() == "true"
+    SEARCH_MAX_QUERIES: int = int(os.getenv("SEARCH_MAX_QUERIES", "1"))
+    
+    REQUEST_DEADLINE: float = float(os.getenv("REQUEST_DEADLINE", "45"))
+    DEADLINE_LLM_RESERVE: float = float(os.getenv("DEADLINE_LLM_RESERVE", "15"))
+    DEADLINE_SEARCH_MIN: float = float(os.getenv("DEADLINE_SEARCH_MIN", "2"))
+    DEADLINE_TOKENS_PER_SECOND: float = float(os.getenv("DEADLINE_TOKENS_PER_SECOND", "100"))
+    
     CONTEXT_WINDOW_SIZE: int = int(os.getenv("CONTEXT_WINDOW_SIZE", "20"))
+    PROMPT_HISTORY_STEP: int = int(os.getenv("PROMPT_HISTORY_STEP", "10"))
+    PROMPT_CACHE_CONVERSATIONS: int = int(os.getenv("PROMPT_CACHE_CONVERSATIONS", "1000"))
+    MEMORY_TOP_K: int = int(os.getenv("MEMORY_TOP_K", "4"))
+    MEMORY_TOKEN_BUDGET: int = int(os.getenv("MEMORY_TOKEN_BUDGET", "600"))
+    MEMORY_MAX_CONVERSATIONS: int = int(os.getenv("MEMORY_MAX_CONVERSATIONS", "500"))
+    MEMORY_MAX_TURNS: int = int(os.getenv("MEMORY_MAX_TURNS", "5000"))
     MAX_TOKENS: int = int(os.getenv("MAX_TOKENS", "4096"))
     MODEL: str = os.getenv("MODEL", "gemini-2.5-pro")
+    LLM_KEEPALIVE_SECONDS: float = float(os.getenv("LLM_KEEPALIVE_SECONDS", "30"))
+    
+    WARMUP_TIMEOUT: float = float(os.getenv("WARMUP_TIMEOUT", "10"))
+    WARMUP_CONVERSATIONS: int = int(os.getenv("WARMUP_CONVERSATIONS", "100"))
     
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_ASYNC: bool = os.getenv("LOG_ASYNC", "true").lower() == "true"
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_BATCH_SIZE: int = int(os.getenv("LOG_BATCH_SIZE", "256"))
+    LOG_SAMPLE_RATES: dict[str, float] = {
+        action.strip(): float(rate)
+        for action, rate in (
+            item.split("=", 1) for item in os.getenv("LOG_SAMPLE_RATES", "").split(",") if "=" in item
+        )
+    }
+    
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "9464"))
+    
+    TRACE_BUFFER_SIZE: int = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+    
+    TRAFFIC_RECORD_DIR: str = os.getenv("TRAFFIC_RECORD_DIR", "")
+    TRAFFIC_RECORD_SALT: str = os.getenv("TRAFFIC_RECORD_SALT", "")
+    TRAFFIC_RECORD_SAMPLE_RATE: float = float(os.getenv("TRAFFIC_RECORD_SAMPLE_RATE", "1.0"))
+    TRAFFIC_RECORD_FLUSH_INTERVAL: int = int(os.getenv("TRAFFIC_RECORD_FLUSH_INTERVAL", "10"))
+    
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "data/profiles")
+    PROFILE_MAX_SECONDS: int = int(os.getenv("PROFILE_MAX_SECONDS", "60"))
+    
+    LOOP_MONITOR_ENABLED: bool = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+    LOOP_MONITOR_INTERVAL: float = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.25"))
+    LOOP_SLOW_CALLBACK_MS: int = int(os.getenv("LOOP_SLOW_CALLBACK_MS", "100"))
+    
+    RETENTION_MAX_MESSAGES: int = int(os.getenv("RETENTION_MAX_MESSAGES", "0"))
+    RETENTION_MAX_AGE_DAYS: int = int(os.getenv("RETENTION_MAX_AGE_DAYS", "0"))
+    RETENTION_INTERVAL: int = int(os.getenv("RETENTION_INTERVAL", "3600"))
+    RETENTION_BATCH_SIZE: int = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+    RETENTION_MAX_BATCHES: int = int(os.getenv("RETENTION_MAX_BATCHES", "200"))
+    RETENTION_ARCHIVE_DIR: str = os.getenv("RETENTION_ARCHIVE_DIR", "")
+    RETENTION_VACUUM_PAGES: int = int(os.getenv("RETENTION_VACUUM_PAGES", "2000"))
+    USAGE_HOURLY_RETENTION_DAYS: int = int(os.getenv("USAGE_HOURLY_RETENTION_DAYS", "30"))
+    
+    EXPORT_DIR: str = os.getenv("EXPORT_DIR", "data/exports")
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
     
     DATABASE_PATH: str = os.getenv("DATABASE_PATH", "data/bot.db")
+    DATABASE_SHARDS: int = int(os.getenv("DATABASE_SHARDS", "1"))
+    DATABASE_SHARD_DIR: str = os.getenv("DATABASE_SHARD_DIR", "")
+    MIGRATION_BATCH_SIZE: int = int(os.getenv("MIGRATION_BATCH_SIZE", "5000"))
+    MIGRATION_INTERVAL: int = int(os.getenv("MIGRATION_INTERVAL", "2"))
+    SEARCH_INDEX_BATCH_SIZE: int = int(os.getenv("SEARCH_INDEX_BATCH_SIZE", "2000"))
+    SEARCH_INDEX_INTERVAL: int = int(os.getenv("SEARCH_INDEX_INTERVAL", "5"))
     
     SYSTEM_PROMPT: str = """Sen yardımcı bir AI asistanısın. Şu an 2025 yılındayız.
 Kullanıcıların sorularına doğru, net ve yararlı yanıtlar veriyorsun.
@@ -0,0 +1,397 @@
+import asyncio
+import signal
+import sys
+import time
+from typing import Optional
+from telegram import Update
+from telegram.ext import (
+    Application,
+    CallbackQueryHandler,
+    CommandHandler as TelegramCommandHandler,
+    MessageHandler as TelegramMessageHandler,
+    TypeHandler,
+    filters
+)
+
+from config import config
+from src.database import Database
+from src.services import AIService, ConversationMemory, ExportService, MentionBatcher, PromptBuilder, SearchService, RetentionService
+from src.handlers import MessageHandler, CommandHandler, AdminHandler
+from src.utils import setup_logger, configure_logging, shutdown_logging, BanList, RateLimiter, SendScheduler, StartupTracker, TokenQuota, UpdateTracker, MetricsServer
+from src.utils.metrics import counter
+from src.utils.loop_monitor import LoopMonitor
+from src.utils.inflight import InFlightRegistry
+from src.utils.profiler import Profiler
+from src.utils.tracing import configure_tracing
+from src.utils.traffic_recorder import TrafficRecorder
+
+logger = setup_logger("bot", config.LOG_LEVEL)
+configure_logging(
+    async_mode=config.LOG_ASYNC,
+    queue_size=config.LOG_QUEUE_SIZE,
+    batch_size=config.LOG_BATCH_SIZE,
+    sample_rates=config.LOG_SAMPLE_RATES
+)
+configure_tracing(config.TRACE_BUFFER_SIZE)
+
+UPDATES_TOTAL = counter(
+    "bot_updates_total", "Telegram updates received", ("kind",)
+)
+UPDATE_KINDS = ("message", "edited_message", "callback_query", "my_chat_member", "chat_member")
+
+
+class TelegramBot:
+    def __init__(self, started: Optional[float] = None):
+        self.startup = StartupTracker(started if started is not None else time.perf_counter())
+        self.startup.mark("import")
+        
+        self.database = Database(
+            config.DATABASE_PATH,
+            migration_batch_size=config.MIGRATION_BATCH_SIZE,
+            shards=config.DATABASE_SHARDS,
+            shard_dir=config.DATABASE_SHARD_DIR,
+            update_window=config.UPDATE_DEDUP_WINDOW
+        )
+        self.rate_limiter = RateLimiter(
+            user_limit=config.RATE_LIMIT_USER,
+            group_limit=config.RATE_LIMIT_GROUP,
+            window_seconds=config.RATE_LIMIT_WINDOW
+        )
+        self.token_quota = TokenQuota(
+            user_minute=config.TOKEN_QUOTA_USER_MINUTE,
+            user_day=config.TOKEN_QUOTA_USER_DAY,
+            group_minute=config.TOKEN_QUOTA_GROUP_MINUTE,
+            group_day=config.TOKEN_QUOTA_GROUP_DAY
+        )
+        self.ban_list = BanList(config.BAN_SNAPSHOT_PATH)
+        
+        self.prompt_builder = PromptBuilder(
+            system_prompt=config.SYSTEM_PROMPT,
+            context_window=config.CONTEXT_WINDOW_SIZE,
+            history_step=config.PROMPT_HISTORY_STEP,
+            max_conversations=config.PROMPT_CACHE_CONVERSATIONS
+        )
+        
+        self.ai_service = AIService(
+            api_key=config.LORA_API_KEY,
+            base_url=config.LORA_BASE_URL,
+            model=config.MODEL,
+            max_tokens=config.MAX_TOKENS,
+            system_prompt=config.SYSTEM_PROMPT,
+            prompt_builder=self.prompt_builder,
+            tokens_per_second=config.DEADLINE_TOKENS_PER_SECOND,
+            keepalive_seconds=config.LLM_KEEPALIVE_SECONDS
+        )
+        
+        self.search_service = SearchService(
+            branch_timeout=config.SEARCH_BRANCH_TIMEOUT,
+            news_enabled=config.SEARCH_NEWS_ENABLED,
+            max_queries=config.SEARCH_MAX_QUERIES
+        )
+        self.loop_monitor = LoopMonitor(
+            interval=config.LOOP_MONITOR_INTERVAL,
+            slow_threshold=config.LOOP_SLOW_CALLBACK_MS / 1000
+        )
+        
+        self.memory = ConversationMemory(
+            database=self.database,
+            top_k=config.MEMORY_TOP_K,
+            token_budget=config.MEMORY_TOKEN_BUDGET,
+            max_conversations=config.MEMORY_MAX_CONVERSATIONS,
+            max_turns=config.MEMORY_MAX_TURNS
+        )
+        
+        self.mention_batcher = MentionBatcher(
+            ai_service=self.ai_service,
+            search_service=self.search_service,
+            database=self.database,
+            window_ms=config.MENTION_BATCH_WINDOW_MS,
+            max_batch=config.MENTION_BATCH_MAX_SIZE,
+            llm_concurrency=config.MENTION_BATCH_LLM_CONCURRENCY,
+            context_window=self.prompt_builder.history_limit,
+            deadline_llm_reserve=config.DEADLINE_LLM_RESERVE,
+            deadline_search_min=config.DEADLINE_SEARCH_MIN
+        )
+        
+        self.retention = RetentionService(
+            database=self.database,
+            max_messages=config.RETENTION_MAX_MESSAGES,
+            max_age_days=config.RETENTION_MAX_AGE_DAYS,
+            batch_size=config.RETENTION_BATCH_SIZE,
+            max_batches=config.RETENTION_MAX_BATCHES,
+            archive_dir=config.RETENTION_ARCHIVE_DIR,
+            vacuum_pages=config.RETENTION_VACUUM_PAGES,
+            usage_hourly_days=config.USAGE_HOURLY_RETENTION_DAYS,
+            memory=self.memory
+        )
+        
+        self.send_scheduler = SendScheduler(
+            global_rate=config.SEND_GLOBAL_RATE,
+            group_rate_per_minute=config.SEND_GROUP_RATE_PER_MINUTE,
+            private_rate=config.SEND_PRIVATE_RATE,
+            chat_burst=config.SEND_CHAT_BURST,
+            max_retries=config.SEND_MAX_RETRIES,
+            max_queue=config.SEND_QUEUE_SIZE
+        )
+        
+        self.update_tracker = UpdateTracker(
+            window=config.UPDATE_DEDUP_WINDOW,
+            stale_seconds=config.STALE_UPDATE_SECONDS,
+            stale_notify=config.STALE_UPDATE_NOTIFY
+        )
+        
+        self.inflight = InFlightRegistry(enabled=config.CANCEL_SUPERSEDED)
+        
+        self.message_handler = MessageHandler(
+            ai_service=self.ai_service,
+            search_service=self.search_service,
+            database=self.database,
+            rate_limiter=self.rate_limiter,
+            token_quota=self.token_quota,
+            ban_list=self.ban_list,
+            memory=self.memory,
+            batcher=self.mention_batcher,
+            sender=self.send_scheduler,
+            updates=self.update_tracker,
+            inflight=self.inflight,
+            bot_username=config.BOT_USERNAME,
+            context_window=self.prompt_builder.history_limit,
+            request_deadline=config.REQUEST_DEADLINE,
+            deadline_llm_reserve=config.DEADLINE_LLM_RESERVE,
+            deadline_search_min=config.DEADLINE_SEARCH_MIN,
+            startup=self.startup
+        )
+        
+        self.command_handler = CommandHandler(
+            search_service=self.search_service,
+            database=self.database,
+            rate_limiter=self.rate_limiter,
+            token_quota=self.token_quota,
+            ban_list=self.ban_list,
+            memory=self.memory,
+            inflight=self.inflight
+        )
+        
+        self.admin_handler = AdminHandler(
+            database=self.database,
+            rate_limiter=self.rate_limiter,
+            ban_list=self.ban_list,
+            admin_ids=config.ADMIN_USER_IDS,
+            profiler=Profiler(config.PROFILE_DIR, max_seconds=config.PROFILE_MAX_SECONDS),
+            loop_monitor=self.loop_monitor,
+            retention=self.retention,
+            exporter=ExportService(self.database, config.EXPORT_DIR, batch_size=config.EXPORT_BATCH_SIZE)
+        )
+        
+        self.metrics_server = MetricsServer(config.METRICS_HOST, config.METRICS_PORT)
+        self.traffic_recorder = TrafficRecorder(
+            config.TRAFFIC_RECORD_DIR,
+            salt=config.TRAFFIC_RECORD_SALT,
+            sample_rate=config.TRAFFIC_RECORD_SAMPLE_RATE
+        )
+        
+        self.app = None
+    
+    async def start(self) -> None:
+        logger.info_ctx("Starting bot...", action="bot_start")
+        
+        if config.METRICS_PORT:
+            await self.metrics_server.start()
+            logger.info_ctx(
+                "Metrics endpoint started",
+                action="metrics_start",
+                extra_data={"host": config.METRICS_HOST, "port": config.METRICS_PORT}
+            )
+        
+        await self.startup.step("database", self.database.connect())
+        logger.info_ctx("Database connected", action="db_connect")
+        
+        if config.CANCEL_SUPERSEDED and config.CONCURRENT_UPDATES <= 1:
+            logger.warning_ctx(
+                "CANCEL_SUPERSEDED has no effect while updates are processed one at a time",
+                action="config_warning",
+                extra_data={"concurrent_updates": config.CONCURRENT_UPDATES}
+            )
+        
+        self.app = (
+            Application.builder()
+            .token(config.TELEGRAM_BOT_TOKEN)
+            .concurrent_updates(config.CONCURRENT_UPDATES)
+            .build()
+        )
+        
+        self.app.add_handler(TypeHandler(Update, self.count_update), group=-1)
+        
+        self.app.add_handler(TelegramCommandHandler("start", self.command_handler.start))
+        self.app.add_handler(TelegramCommandHandler("help", self.command_handler.help))
+        self.app.add_handler(TelegramCommandHandler("search", self.command_handler.search))
+        self.app.add_handler(TelegramCommandHandler("clear", self.command_handler.clear))
+        self.app.add_handler(TelegramCommandHandler("history", self.command_handler.history))
+        self.app.add_handler(TelegramCommandHandler("stats", self.command_handler.stats))
+        
+        self.app.add_handler(TelegramCommandHandler("ban", self.admin_handler.ban))
+        self.app.add_handler(TelegramCommandHandler("unban", self.admin_handler.unban))
+        self.app.add_handler(TelegramCommandHandler("adminstats", self.admin_handler.admin_stats))
+        self.app.add_handler(TelegramCommandHandler("health", self.admin_handler.health))
+        self.app.add_handler(TelegramCommandHandler("repairstats", self.admin_handler.repair_stats))
+        self.app.add_handler(TelegramCommandHandler("usage", self.admin_handler.usage))
+        self.app.add_handler(TelegramCommandHandler("msearch", self.admin_handler.message_search))
+        self.app.add_handler(TelegramCommandHandler("reindex", self.admin_handler.reindex))
+        self.app.add_handler(TelegramCommandHandler("traces", self.admin_handler.traces))
+        self.app.add_handler(TelegramCommandHandler("profile", self.admin_handler.profile, block=False))
+        self.app.add_handler(TelegramCommandHandler("prune", self.admin_handler.prune, block=False))
+        self.app.add_handler(TelegramCommandHandler("export", self.admin_handler.export, block=False))
+        
+        self.app.add_handler(CallbackQueryHandler(self.command_handler.history_next, pattern="^history:"))
+        self.app.add_handler(CallbackQueryHandler(self.admin_handler.message_search_next, pattern="^msearch:"))
+        
+        self.app.add_handler(
+            TelegramMessageHandler(
+                filters.TEXT & ~filters.COMMAND,
+                self.message_handler.handle_message
+            )
+        )
+        
+        self.app.add_error_handler(self.error_handler)
+        
+        if self.token_quota.enabled:
+            self.app.job_queue.run_repeating(
+                self.persist_quotas,
+                interval=config.TOKEN_QUOTA_PERSIST_INTERVAL,
+                first=config.TOKEN_QUOTA_PERSIST_INTERVAL
+            )
+        
+        if self.retention.enabled:
+            self.app.job_queue.run_repeating(
+                self.retention.run,
+                interval=config.RETENTION_INTERVAL,
+                first=60
+            )
+        
+        if config.BAN_SNAPSHOT_PATH:
+            self.app.job_queue.run_repeating(
+                self.ban_list.refresh,
+                interval=config.BAN_SNAPSHOT_INTERVAL,
+                first=config.BAN_SNAPSHOT_INTERVAL
+            )
+        
+        if self.database.legacy_timestamps:
+            self.app.job_queue.run_repeating(
+                self.continue_migrations,
+                interval=config.MIGRATION_INTERVAL,
+                first=config.MIGRATION_INTERVAL
+            )
+        
+        self.app.job_queue.run_repeating(
+            self.backfill_search_index,
+            interval=config.SEARCH_INDEX_INTERVAL,
+            first=config.SEARCH_INDEX_INTERVAL
+        )
+        
+        if config.TRAFFIC_RECORD_DIR:
+            self.traffic_recorder.start()
+            self.app.job_queue.run_repeating(
+                self.traffic_recorder.flush,
+                interval=config.TRAFFIC_RECORD_FLUSH_INTERVAL,
+                first=config.TRAFFIC_RECORD_FLUSH_INTERVAL
+            )
+        
+        if config.LOOP_MONITOR_ENABLED:
+            await self.loop_monitor.start()
+        
+        await asyncio.gather(
+            self.startup.step("telegram", self.app.initialize()),
+            self.warm_up()
+        )
+        
+        await self.app.start()
+        await self.app.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+        self.startup.mark_ready()
+        self.metrics_server.ready = True
+        
+        stop_event = asyncio.Event()
+        
+        def signal_handler(*args):
+            stop_event.set()
+        
+        if sys.platform != "win32":
+            loop = asyncio.get_event_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, signal_handler)
+        else:
+            signal.signal(signal.SIGINT, signal_handler)
+        
+        await stop_event.wait()
+        await self.stop()
+    
+    async def warm_up(self) -> None:
+        await asyncio.gather(
+            self.startup.step("state", self.load_state()),
+            self.startup.step("llm", self.ai_service.warm_up(config.WARMUP_TIMEOUT)),
+            self.startup.step("search", self.search_service.warm_up()),
+            self.startup.step("sqlite", self.database.optimize()),
+            self.startup.step("conversations", self.preload_conversations())
+        )
+    
+    async def load_state(self) -> None:
+        await self.token_quota.restore(await self.database.load_quota_buckets())
+        await self.ban_list.publish(await self.database.get_banned_user_ids())
+        self.update_tracker.load(await self.database.get_processed_updates())
+    
+    async def preload_conversations(self) -> None:
+        conversations = await self.database.get_recent_conversations(config.WARMUP_CONVERSATIONS)
+        if self.memory.enabled:
+            await self.memory.preload(conversations)
+            return
+        for user_id, chat_id in conversations:
+            await self.database.get_conversation_history(user_id, chat_id, limit=self.prompt_builder.history_limit)
+    
+    async def stop(self) -> None:
+        logger.info_ctx("Stopping bot...", action="bot_stop")
+        
+        self.metrics_server.ready = False
+        if self.app:
+            await self.app.updater.stop()
+            await self.app.stop()
+            await self.send_scheduler.flush(timeout=config.SEND_SHUTDOWN_TIMEOUT)
+            await self.app.shutdown()
+        
+        await self.metrics_server.stop()
+        await self.loop_monitor.stop()
+        await self.traffic_recorder.stop()
+        await self.persist_quotas()
+        await self.database.close()
+        logger.info_ctx("Bot stopped", action="bot_stopped")
+        shutdown_logging()
+    
+    async def count_update(self, update: Update, context) -> None:
+        kind = next((k for k in UPDATE_KINDS if getattr(update, k, None) is not None), "other")
+        UPDATES_TOTAL.labels(kind).inc()
+    
+    async def persist_quotas(self, context=None) -> None:
+        rows = await self.token_quota.drain_dirty()
+        if rows:
+            await self.database.save_quota_buckets(rows)
+    
+    async def continue_migrations(self, context=None) -> None:
+        pending = await self.database.continue_migrations(config.MIGRATION_BATCH_SIZE)
+        if not pending and context is not None:
+            context.job.schedule_removal()
+            logger.info_ctx("Schema migration backfill finished", action="migration_backfill_done")
+    
+    async def backfill_search_index(self, context=None) -> None:
+        pending = await self.database.backfill_search_index(config.SEARCH_INDEX_BATCH_SIZE)
+        if pending:
+            logger.info_ctx(
+                "Search index backfill in progress",
+                action="search_index_backfill",
+                extra_data={"pending": pending}
+            )
+    
+    async def error_handler(self, update: Update, context) -> None:
+        logger.error_ctx(
+            f"Exception while handling an update: {context.error}",
+            action="error",
+            extra_data={"error": str(context.error)}
+        )
+
@@ -1,65 +1,177 @@
 import aiosqlite
+import asyncio
+import heapq
 import os
+import re
+import time
+import zlib
 from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional
+from src.utils.helpers import SNIPPET_START, SNIPPET_END
+from src.utils.metrics import histogram, timed
+from src.utils.update_tracker import REDELIVERY_SECONDS
+from .migrations import SHARD_MIGRATIONS, continue_rebuilds, epoch_sql, migrate, pending_rebuilds
 from .models import User, Message, Stats
 
+DB_QUERY_SECONDS = histogram(
+    "bot_db_query_seconds", "Database call latency in seconds", ("op",)
+)
+
+USAGE_GRANULARITIES = {"hour": ("usage_hourly", 3600), "day": ("usage_daily", 86400)}
+
+
+def build_match_query(text: str) -> str:
+    return " ".join(f'"{term}"' for term in re.findall(r"\w+", text))
+
+
+def to_datetime(value) -> datetime:
+    if isinstance(value, str) and not value.isdigit():
+        return datetime.fromisoformat(value)
+    return datetime.fromtimestamp(int(value))
+
 
 class Database:
-    def __init__(self, db_path: str):
+    def __init__(
+        self,
+        db_path: str,
+        migration_batch_size: int = 5000,
+        shards: int = 1,
+        shard_dir: str = "",
+        update_window: int = 1000
+    ):
         self.db_path = db_path
+        self.migration_batch_size = migration_batch_size
+        self.update_window = update_window
+        self.shard_count = max(1, shards)
+        self.shard_dir = shard_dir or os.path.join(os.path.dirname(db_path), "shards")
+        self.legacy_timestamps = False
         self._connection: Optional[aiosqlite.Connection] = None
+        self._shards: list[aiosqlite.Connection] = []
     
     async def connect(self) -> None:
-        db_dir = os.path.dirname(self.db_path)
-        if db_dir:
-            os.makedirs(db_dir, exist_ok=True)
-        self._connection = await aiosqlite.connect(self.db_path)
-        self._connection.row_factory = aiosqlite.Row
+        self._connection = await self._open(self.db_path)
         await self._create_tables()
+        
+        try:
+            await self._check_shard_layout()
+        except Exception:
+            await self.close()
+            raise
+        
+        if self.shard_count > 1:
+            try:
+                for index in range(self.shard_count):
+                    shard = await self._open(self._shard_path(index))
+                    self._shards.append(shard)
+                    await migrate(shard, self.migration_batch_size, migrations=SHARD_MIGRATIONS)
+                await self._move_central_messages()
+            except Exception:
+                await self.close()
+                raise
     
     async def close(self) -> None:
+        for shard in self._shards:
+            await shard.close()
+        self._shards = []
         if self._connection:
             await self._connection.close()
     
+    def connections(self) -> list[aiosqlite.Connection]:
+        central = [self._connection] if self._connection else []
+        return central + self._shards
+    
+    async def _open(self, path: str) -> aiosqlite.Connection:
+        db_dir = os.path.dirname(path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        connection = await aiosqlite.connect(path)
+        connection.row_factory = aiosqlite.Row
+        await connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        await connection.execute("PRAGMA journal_mode = WAL")
+        await connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
+    
+    async def _open_reader(self, path: str) -> aiosqlite.Connection:
+        connection = await aiosqlite.connect(f"file:{path}?mode=ro", uri=True)
+        connection.row_factory = aiosqlite.Row
+        return connection
+    
+    def _shard_path(self, index: int) -> str:
+        return os.path.join(self.shard_dir, f"messages-{index:02d}.db")
+    
     async def _create_tables(self) -> None:
-        await self._connection.executescript("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT NOT NULL,
-                last_name TEXT,
-                is_banned INTEGER DEFAULT 0,
-                is_whitelisted INTEGER DEFAULT 0,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            );
-            
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                chat_id INTEGER NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                tokens_used INTEGER DEFAULT 0,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            );
+        await migrate(self._connection, self.migration_batch_size)
+        await self.continue_migrations(self.migration_batch_size)
+        
+        cursor = await self._connection.execute("SELECT 1 FROM global_stats WHERE id = 1")
+        if not await cursor.fetchone():
+            await self.repair_global_stats()
+    
+    async def _check_shard_layout(self) -> None:
+        cursor = await self._connection.execute(
+            "SELECT value FROM storage_meta WHERE key = 'message_shards'"
+        )
+        row = await cursor.fetchone()
+        if row and int(row["value"]) != self.shard_count:
+            raise RuntimeError(
+                f"Database was sharded into {row['value']} files; "
+                f"changing DATABASE_SHARDS to {self.shard_count} is not supported"
+            )
+        if not row and self.shard_count > 1:
+            await self._connection.execute(
+                "INSERT INTO storage_meta (key, value) VALUES ('message_shards', ?)", (str(self.shard_count),)
+            )
+            await self._connection.commit()
+    
+    async def _move_central_messages(self) -> None:
+        while True:
+            cursor = await self._connection.execute(
+                f"""SELECT id, user_id, chat_id, role, content, tokens_used, {epoch_sql("created_at")} 
+                    FROM messages ORDER BY id LIMIT ?""",
+                (self.migration_batch_size,)
+            )
+            rows = await cursor.fetchall()
+            if not rows:
+                return
             
-            CREATE TABLE IF NOT EXISTS stats (
-                user_id INTEGER PRIMARY KEY,
-                total_messages INTEGER DEFAULT 0,
-                total_tokens INTEGER DEFAULT 0,
-                total_searches INTEGER DEFAULT 0,
-                last_active TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            );
+            by_shard: dict[int, list[tuple]] = {}
+            for row in rows:
+                by_shard.setdefault(self._shard_index(row["chat_id"]), []).append(tuple(row))
+            for index, batch in by_shard.items():
+                await self._shards[index].executemany(
+                    """INSERT OR IGNORE INTO messages 
+                       (id, user_id, chat_id, role, content, tokens_used, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    batch
+                )
+                await self._shards[index].commit()
             
-            CREATE INDEX IF NOT EXISTS idx_messages_user_chat ON messages (user_id, chat_id);
-            CREATE INDEX IF NOT EXISTS idx_messages_created ON messages (created_at);
-        """)
-        await self._connection.commit()
+            await self._connection.execute("DELETE FROM messages WHERE id <= ?", (rows[-1]["id"],))
+            await self._connection.commit()
+    
+    def _shard_index(self, chat_id: int) -> int:
+        if self.shard_count == 1:
+            return 0
+        return zlib.crc32(chat_id.to_bytes(8, "little", signed=True)) % self.shard_count
+    
+    def _messages(self, chat_id: int) -> aiosqlite.Connection:
+        return self._shards[self._shard_index(chat_id)] if self._shards else self._connection
+    
+    def _message_connections(self) -> list[aiosqlite.Connection]:
+        return self._shards or [self._connection]
+    
+    def _global_id(self, index: int, local_id: int) -> int:
+        return local_id * self.shard_count + index
+    
+    def _created_at(self, column: str = "created_at") -> str:
+        return epoch_sql(column) if self.legacy_timestamps and not self._shards else column
+    
+    @timed(DB_QUERY_SECONDS.labels("continue_migrations"))
+    async def continue_migrations(self, batch_size: int) -> int:
+        pending = await continue_rebuilds(self._connection, batch_size)
+        self.legacy_timestamps = bool(await pending_rebuilds(self._connection))
+        return pending
     
+    @timed(DB_QUERY_SECONDS.labels("get_or_create_user"))
     async def get_or_create_user(self, user_id: int, username: str, first_name: str, last_name: str) -> User:
         cursor = await self._connection.execute(
             "SELECT * FROM users WHERE user_id = ?", (user_id,)
@@ -69,7 +181,7 @@ class Database:
         if row:
             await self._connection.execute(
                 "UPDATE users SET username = ?, first_name = ?, last_name = ?, updated_at = ? WHERE user_id = ?",
-                (username, first_name, last_name, datetime.now().isoformat(), user_id)
+                (username, first_name, last_name, int(time.time()), user_id)
             )
             await self._connection.commit()
             return User(
@@ -79,19 +191,17 @@ class Database:
                 last_name=row["last_name"],
                 is_banned=bool(row["is_banned"]),
                 is_whitelisted=bool(row["is_whitelisted"]),
-                created_at=datetime.fromisoformat(row["created_at"]),
+                created_at=to_datetime(row["created_at"]),
                 updated_at=datetime.now()
             )
         
-        now = datetime.now().isoformat()
+        now = int(time.time())
         await self._connection.execute(
-            "INSERT INTO users (user_id, username, first_name, last_name, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            "INSERT OR IGNORE INTO users (user_id, username, first_name, last_name, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
             (user_id, username, first_name, last_name, now, now)
         )
-        await self._connection.commit()
-        
         await self._connection.execute(
-            "INSERT INTO stats (user_id, last_active) VALUES (?, ?)",
+            "INSERT OR IGNORE INTO stats (user_id, last_active) VALUES (?, ?)",
             (user_id, now)
         )
         await self._connection.commit()
@@ -103,6 +213,7 @@ class Database:
             last_name=last_name
         )
     
+    @timed(DB_QUERY_SECONDS.labels("is_user_banned"))
     async def is_user_banned(self, user_id: int) -> bool:
         cursor = await self._connection.execute(
             "SELECT is_banned FROM users WHERE user_id = ?", (user_id,)
@@ -110,47 +221,438 @@ class Database:
         row = await cursor.fetchone()
         return bool(row["is_banned"]) if row else False
     
+    @timed(DB_QUERY_SECONDS.labels("get_banned_user_ids"))
+    async def get_banned_user_ids(self) -> list[int]:
+        cursor = await self._connection.execute("SELECT user_id FROM users WHERE is_banned = 1")
+        rows = await cursor.fetchall()
+        return [row["user_id"] for row in rows]
+    
+    @timed(DB_QUERY_SECONDS.labels("ban_user"))
     async def ban_user(self, user_id: int) -> bool:
         result = await self._connection.execute(
             "UPDATE users SET is_banned = 1, updated_at = ? WHERE user_id = ?",
-            (datetime.now().isoformat(), user_id)
+            (int(time.time()), user_id)
         )
         await self._connection.commit()
         return result.rowcount > 0
     
+    @timed(DB_QUERY_SECONDS.labels("unban_user"))
     async def unban_user(self, user_id: int) -> bool:
         result = await self._connection.execute(
             "UPDATE users SET is_banned = 0, updated_at = ? WHERE user_id = ?",
-            (datetime.now().isoformat(), user_id)
+            (int(time.time()), user_id)
         )
         await self._connection.commit()
         return result.rowcount > 0
     
+    @timed(DB_QUERY_SECONDS.labels("add_message"))
     async def add_message(self, user_id: int, chat_id: int, role: str, content: str, tokens_used: int = 0) -> None:
-        await self._connection.execute(
+        connection = self._messages(chat_id)
+        await connection.execute(
             "INSERT INTO messages (user_id, chat_id, role, content, tokens_used, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-            (user_id, chat_id, role, content, tokens_used, datetime.now().isoformat())
+            (user_id, chat_id, role, content, tokens_used, int(time.time()))
         )
-        await self._connection.commit()
+        await connection.commit()
     
-    async def get_conversation_history(self, user_id: int, chat_id: int, limit: int = 20) -> list[dict]:
+    @timed(DB_QUERY_SECONDS.labels("add_exchange"))
+    async def add_exchange(
+        self,
+        user_id: int,
+        chat_id: int,
+        user_message: str,
+        response: str,
+        tokens_used: int = 0,
+        update_id: Optional[int] = None
+    ) -> None:
+        connection = self._messages(chat_id)
+        now = int(time.time())
+        await connection.executemany(
+            "INSERT INTO messages (user_id, chat_id, role, content, tokens_used, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (user_id, chat_id, "user", user_message, 0, now),
+                (user_id, chat_id, "assistant", response, tokens_used, now)
+            ]
+        )
+        if update_id is not None and connection is self._connection:
+            await self._mark_update(update_id, now)
+        await connection.commit()
+        
+        if update_id is not None and connection is not self._connection:
+            await self._mark_update(update_id, now)
+            await self._connection.commit()
+    
+    async def _mark_update(self, update_id: int, processed_at: int) -> None:
+        await self._connection.execute(
+            "INSERT OR IGNORE INTO processed_updates (update_id, processed_at) VALUES (?, ?)",
+            (update_id, processed_at)
+        )
+        await self._connection.execute(
+            "DELETE FROM processed_updates WHERE update_id < ? OR processed_at < ?",
+            (update_id - self.update_window, processed_at - REDELIVERY_SECONDS)
+        )
+    
+    @timed(DB_QUERY_SECONDS.labels("get_processed_updates"))
+    async def get_processed_updates(self) -> list[tuple[int, int]]:
         cursor = await self._connection.execute(
+            "SELECT update_id, processed_at FROM processed_updates WHERE processed_at >= ? ORDER BY update_id",
+            (int(time.time()) - REDELIVERY_SECONDS,)
+        )
+        rows = await cursor.fetchall()
+        return [(row["update_id"], row["processed_at"]) for row in rows]
+    
+    @timed(DB_QUERY_SECONDS.labels("get_conversation_history"))
+    async def get_conversation_history(self, user_id: int, chat_id: int, limit: int = 20) -> list[dict]:
+        cursor = await self._messages(chat_id).execute(
             """SELECT role, content FROM messages 
                WHERE user_id = ? AND chat_id = ? 
-               ORDER BY created_at DESC LIMIT ?""",
+               ORDER BY id DESC LIMIT ?""",
             (user_id, chat_id, limit)
         )
         rows = await cursor.fetchall()
         return [{"role": row["role"], "content": row["content"]} for row in reversed(rows)]
     
+    @timed(DB_QUERY_SECONDS.labels("get_conversation_histories"))
+    async def get_conversation_histories(self, chat_id: int, user_ids: list[int], limit: int = 20) -> dict[int, list[dict]]:
+        placeholders = ",".join("?" * len(user_ids))
+        cursor = await self._messages(chat_id).execute(
+            f"""SELECT user_id, role, content FROM (
+                    SELECT user_id, role, content, id, 
+                    ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id DESC) as position 
+                    FROM messages WHERE chat_id = ? AND user_id IN ({placeholders})
+                ) WHERE position <= ? ORDER BY user_id, id""",
+            [chat_id, *user_ids, limit]
+        )
+        rows = await cursor.fetchall()
+        histories: dict[int, list[dict]] = {user_id: [] for user_id in user_ids}
+        for row in rows:
+            histories[row["user_id"]].append({"role": row["role"], "content": row["content"]})
+        return histories
+    
+    @timed(DB_QUERY_SECONDS.labels("clear_conversation"))
     async def clear_conversation(self, user_id: int, chat_id: int) -> int:
-        result = await self._connection.execute(
+        connection = self._messages(chat_id)
+        result = await connection.execute(
             "DELETE FROM messages WHERE user_id = ? AND chat_id = ?",
             (user_id, chat_id)
         )
-        await self._connection.commit()
+        await connection.commit()
         return result.rowcount
     
+    @timed(DB_QUERY_SECONDS.labels("search_messages"))
+    async def search_messages(
+        self,
+        query: str,
+        user_id: Optional[int] = None,
+        chat_id: Optional[int] = None,
+        limit: int = 5,
+        after: Optional[tuple[float, int]] = None
+    ) -> tuple[list[dict], Optional[tuple[float, int]]]:
+        match = build_match_query(query)
+        if not match:
+            return [], None
+        
+        async def query_shard(index: int, connection: aiosqlite.Connection) -> list[dict]:
+            conditions = ["messages_fts MATCH ?"]
+            params: list = [match]
+            if user_id is not None:
+                conditions.append("m.user_id = ?")
+                params.append(user_id)
+            if chat_id is not None:
+                conditions.append("m.chat_id = ?")
+                params.append(chat_id)
+            if after is not None:
+                conditions.append("(messages_fts.rank > ? OR (messages_fts.rank = ? AND m.id * ? + ? > ?))")
+                params.extend([after[0], after[0], self.shard_count, index, after[1]])
+            
+            cursor = await connection.execute(
+                f"""SELECT m.id, m.user_id, m.chat_id, m.role, {self._created_at("m.created_at")} as created_at, 
+                    messages_fts.rank as score, 
+                    snippet(messages_fts, 0, '{SNIPPET_START}', '{SNIPPET_END}', '…', 16) as snippet 
+                    FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid 
+                    WHERE {" AND ".join(conditions)} 
+                    ORDER BY messages_fts.rank, m.id LIMIT ?""",
+                params + [limit + 1]
+            )
+            rows = await cursor.fetchall()
+            return [dict(row, id=self._global_id(index, row["id"])) for row in rows]
+        
+        if chat_id is not None:
+            index = self._shard_index(chat_id)
+            results = [await query_shard(index, self._messages(chat_id))]
+        else:
+            results = await asyncio.gather(*(
+                query_shard(index, connection) for index, connection in enumerate(self._message_connections())
+            ))
+        
+        rows = heapq.nsmallest(
+            limit + 1, (row for result in results for row in result), key=lambda row: (row["score"], row["id"])
+        )
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1]["score"], rows[-1]["id"])
+    
+    @timed(DB_QUERY_SECONDS.labels("backfill_search_index"))
+    async def backfill_search_index(self, batch_size: int) -> int:
+        async def backfill(connection: aiosqlite.Connection) -> int:
+            cursor = await connection.execute("SELECT indexed_until, backfill_end FROM search_index_state")
+            state = await cursor.fetchone()
+            if state["indexed_until"] >= state["backfill_end"]:
+                return 0
+            
+            cursor = await connection.execute(
+                "SELECT MAX(id) FROM (SELECT id FROM messages WHERE id > ? AND id <= ? ORDER BY id LIMIT ?)",
+                (state["indexed_until"], state["backfill_end"], batch_size)
+            )
+            last_id = (await cursor.fetchone())[0] or state["backfill_end"]
+            await connection.execute(
+                """INSERT INTO messages_fts (rowid, content) 
+                   SELECT id, content FROM messages WHERE id > ? AND id <= ?""",
+                (state["indexed_until"], last_id)
+            )
+            await connection.execute("UPDATE search_index_state SET indexed_until = ?", (last_id,))
+            await connection.commit()
+            
+            cursor = await connection.execute(
+                "SELECT COUNT(*) FROM messages WHERE id > ? AND id <= ?", (last_id, state["backfill_end"])
+            )
+            return (await cursor.fetchone())[0]
+        
+        pending = await asyncio.gather(*(backfill(connection) for connection in self._message_connections()))
+        return sum(pending)
+    
+    @timed(DB_QUERY_SECONDS.labels("rebuild_search_index"))
+    async def rebuild_search_index(self) -> int:
+        async def rebuild(connection: aiosqlite.Connection) -> int:
+            await connection.executescript("""
+                BEGIN;
+                INSERT INTO messages_fts (messages_fts) VALUES ('delete-all');
+                UPDATE search_index_state SET indexed_until = 0, 
+                    backfill_end = (SELECT COALESCE(MAX(id), 0) FROM messages);
+                COMMIT;
+            """)
+            cursor = await connection.execute("SELECT COUNT(*) FROM messages")
+            return (await cursor.fetchone())[0]
+        
+        pending = await asyncio.gather(*(rebuild(connection) for connection in self._message_connections()))
+        return sum(pending)
+    
+    @timed(DB_QUERY_SECONDS.labels("find_oversized_conversations"))
+    async def find_oversized_conversations(self, keep: int, limit: int = 100) -> list[tuple[int, int, int]]:
+        async def query(connection: aiosqlite.Connection) -> list[tuple[int, int, int]]:
+            cursor = await connection.execute(
+                """SELECT user_id, chat_id, COUNT(*) as total FROM messages 
+                   GROUP BY user_id, chat_id HAVING COUNT(*) > ? 
+                   ORDER BY total DESC LIMIT ?""",
+                (keep, limit)
+            )
+            rows = await cursor.fetchall()
+            return [(row["user_id"], row["chat_id"], row["total"]) for row in rows]
+        
+        results = await asyncio.gather(*(query(connection) for connection in self._message_connections()))
+        return heapq.nlargest(limit, (item for result in results for item in result), key=lambda item: item[2])
+    
+    @timed(DB_QUERY_SECONDS.labels("get_recent_conversations"))
+    async def get_recent_conversations(self, limit: int, scan: int = 20) -> list[tuple[int, int]]:
+        async def query(connection: aiosqlite.Connection) -> list[tuple[int, int, int]]:
+            cursor = await connection.execute(
+                f"""SELECT user_id, chat_id, MAX(created_at) as last FROM (
+                       SELECT user_id, chat_id, {self._created_at()} as created_at FROM messages ORDER BY id DESC LIMIT ?
+                   ) GROUP BY user_id, chat_id ORDER BY last DESC LIMIT ?""",
+                (limit * scan, limit)
+            )
+            rows = await cursor.fetchall()
+            return [(row["user_id"], row["chat_id"], row["last"]) for row in rows]
+        
+        if limit <= 0:
+            return []
+        results = await asyncio.gather(*(query(connection) for connection in self._message_connections()))
+        recent = heapq.nlargest(limit, (item for result in results for item in result), key=lambda item: item[2])
+        return [(user_id, chat_id) for user_id, chat_id, _ in recent]
+    
+    @timed(DB_QUERY_SECONDS.labels("fetch_overflow_messages"))
+    async def fetch_overflow_messages(self, user_id: int, chat_id: int, keep: int, limit: int) -> list[dict]:
+        index = self._shard_index(chat_id)
+        cursor = await self._messages(chat_id).execute(
+            f"""SELECT id, user_id, chat_id, role, content, tokens_used, {self._created_at()} as created_at 
+               FROM messages WHERE user_id = ? AND chat_id = ? AND id < (
+                   SELECT id FROM messages WHERE user_id = ? AND chat_id = ? 
+                   ORDER BY id DESC LIMIT 1 OFFSET ?
+               )
+               ORDER BY id LIMIT ?""",
+            (user_id, chat_id, user_id, chat_id, keep - 1, limit)
+        )
+        rows = await cursor.fetchall()
+        return [dict(row, id=self._global_id(index, row["id"])) for row in rows]
+    
+    @timed(DB_QUERY_SECONDS.labels("fetch_expired_messages"))
+    async def fetch_expired_messages(self, before: datetime, limit: int) -> list[dict]:
+        created_at = self._created_at()
+        
+        async def query(index: int, connection: aiosqlite.Connection) -> list[dict]:
+            cursor = await connection.execute(
+                f"""SELECT id, user_id, chat_id, role, content, tokens_used, {created_at} as created_at 
+                    FROM messages WHERE {created_at} < ? ORDER BY {created_at} LIMIT ?""",
+                (int(before.timestamp()), limit)
+            )
+            rows = await cursor.fetchall()
+            return [dict(row, id=self._global_id(index, row["id"])) for row in rows]
+        
+        results = await asyncio.gather(*(
+            query(index, connection) for index, connection in enumerate(self._message_connections())
+        ))
+        return heapq.nsmallest(limit, (row for result in results for row in result), key=lambda row: row["created_at"])
+    
+    @timed(DB_QUERY_SECONDS.labels("delete_messages"))
+    async def delete_messages(self, message_ids: list[int]) -> int:
+        by_shard: dict[int, list[int]] = {}
+        for message_id in message_ids:
+            by_shard.setdefault(message_id % self.shard_count, []).append(message_id // self.shard_count)
+        
+        async def delete(connection: aiosqlite.Connection, local_ids: list[int]) -> int:
+            placeholders = ",".join("?" * len(local_ids))
+            result = await connection.execute(
+                f"DELETE FROM messages WHERE id IN ({placeholders})", local_ids
+            )
+            await connection.commit()
+            return result.rowcount
+        
+        connections = self._message_connections()
+        deleted = await asyncio.gather(*(
+            delete(connections[index], local_ids) for index, local_ids in by_shard.items()
+        ))
+        return sum(deleted)
+    
+    async def export_messages(
+        self,
+        user_id: Optional[int] = None,
+        chat_id: Optional[int] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        batch_size: int = 5000
+    ) -> AsyncIterator[list[dict]]:
+        created_at = self._created_at()
+        conditions = ["id > ?"]
+        params: list = []
+        if user_id is not None:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        if chat_id is not None:
+            conditions.append("chat_id = ?")
+            params.append(chat_id)
+        if start is not None:
+            conditions.append(f"{created_at} >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append(f"{created_at} < ?")
+            params.append(end)
+        sql = f"""SELECT id, user_id, chat_id, role, content, tokens_used, {created_at} as created_at 
+                  FROM messages WHERE {" AND ".join(conditions)} ORDER BY id LIMIT ?"""
+        
+        if not self._shards:
+            indexes = [0]
+        elif chat_id is not None:
+            indexes = [self._shard_index(chat_id)]
+        else:
+            indexes = list(range(self.shard_count))
+        
+        for index in indexes:
+            reader = await self._open_reader(self._shard_path(index) if self._shards else self.db_path)
+            try:
+                last_id = 0
+                while True:
+                    started = time.perf_counter()
+                    cursor = await reader.execute(sql, (last_id, *params, batch_size))
+                    rows = await cursor.fetchall()
+                    DB_QUERY_SECONDS.labels("export_messages").observe(time.perf_counter() - started)
+                    if not rows:
+                        break
+                    last_id = rows[-1]["id"]
+                    yield [dict(row, id=self._global_id(index, row["id"])) for row in rows]
+                    if len(rows) < batch_size:
+                        break
+            finally:
+                await reader.close()
+    
+    async def export_usage(
+        self,
+        granularity: str,
+        user_id: Optional[int] = None,
+        chat_id: Optional[int] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        batch_size: int = 5000
+    ) -> AsyncIterator[list[dict]]:
+        table, _ = USAGE_GRANULARITIES[granularity]
+        conditions = ["(bucket, user_id, chat_id) > (?, ?, ?)"]
+        params: list = []
+        if user_id is not None:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        if chat_id is not None:
+            conditions.append("chat_id = ?")
+            params.append(chat_id)
+        if start is not None:
+            conditions.append("bucket >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("bucket < ?")
+            params.append(end)
+        sql = f"""SELECT bucket, user_id, chat_id, messages, tokens, searches, latency_ms_sum 
+                  FROM {table} WHERE {" AND ".join(conditions)} 
+                  ORDER BY bucket, user_id, chat_id LIMIT ?"""
+        
+        reader = await self._open_reader(self.db_path)
+        try:
+            last_key = (-1, 0, 0)
+            while True:
+                started = time.perf_counter()
+                cursor = await reader.execute(sql, (*last_key, *params, batch_size))
+                rows = await cursor.fetchall()
+                DB_QUERY_SECONDS.labels("export_usage").observe(time.perf_counter() - started)
+                if not rows:
+                    break
+                last_key = (rows[-1]["bucket"], rows[-1]["user_id"], rows[-1]["chat_id"])
+                yield [dict(row) for row in rows]
+                if len(rows) < batch_size:
+                    break
+        finally:
+            await reader.close()
+    
+    @timed(DB_QUERY_SECONDS.labels("storage_info"))
+    async def storage_info(self) -> dict:
+        async def query(connection: aiosqlite.Connection) -> dict:
+            info = {}
+            for pragma in ("page_size", "page_count", "freelist_count", "auto_vacuum"):
+                cursor = await connection.execute(f"PRAGMA {pragma}")
+                row = await cursor.fetchone()
+                info[pragma] = row[0]
+            return info
+        
+        results = await asyncio.gather(*(query(connection) for connection in self.connections()))
+        return {
+            "page_size": results[0]["page_size"],
+            "page_count": sum(info["page_count"] for info in results),
+            "freelist_count": sum(info["freelist_count"] for info in results),
+            "auto_vacuum": min(info["auto_vacuum"] for info in results),
+            "files": [info["page_count"] * info["page_size"] for info in results]
+        }
+    
+    @timed(DB_QUERY_SECONDS.labels("incremental_vacuum"))
+    async def incremental_vacuum(self, pages: int) -> None:
+        await asyncio.gather(*(
+            connection.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+            for connection in self.connections()
+        ))
+    
+    @timed(DB_QUERY_SECONDS.labels("optimize"))
+    async def optimize(self) -> None:
+        await asyncio.gather(*(
+            connection.executescript("PRAGMA optimize;")
+            for connection in self.connections()
+        ))
+    
+    @timed(DB_QUERY_SECONDS.labels("update_stats"))
     async def update_stats(self, user_id: int, messages: int = 0, tokens: int = 0, searches: int = 0) -> None:
         await self._connection.execute(
             """UPDATE stats SET 
@@ -159,10 +661,86 @@ class Database:
                total_searches = total_searches + ?,
                last_active = ?
                WHERE user_id = ?""",
-            (messages, tokens, searches, datetime.now().isoformat(), user_id)
+            (messages, tokens, searches, int(time.time()), user_id)
         )
         await self._connection.commit()
     
+    @timed(DB_QUERY_SECONDS.labels("record_usage"))
+    async def record_usage(
+        self,
+        user_id: int,
+        chat_id: int,
+        messages: int = 0,
+        tokens: int = 0,
+        searches: int = 0,
+        latency_ms: float = 0.0,
+        at: Optional[float] = None
+    ) -> None:
+        timestamp = int(at if at is not None else time.time())
+        for table, width in USAGE_GRANULARITIES.values():
+            await self._connection.execute(
+                f"""INSERT INTO {table} (bucket, user_id, chat_id, messages, tokens, searches, latency_ms_sum) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?) 
+                    ON CONFLICT (bucket, user_id, chat_id) DO UPDATE SET 
+                    messages = messages + excluded.messages,
+                    tokens = tokens + excluded.tokens,
+                    searches = searches + excluded.searches,
+                    latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum""",
+                (timestamp - timestamp % width, user_id, chat_id, messages, tokens, searches, latency_ms)
+            )
+        await self._connection.commit()
+    
+    @timed(DB_QUERY_SECONDS.labels("get_usage"))
+    async def get_usage(
+        self,
+        granularity: str,
+        start: int,
+        end: int,
+        user_id: Optional[int] = None,
+        chat_id: Optional[int] = None
+    ) -> list[dict]:
+        table, _ = USAGE_GRANULARITIES[granularity]
+        conditions = ["bucket >= ?", "bucket < ?"]
+        params: list = [start, end]
+        if user_id is not None:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        if chat_id is not None:
+            conditions.append("chat_id = ?")
+            params.append(chat_id)
+        
+        cursor = await self._connection.execute(
+            f"""SELECT bucket, SUM(messages) as messages, SUM(tokens) as tokens, 
+                SUM(searches) as searches, SUM(latency_ms_sum) as latency_ms_sum 
+                FROM {table} WHERE {" AND ".join(conditions)} 
+                GROUP BY bucket ORDER BY bucket""",
+            params
+        )
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+    
+    @timed(DB_QUERY_SECONDS.labels("get_top_usage"))
+    async def get_top_usage(self, granularity: str, start: int, end: int, key: str = "chat_id", limit: int = 5) -> list[dict]:
+        table, _ = USAGE_GRANULARITIES[granularity]
+        column = "user_id" if key == "user_id" else "chat_id"
+        cursor = await self._connection.execute(
+            f"""SELECT {column} as key_id, SUM(messages) as messages, SUM(tokens) as tokens, 
+                SUM(searches) as searches 
+                FROM {table} WHERE bucket >= ? AND bucket < ? 
+                GROUP BY {column} ORDER BY tokens DESC LIMIT ?""",
+            (start, end, limit)
+        )
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+    
+    @timed(DB_QUERY_SECONDS.labels("prune_usage"))
+    async def prune_usage(self, granularity: str, before: int) -> int:
+        table, _ = USAGE_GRANULARITIES[granularity]
+        result = await self._connection.execute(f"DELETE FROM {table} WHERE bucket < ?", (before,))
+        await self._connection.commit()
+        return result.rowcount
+    
+    @timed(DB_QUERY_SECONDS.labels("get_user_stats"))
     async def get_user_stats(self, user_id: int) -> Optional[Stats]:
         cursor = await self._connection.execute(
             "SELECT * FROM stats WHERE user_id = ?", (user_id,)
@@ -175,36 +753,80 @@ class Database:
             total_messages=row["total_messages"],
             total_tokens=row["total_tokens"],
             total_searches=row["total_searches"],
-            last_active=datetime.fromisoformat(row["last_active"])
+            last_active=to_datetime(row["last_active"])
         )
     
+    @timed(DB_QUERY_SECONDS.labels("save_quota_buckets"))
+    async def save_quota_buckets(self, rows: list[tuple[str, int, float, float, float]]) -> None:
+        if not rows:
+            return
+        await self._connection.executemany(
+            """INSERT OR REPLACE INTO quota_buckets 
+               (scope, key_id, minute_tokens, day_tokens, updated_at) VALUES (?, ?, ?, ?, ?)""",
+            rows
+        )
+        await self._connection.commit()
+    
+    @timed(DB_QUERY_SECONDS.labels("load_quota_buckets"))
+    async def load_quota_buckets(self, max_age_seconds: int = 86400) -> list[tuple[str, int, float, float, float]]:
+        cutoff = time.time() - max_age_seconds
+        await self._connection.execute(
+            "DELETE FROM quota_buckets WHERE updated_at < ?", (cutoff,)
+        )
+        await self._connection.commit()
+        cursor = await self._connection.execute(
+            "SELECT scope, key_id, minute_tokens, day_tokens, updated_at FROM quota_buckets"
+        )
+        rows = await cursor.fetchall()
+        return [
+            (row["scope"], row["key_id"], row["minute_tokens"], row["day_tokens"], row["updated_at"])
+            for row in rows
+        ]
+    
+    @timed(DB_QUERY_SECONDS.labels("get_global_stats"))
     async def get_global_stats(self) -> dict:
         cursor = await self._connection.execute(
-            """SELECT 
-               COUNT(*) as total_users,
-               SUM(total_messages) as total_messages,
-               SUM(total_tokens) as total_tokens,
-               SUM(total_searches) as total_searches
-               FROM stats"""
+            """SELECT total_users, total_messages, total_tokens, total_searches, banned_users 
+               FROM global_stats WHERE id = 1"""
         )
         row = await cursor.fetchone()
-        
-        banned_cursor = await self._connection.execute(
-            "SELECT COUNT(*) as banned FROM users WHERE is_banned = 1"
+        if not row:
+            return {
+                "total_users": 0,
+                "total_messages": 0,
+                "total_tokens": 0,
+                "total_searches": 0,
+                "banned_users": 0
+            }
+        return dict(row)
+    
+    @timed(DB_QUERY_SECONDS.labels("repair_global_stats"))
+    async def repair_global_stats(self) -> dict:
+        stored = await self.get_global_stats()
+        await self._connection.execute(
+            """INSERT OR REPLACE INTO global_stats 
+               (id, total_users, total_messages, total_tokens, total_searches, banned_users) 
+               SELECT 1,
+               COUNT(*),
+               COALESCE(SUM(total_messages), 0),
+               COALESCE(SUM(total_tokens), 0),
+               COALESCE(SUM(total_searches), 0),
+               (SELECT COUNT(*) FROM users WHERE is_banned != 0)
+               FROM stats"""
         )
-        banned_row = await banned_cursor.fetchone()
-        
-        return {
-            "total_users": row["total_users"] or 0,
-            "total_messages": row["total_messages"] or 0,
-            "total_tokens": row["total_tokens"] or 0,
-            "total_searches": row["total_searches"] or 0,
-            "banned_users": banned_row["banned"] or 0
-        }
+        await self._connection.commit()
+        actual = await self.get_global_stats()
+        return {key: actual[key] - stored[key] for key in actual}
+    
+    @timed(DB_QUERY_SECONDS.labels("ping"))
+    async def ping(self) -> bool:
+        cursor = await self._connection.execute("SELECT 1")
+        return (await cursor.fetchone())[0] == 1
     
+    @timed(DB_QUERY_SECONDS.labels("get_user_by_username"))
     async def get_user_by_username(self, username: str) -> Optional[User]:
         cursor = await self._connection.execute(
-            "SELECT * FROM users WHERE username = ?", (username.lstrip("@"),)
+            "SELECT * FROM users WHERE username = ? COLLATE NOCASE", (username.lstrip("@"),)
         )
         row = await cursor.fetchone()
         if not row:
@@ -216,6 +838,6 @@ class Database:
             last_name=row["last_name"],
             is_banned=bool(row["is_banned"]),
             is_whitelisted=bool(row["is_whitelisted"]),
-            created_at=datetime.fromisoformat(row["created_at"]),
-            updated_at=datetime.fromisoformat(row["updated_at"])
+            created_at=to_datetime(row["created_at"]),
+            updated_at=to_datetime(row["updated_at"])
         )
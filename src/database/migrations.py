@@ -0,0 +1,458 @@
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+import aiosqlite
+from src.utils import get_logger
+
+logger = get_logger("migrations")
+
+BASELINE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        first_name TEXT NOT NULL,
+        last_name TEXT,
+        is_banned INTEGER DEFAULT 0,
+        is_whitelisted INTEGER DEFAULT 0,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        tokens_used INTEGER DEFAULT 0,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    );
+    
+    CREATE TABLE IF NOT EXISTS stats (
+        user_id INTEGER PRIMARY KEY,
+        total_messages INTEGER DEFAULT 0,
+        total_tokens INTEGER DEFAULT 0,
+        total_searches INTEGER DEFAULT 0,
+        last_active TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    );
+    
+    CREATE TABLE IF NOT EXISTS quota_buckets (
+        scope TEXT NOT NULL,
+        key_id INTEGER NOT NULL,
+        minute_tokens REAL NOT NULL,
+        day_tokens REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (scope, key_id)
+    );
+    
+    CREATE TABLE IF NOT EXISTS global_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_users INTEGER NOT NULL DEFAULT 0,
+        total_messages INTEGER NOT NULL DEFAULT 0,
+        total_tokens INTEGER NOT NULL DEFAULT 0,
+        total_searches INTEGER NOT NULL DEFAULT 0,
+        banned_users INTEGER NOT NULL DEFAULT 0
+    );
+    
+    CREATE TABLE IF NOT EXISTS usage_hourly (
+        bucket INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        messages INTEGER NOT NULL DEFAULT 0,
+        tokens INTEGER NOT NULL DEFAULT 0,
+        searches INTEGER NOT NULL DEFAULT 0,
+        latency_ms_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket, user_id, chat_id)
+    ) WITHOUT ROWID;
+    
+    CREATE TABLE IF NOT EXISTS usage_daily (
+        bucket INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        messages INTEGER NOT NULL DEFAULT 0,
+        tokens INTEGER NOT NULL DEFAULT 0,
+        searches INTEGER NOT NULL DEFAULT 0,
+        latency_ms_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket, user_id, chat_id)
+    ) WITHOUT ROWID;
+    
+    CREATE INDEX IF NOT EXISTS idx_usage_hourly_chat ON usage_hourly (chat_id, bucket);
+    CREATE INDEX IF NOT EXISTS idx_usage_hourly_user ON usage_hourly (user_id, bucket);
+    CREATE INDEX IF NOT EXISTS idx_usage_daily_chat ON usage_daily (chat_id, bucket);
+    CREATE INDEX IF NOT EXISTS idx_usage_daily_user ON usage_daily (user_id, bucket);
+    
+    CREATE INDEX IF NOT EXISTS idx_messages_user_chat ON messages (user_id, chat_id);
+    CREATE INDEX IF NOT EXISTS idx_messages_created ON messages (created_at);
+"""
+
+GLOBAL_STATS_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trg_stats_insert AFTER INSERT ON stats BEGIN
+        UPDATE global_stats SET
+            total_users = total_users + 1,
+            total_messages = total_messages + NEW.total_messages,
+            total_tokens = total_tokens + NEW.total_tokens,
+            total_searches = total_searches + NEW.total_searches
+        WHERE id = 1;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_stats_update
+    AFTER UPDATE OF total_messages, total_tokens, total_searches ON stats BEGIN
+        UPDATE global_stats SET
+            total_messages = total_messages + NEW.total_messages - OLD.total_messages,
+            total_tokens = total_tokens + NEW.total_tokens - OLD.total_tokens,
+            total_searches = total_searches + NEW.total_searches - OLD.total_searches
+        WHERE id = 1;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_stats_delete AFTER DELETE ON stats BEGIN
+        UPDATE global_stats SET
+            total_users = total_users - 1,
+            total_messages = total_messages - OLD.total_messages,
+            total_tokens = total_tokens - OLD.total_tokens,
+            total_searches = total_searches - OLD.total_searches
+        WHERE id = 1;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_users_insert AFTER INSERT ON users WHEN NEW.is_banned != 0 BEGIN
+        UPDATE global_stats SET banned_users = banned_users + 1 WHERE id = 1;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_users_ban
+    AFTER UPDATE OF is_banned ON users WHEN (NEW.is_banned != 0) != (OLD.is_banned != 0) BEGIN
+        UPDATE global_stats SET
+            banned_users = banned_users + CASE WHEN NEW.is_banned != 0 THEN 1 ELSE -1 END
+        WHERE id = 1;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_users_delete AFTER DELETE ON users WHEN OLD.is_banned != 0 BEGIN
+        UPDATE global_stats SET banned_users = banned_users - 1 WHERE id = 1;
+    END;
+"""
+
+USERS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        first_name TEXT NOT NULL,
+        last_name TEXT,
+        is_banned INTEGER DEFAULT 0,
+        is_whitelisted INTEGER DEFAULT 0,
+        created_at INTEGER NOT NULL,
+        updated_at INTEGER NOT NULL
+    )
+"""
+
+MESSAGES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        tokens_used INTEGER DEFAULT 0,
+        created_at INTEGER NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    )
+"""
+
+MESSAGE_SEARCH_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content,
+        content = 'messages',
+        content_rowid = 'id',
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+    
+    CREATE TABLE IF NOT EXISTS search_index_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        indexed_until INTEGER NOT NULL,
+        backfill_end INTEGER NOT NULL
+    );
+    
+    INSERT OR IGNORE INTO search_index_state (id, indexed_until, backfill_end)
+    SELECT 1, 0, COALESCE(MAX(id), 0) FROM messages;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_messages_fts_insert AFTER INSERT ON messages
+    WHEN NEW.id <= (SELECT indexed_until FROM search_index_state) 
+      OR NEW.id > (SELECT backfill_end FROM search_index_state) BEGIN
+        INSERT INTO messages_fts (rowid, content) VALUES (NEW.id, NEW.content);
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_messages_fts_delete AFTER DELETE ON messages
+    WHEN OLD.id <= (SELECT indexed_until FROM search_index_state) 
+      OR OLD.id > (SELECT backfill_end FROM search_index_state) BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', OLD.id, OLD.content);
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS trg_messages_fts_update AFTER UPDATE OF content ON messages
+    WHEN OLD.id <= (SELECT indexed_until FROM search_index_state) 
+      OR OLD.id > (SELECT backfill_end FROM search_index_state) BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', OLD.id, OLD.content);
+        INSERT INTO messages_fts (rowid, content) VALUES (NEW.id, NEW.content);
+    END;
+"""
+
+STATS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        user_id INTEGER PRIMARY KEY,
+        total_messages INTEGER DEFAULT 0,
+        total_tokens INTEGER DEFAULT 0,
+        total_searches INTEGER DEFAULT 0,
+        last_active INTEGER NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    )
+"""
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[aiosqlite.Connection, int], Awaitable[None]]
+
+
+@dataclass
+class TableRebuild:
+    table: str
+    schema: str
+    columns: list[str]
+    key: str
+    
+    @property
+    def staging(self) -> str:
+        return f"{self.table}_new"
+
+
+def epoch_sql(column: str) -> str:
+    return (
+        f"CASE WHEN typeof({column}) = 'integer' THEN {column} "
+        f"WHEN {column} NOT GLOB '*[^0-9]*' THEN CAST({column} AS INTEGER) "
+        f"ELSE COALESCE(CAST(strftime('%s', {column}, 'utc') AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER)) END"
+    )
+
+
+EPOCH_REBUILDS = [
+    TableRebuild(
+        "users", USERS_SCHEMA,
+        [
+            "user_id", "username", "first_name", "last_name", "is_banned", "is_whitelisted",
+            epoch_sql("created_at"), epoch_sql("updated_at")
+        ],
+        key="user_id"
+    ),
+    TableRebuild(
+        "stats", STATS_SCHEMA,
+        ["user_id", "total_messages", "total_tokens", "total_searches", epoch_sql("last_active")],
+        key="user_id"
+    ),
+    TableRebuild(
+        "messages", MESSAGES_SCHEMA,
+        ["id", "user_id", "chat_id", "role", "content", "tokens_used", epoch_sql("created_at")],
+        key="id"
+    ),
+]
+
+
+async def get_schema_version(connection: aiosqlite.Connection) -> int:
+    cursor = await connection.execute("PRAGMA user_version")
+    return (await cursor.fetchone())[0]
+
+
+async def start_rebuild(connection: aiosqlite.Connection, rebuild: TableRebuild) -> None:
+    table, staging, key = rebuild.table, rebuild.staging, rebuild.key
+    mirror = f"INSERT OR REPLACE INTO {staging} SELECT {', '.join(rebuild.columns)} FROM {table} WHERE {key} = NEW.{key};"
+    await connection.execute(rebuild.schema.format(name=staging))
+    await connection.executescript(f"""
+        CREATE TABLE IF NOT EXISTS table_rebuilds (
+            name TEXT PRIMARY KEY,
+            copied_until INTEGER NOT NULL
+        );
+        
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_rebuild_insert AFTER INSERT ON {table} BEGIN
+            {mirror}
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_rebuild_update AFTER UPDATE ON {table} BEGIN
+            {mirror}
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_rebuild_delete AFTER DELETE ON {table} BEGIN
+            DELETE FROM {staging} WHERE {key} = OLD.{key};
+        END;
+        
+        INSERT OR IGNORE INTO table_rebuilds (name, copied_until) VALUES ('{table}', -9223372036854775808);
+    """)
+
+
+async def copy_rebuild_batch(connection: aiosqlite.Connection, rebuild: TableRebuild, batch_size: int) -> int:
+    table, key = rebuild.table, rebuild.key
+    cursor = await connection.execute("SELECT copied_until FROM table_rebuilds WHERE name = ?", (table,))
+    copied_until = (await cursor.fetchone())[0]
+    
+    cursor = await connection.execute(
+        f"SELECT MAX({key}) FROM (SELECT {key} FROM {table} WHERE {key} > ? ORDER BY {key} LIMIT ?)",
+        (copied_until, batch_size)
+    )
+    last_key = (await cursor.fetchone())[0]
+    if last_key is not None:
+        result = await connection.execute(
+            f"""INSERT OR IGNORE INTO {rebuild.staging} 
+                SELECT {', '.join(rebuild.columns)} FROM {table} WHERE {key} > ? AND {key} <= ?""",
+            (copied_until, last_key)
+        )
+        await connection.execute("UPDATE table_rebuilds SET copied_until = ? WHERE name = ?", (last_key, table))
+        await connection.commit()
+        copied_until = last_key
+        logger.info_ctx(
+            f"Backfilled {table}",
+            action="migration_backfill",
+            extra_data={"table": table, "copied": result.rowcount, "last_key": last_key}
+        )
+    
+    cursor = await connection.execute(f"SELECT COUNT(*) FROM {table} WHERE {key} > ?", (copied_until,))
+    return (await cursor.fetchone())[0]
+
+
+async def swap_rebuilt_table(connection: aiosqlite.Connection, rebuild: TableRebuild) -> None:
+    table, staging = rebuild.table, rebuild.staging
+    cursor = await connection.execute(
+        """SELECT sql FROM sqlite_master 
+           WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL AND name NOT GLOB ?""",
+        (table, f"trg_{table}_rebuild_*")
+    )
+    recreate = "".join(f"{row[0]};\n" for row in await cursor.fetchall())
+    await connection.executescript(f"""
+        BEGIN;
+        DELETE FROM sqlite_sequence WHERE name = '{staging}';
+        INSERT INTO sqlite_sequence (name, seq) SELECT '{staging}', seq FROM sqlite_sequence WHERE name = '{table}';
+        DROP TABLE {table};
+        ALTER TABLE {staging} RENAME TO {table};
+        {recreate}
+        DELETE FROM table_rebuilds WHERE name = '{table}';
+        COMMIT;
+    """)
+    logger.info_ctx(
+        f"Rebuilt {table}",
+        action="migration_swap",
+        extra_data={"table": table}
+    )
+
+
+async def pending_rebuilds(connection: aiosqlite.Connection) -> list[TableRebuild]:
+    cursor = await connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'table_rebuilds'"
+    )
+    if not await cursor.fetchone():
+        return []
+    cursor = await connection.execute("SELECT name FROM table_rebuilds")
+    names = {row[0] for row in await cursor.fetchall()}
+    return [rebuild for rebuild in EPOCH_REBUILDS if rebuild.table in names]
+
+
+async def continue_rebuilds(connection: aiosqlite.Connection, batch_size: int) -> int:
+    pending = 0
+    for rebuild in await pending_rebuilds(connection):
+        remaining = await copy_rebuild_batch(connection, rebuild, batch_size)
+        if remaining == 0:
+            await swap_rebuilt_table(connection, rebuild)
+        pending += remaining
+    return pending
+
+
+async def _baseline(connection: aiosqlite.Connection, batch_size: int) -> None:
+    await connection.executescript(BASELINE_SCHEMA)
+    await connection.executescript(GLOBAL_STATS_TRIGGERS)
+
+
+async def _epoch_timestamps(connection: aiosqlite.Connection, batch_size: int) -> None:
+    for rebuild in EPOCH_REBUILDS:
+        await start_rebuild(connection, rebuild)
+
+
+async def _conversation_indexes(connection: aiosqlite.Connection, batch_size: int) -> None:
+    await connection.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (user_id, chat_id, id);
+        DROP INDEX IF EXISTS idx_messages_user_chat;
+        CREATE INDEX IF NOT EXISTS idx_users_username ON users (username COLLATE NOCASE);
+    """)
+
+
+async def _storage_meta(connection: aiosqlite.Connection, batch_size: int) -> None:
+    await connection.executescript("""
+        CREATE TABLE IF NOT EXISTS storage_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """)
+
+
+async def _message_search(connection: aiosqlite.Connection, batch_size: int) -> None:
+    await connection.executescript(MESSAGE_SEARCH_SCHEMA)
+
+
+async def _processed_updates(connection: aiosqlite.Connection, batch_size: int) -> None:
+    await connection.executescript("""
+        CREATE TABLE IF NOT EXISTS processed_updates (
+            update_id INTEGER PRIMARY KEY,
+            processed_at INTEGER NOT NULL
+        );
+    """)
+
+
+async def _shard_messages(connection: aiosqlite.Connection, batch_size: int) -> None:
+    await connection.execute(MESSAGES_SCHEMA.format(name="messages"))
+    await connection.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (user_id, chat_id, id);
+        CREATE INDEX IF NOT EXISTS idx_messages_created ON messages (created_at);
+    """)
+
+
+MIGRATIONS = [
+    Migration(1, "baseline", _baseline),
+    Migration(2, "epoch_timestamps", _epoch_timestamps),
+    Migration(3, "conversation_indexes", _conversation_indexes),
+    Migration(4, "storage_meta", _storage_meta),
+    Migration(5, "message_search", _message_search),
+    Migration(6, "processed_updates", _processed_updates),
+]
+
+SHARD_MIGRATIONS = [
+    Migration(1, "messages", _shard_messages),
+    Migration(2, "message_search", _message_search),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+async def migrate(
+    connection: aiosqlite.Connection,
+    batch_size: int = 5000,
+    target: Optional[int] = None,
+    migrations: list[Migration] = MIGRATIONS
+) -> list[int]:
+    current = await get_schema_version(connection)
+    target = target if target is not None else migrations[-1].version
+    applied = []
+    
+    for migration in migrations:
+        if migration.version <= current or migration.version > target:
+            continue
+        
+        logger.info_ctx(
+            f"Applying migration {migration.version}: {migration.name}",
+            action="migration_start",
+            extra_data={"version": migration.version, "name": migration.name}
+        )
+        await migration.apply(connection, batch_size)
+        await connection.execute(f"PRAGMA user_version = {migration.version}")
+        await connection.commit()
+        applied.append(migration.version)
+        
+        logger.info_ctx(
+            f"Migration {migration.version} applied",
+            action="migration_done",
+            extra_data={"version": migration.version, "name": migration.name}
+        )
+    
+    return applied
@@ -1,17 +1,48 @@
-from telegram import Update
+import asyncio
+import html
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 from src.database import Database
-from src.utils import RateLimiter, get_logger
+from src.services import ExportService, RetentionService
+from src.services.export import EXPORT_FIELDS, EXPORT_FORMATS
+from src.utils import BanList, RateLimiter, get_logger
+from src.utils.helpers import format_message_hits
+from src.utils.loop_monitor import LoopMonitor
+from src.utils.profiler import Profiler
+from src.utils.tracing import get_trace_buffer
 
 logger = get_logger("admin_handler")
 
+MESSAGE_SEARCH_PAGE_SIZE = 5
+MESSAGE_SEARCHES_KEPT = 20
+MAX_DOCUMENT_BYTES = 50 * 1024 * 1024
+
 
 class AdminHandler:
-    def __init__(self, database: Database, rate_limiter: RateLimiter, admin_ids: list[int]):
+    def __init__(
+        self,
+        database: Database,
+        rate_limiter: RateLimiter,
+        ban_list: BanList,
+        admin_ids: list[int],
+        profiler: Profiler,
+        loop_monitor: LoopMonitor,
+        retention: RetentionService,
+        exporter: ExportService
+    ):
         self.db = database
         self.rate_limiter = rate_limiter
+        self.ban_list = ban_list
         self.admin_ids = admin_ids
+        self.profiler = profiler
+        self.loop_monitor = loop_monitor
+        self.retention = retention
+        self.exporter = exporter
     
     def is_admin(self, user_id: int) -> bool:
         return user_id in self.admin_ids
@@ -51,8 +82,8 @@ class AdminHandler:
             return
         
         success = await self.db.ban_user(target_id)
-        
         if success:
+            await self.ban_list.publish(await self.db.get_banned_user_ids())
             await update.message.reply_text(f"✅ Kullanıcı banlandı: <code>{target_id}</code>", parse_mode=ParseMode.HTML)
             logger.warning_ctx(
                 f"User banned",
@@ -95,8 +126,8 @@ class AdminHandler:
         
         success = await self.db.unban_user(target_id)
         await self.rate_limiter.reset_user(target_id)
-        
         if success:
+            await self.ban_list.publish(await self.db.get_banned_user_ids())
             await update.message.reply_text(f"✅ Kullanıcı banı kaldırıldı: <code>{target_id}</code>", parse_mode=ParseMode.HTML)
             logger.info_ctx(
                 f"User unbanned",
@@ -114,7 +145,10 @@ class AdminHandler:
             await update.message.reply_text("❌ Bu komutu kullanma yetkiniz yok.")
             return
         
-        global_stats = await self.db.get_global_stats()
+        global_stats, storage = await asyncio.gather(
+            self.db.get_global_stats(),
+            self.db.storage_info()
+        )
         
         stats_message = f"""
 <b>📊 Global İstatistikler (Admin)</b>
@@ -128,6 +162,10 @@ class AdminHandler:
 • Toplam Token: <code>{global_stats['total_tokens']:,}</code>
 • Toplam Arama: <code>{global_stats['total_searches']:,}</code>
 
+<b>🔹 Depolama:</b>
+• Veritabanı Boyutu: <code>{sum(storage['files']) / 1024 / 1024:.1f} MB</code>
+• Dosya Sayısı: <code>{len(storage['files'])}</code>
+
 <b>🔹 Adminler:</b>
 • Admin Sayısı: <code>{len(self.admin_ids)}</code>
 """
@@ -140,6 +178,298 @@ class AdminHandler:
             action="admin_stats"
         )
     
+    async def repair_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        user = update.effective_user
+        
+        if not self.is_admin(user.id):
+            await update.message.reply_text("❌ Bu komutu kullanma yetkiniz yok.")
+            return
+        
+        drift = await self.db.repair_global_stats()
+        labels = {
+            "total_users": "Toplam Kullanıcı",
+            "total_messages": "Toplam Mesaj",
+            "total_tokens": "Toplam Token",
+            "total_searches": "Toplam Arama",
+            "banned_users": "Banlı Kullanıcı"
+        }
+        
+        if any(drift.values()):
+            rows = "\n".join(
+                f"• {labels[key]}: <code>{value:+,}</code>"
+                for key, value in drift.items() if value
+            )
+            response = f"<b>🔧 Global sayaçlar düzeltildi</b>\n\n{rows}"
+        else:
+            response = "✅ Global sayaçlar tutarlı."
+        
+        await update.message.reply_text(response, parse_mode=ParseMode.HTML)
+        
+        logger.info_ctx(
+            "Global stats repaired",
+            user_id=user.id,
+            action="admin_repair_stats",
+            extra_data=drift
+        )
+    
+    async def usage(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        user = update.effective_user
+        
+        if not self.is_admin(user.id):
+            await update.message.reply_text("❌ Bu komutu kullanma yetkiniz yok.")
+            return
+        
+        usage_help = "❌ Kullanım: <code>/usage [7d|24h] [user:id|chat:id]</code>"
+        period, granularity = 7, "day"
+        filters = {}
+        
+        try:
+            for arg in context.args:
+                if arg.startswith(("user:", "chat:")):
+                    key, _, value = arg.partition(":")
+                    filters[f"{key}_id"] = int(value)
+                elif arg[-1:] in ("d", "h"):
+                    period = int(arg[:-1])
+                    granularity = "day" if arg[-1] == "d" else "hour"
+                else:
+                    raise ValueError(arg)
+        except ValueError:
+            await update.message.reply_text(usage_help, parse_mode=ParseMode.HTML)
+            return
+        
+        width = 86400 if granularity == "day" else 3600
+        period = max(1, min(period, 90 if granularity == "day" else 168))
+        end = int(time.time()) // width * width + width
+        start = end - period * width
+        
+        rows = await self.db.get_usage(granularity, start, end, **filters)
+        
+        if not rows:
+            await update.message.reply_text("❌ Bu aralıkta kullanım kaydı yok.")
+            return
+        
+        date_format = "%Y-%m-%d" if granularity == "day" else "%m-%d %H:00"
+        lines = []
+        for row in rows:
+            label = datetime.fromtimestamp(row["bucket"], timezone.utc).strftime(date_format)
+            avg_latency = row["latency_ms_sum"] / row["messages"] if row["messages"] else 0.0
+            lines.append(
+                f"<code>{label}</code> • {row['messages']:,} mesaj • {row['tokens']:,} token • "
+                f"{row['searches']:,} arama • {avg_latency / 1000:.1f}s"
+            )
+        
+        totals = {key: sum(row[key] for row in rows) for key in ("messages", "tokens", "searches")}
+        scope = ", ".join(f"{key[:-3]}: <code>{value}</code>" for key, value in filters.items()) or "tümü"
+        parts = [
+            f"<b>📈 Kullanım ({period}{granularity[0]}, UTC)</b> — {scope}",
+            "\n".join(lines),
+            f"<b>Toplam:</b> {totals['messages']:,} mesaj • {totals['tokens']:,} token • {totals['searches']:,} arama"
+        ]
+        
+        if not filters:
+            top = await self.db.get_top_usage(granularity, start, end, key="chat_id")
+            parts.append("<b>🔝 En Çok Token Kullanan Sohbetler:</b>\n" + "\n".join(
+                f"• <code>{row['key_id']}</code>: {row['tokens']:,} token, {row['messages']:,} mesaj"
+                for row in top
+            ))
+        
+        response = "\n\n".join(parts)
+        if len(response) > 4000:
+            response = response[:3997] + "..."
+        
+        await update.message.reply_text(response, parse_mode=ParseMode.HTML)
+        
+        logger.info_ctx(
+            "Usage viewed",
+            user_id=user.id,
+            action="admin_usage",
+            extra_data={"period": period, "granularity": granularity, **filters}
+        )
+    
+    async def message_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        user = update.effective_user
+        
+        if not self.is_admin(user.id):
+            await update.message.reply_text("❌ Bu komutu kullanma yetkiniz yok.")
+            return
+        
+        search_help = "❌ Kullanım: <code>/msearch sorgu [user:id] [chat:id]</code>"
+        terms = []
+        filters = {}
+        
+        try:
+            for arg in context.args:
+                if arg.startswith(("user:", "chat:")):
+                    key, _, value = arg.partition(":")
+                    filters[f"{key}_id"] = int(value)
+                else:
+                    terms.append(arg)
+        except ValueError:
+            await update.message.reply_text(search_help, parse_mode=ParseMode.HTML)
+            return
+        
+        if not terms:
+            await update.message.reply_text(search_help, parse_mode=ParseMode.HTML)
+            return
+        
+        state = {"query": " ".join(terms), "after": None, **filters}
+        text, markup = await self._message_search_page(state)
+        sent = await update.message.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=markup)
+        
+        if state["after"]:
+            searches = context.user_data.setdefault("message_search", {})
+            searches[sent.message_id] = state
+            while len(searches) > MESSAGE_SEARCHES_KEPT:
+                searches.pop(next(iter(searches)))
+        
+        logger.info_ctx(
+            "Messages searched",
+            user_id=user.id,
+            action="admin_message_search",
+            extra_data={"query": state["query"], **filters}
+        )
+    
+    async def message_search_next(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        query = update.callback_query
+        searches = context.user_data.get("message_search", {})
+        state = searches.get(query.message.message_id)
+        
+        if not self.is_admin(query.from_user.id) or not state or not state["after"]:
+            await query.answer("Arama süresi doldu, lütfen tekrar arayın.")
+            return
+        
+        await query.answer()
+        text, markup = await self._message_search_page(state)
+        if not state["after"]:
+            searches.pop(query.message.message_id, None)
+        await query.edit_message_text(text, parse_mode=ParseMode.HTML, reply_markup=markup)
+    
+    async def _message_search_page(self, state: dict) -> tuple[str, Optional[InlineKeyboardMarkup]]:
+        rows, state["after"] = await self.db.search_messages(
+            state["query"],
+            user_id=state.get("user_id"),
+            chat_id=state.get("chat_id"),
+            limit=MESSAGE_SEARCH_PAGE_SIZE,
+            after=state["after"]
+        )
+        
+        if not rows:
+            return "❌ Eşleşen mesaj bulunamadı.", None
+        
+        response = (
+            f"<b>🔎 Mesaj Araması: {html.escape(state['query'])}</b>\n\n"
+            f"{format_message_hits(rows, show_owner=True)}"
+        )
+        if len(response) > 4000:
+            response = response[:3997] + "..."
+        
+        markup = None
+        if state["after"]:
+            markup = InlineKeyboardMarkup([[InlineKeyboardButton("Sonraki ▶️", callback_data="msearch:next")]])
+        return response, markup
+    
+    async def reindex(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        user = update.effective_user
+        
+        if not self.is_admin(user.id):
+            await update.message.reply_text("❌ Bu komutu kullanma yetkiniz yok.")
+            return
+        
+        pending = await self.db.rebuild_search_index()
+        
+        await update.message.reply_text(
+            f"🔄 Arama indeksi yeniden oluşturuluyor. (<code>{pending:,}</code> mesaj arka planda indekslenecek)",
+            parse_mode=ParseMode.HTML
+        )
+        
+        logger.warning_ctx(
+            "Search index rebuild started",
+            user_id=user.id,
+            action="admin_reindex",
+            extra_data={"pending": pending}
+        )
+    
+    async def export(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        user = update.effective_user
+        
+        if not self.is_admin(user.id):
+            await update.message.reply_text("❌ Bu komutu kullanma yetkiniz yok.")
+            return
+        
+        export_help = (
+            "❌ Kullanım: <code>/export messages|usage [jsonl|csv] [hour|day] [user:id] [chat:id] "
+            "[from:YYYY-MM-DD] [to:YYYY-MM-DD]</code>"
+        )
+        if not context.args or context.args[0] not in EXPORT_FIELDS:
+            await update.message.reply_text(export_help, parse_mode=ParseMode.HTML)
+            return
+        
+        kind = context.args[0]
+        fmt, granularity = "jsonl", "day"
+        filters = {}
+        
+        try:
+            for arg in context.args[1:]:
+                if arg in EXPORT_FORMATS:
+                    fmt = arg
+                elif arg in ("hour", "day"):
+                    granularity = arg
+                elif arg.startswith(("user:", "chat:")):
+                    key, _, value = arg.partition(":")
+                    filters[f"{key}_id"] = int(value)
+                elif arg.startswith(("from:", "to:")):
+                    key, _, value = arg.partition(":")
+                    day = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+                    if key == "from":
+                        filters["start"] = int(day.timestamp())
+                    else:
+                        filters["end"] = int((day + timedelta(days=1)).timestamp())
+                else:
+                    raise ValueError(arg)
+        except ValueError:
+            await update.message.reply_text(export_help, parse_mode=ParseMode.HTML)
+            return
+        
+        if self.exporter.busy:
+            await update.message.reply_text("⏳ Başka bir dışa aktarma zaten çalışıyor.")
+            return
+        
+        notice = asyncio.create_task(update.message.reply_text("📦 Dışa aktarma hazırlanıyor..."))
+        result = await self.exporter.export(kind, fmt, granularity=granularity, **filters)
+        await notice
+        
+        summary = (
+            f"<b>📦 Dışa Aktarma:</b> {kind} ({fmt})\n"
+            f"• Satır: <code>{result.rows:,}</code>\n"
+            f"• Boyut: <code>{result.size / 1024 / 1024:.2f} MB</code>\n"
+            f"• Süre: <code>{result.duration:.1f}s</code>"
+        )
+        
+        if result.size > MAX_DOCUMENT_BYTES:
+            await update.message.reply_text(
+                f"{summary}\n\n⚠️ Dosya Telegram sınırını aşıyor, sunucuda bırakıldı: "
+                f"<code>{html.escape(result.path)}</code>",
+                parse_mode=ParseMode.HTML
+            )
+        else:
+            try:
+                with open(result.path, "rb") as f:
+                    await update.message.reply_document(
+                        document=f,
+                        filename=os.path.basename(result.path),
+                        caption=summary,
+                        parse_mode=ParseMode.HTML
+                    )
+            finally:
+                await asyncio.to_thread(os.remove, result.path)
+        
+        logger.info_ctx(
+            "Data exported",
+            user_id=user.id,
+            action="admin_export",
+            extra_data={"kind": kind, "format": fmt, "rows": result.rows, "bytes": result.size, **filters}
+        )
+    
     async def health(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         user = update.effective_user
         
@@ -150,12 +480,28 @@ class AdminHandler:
         health_status = "✅ Healthy"
         
         try:
-            global_stats = await self.db.get_global_stats()
+            await self.db.ping()
             db_status = "✅ Connected"
         except Exception:
             db_status = "❌ Error"
             health_status = "⚠️ Degraded"
         
+        loop = self.loop_monitor.snapshot()
+        if not loop["running"]:
+            loop_status = "⚪ Disabled"
+        elif loop["lag_p99"] >= self.loop_monitor.slow_threshold:
+            loop_status = "⚠️ Lagging"
+            health_status = "⚠️ Degraded"
+        else:
+            loop_status = "✅ Responsive"
+        
+        last_slow = loop["last_slow_callback"]
+        last_slow_text = (
+            f"\n• Son Yavaş Callback: <code>{last_slow.duration * 1000:.0f} ms</code> "
+            f"<code>{html.escape(last_slow.stack[0]) if last_slow.stack else '?'}</code>"
+            if last_slow else ""
+        )
+        
         health_message = f"""
 <b>🏥 Health Check</b>
 
@@ -165,6 +511,177 @@ class AdminHandler:
 • Database: {db_status}
 • Bot: ✅ Running
 • Rate Limiter: ✅ Active
+• Event Loop: {loop_status}
+
+<b>🔹 Event Loop:</b>
+• Gecikme p50/p99/max: <code>{loop['lag_p50'] * 1000:.1f} / {loop['lag_p99'] * 1000:.1f} / {loop['lag_max'] * 1000:.1f} ms</code>
+• Yavaş Callback: <code>{loop['slow_callbacks']}</code>{last_slow_text}
 """
         
         await update.message.reply_text(health_message, parse_mode=ParseMode.HTML)
+    
+    async def traces(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        user = update.effective_user
+        
+        if not self.is_admin(user.id):
+            await update.message.reply_text("❌ Bu komutu kullanma yetkiniz yok.")
+            return
+        
+        try:
+            limit = int(context.args[0]) if context.args else 5
+        except ValueError:
+            await update.message.reply_text("❌ Kullanım: <code>/traces [adet]</code>", parse_mode=ParseMode.HTML)
+            return
+        limit = max(1, min(limit, 20))
+        
+        buffer = get_trace_buffer()
+        slowest = buffer.slowest(limit)
+        
+        if not slowest:
+            await update.message.reply_text("❌ Henüz kayıtlı trace yok.")
+            return
+        
+        parts = [f"<b>🐢 En Yavaş {len(slowest)} İstek</b> (son {len(buffer)} kayıt)"]
+        for trace in slowest:
+            spans = "\n".join(
+                f"{'  ' * item.depth}• {item.name}: <code>{item.duration_ms:.1f} ms</code>"
+                for item in trace.spans
+            )
+            parts.append(
+                f"<b>{trace.name}</b> <code>{trace.trace_id}</code> — <code>{trace.duration_ms:.1f} ms</code>\n{spans}"
+            )
+        
+        response = "\n\n".join(parts)
+        if len(response) > 4000:
+            response = response[:3997] + "..."
+        
+        await update.message.reply_text(response, parse_mode=ParseMode.HTML)
+        
+        logger.info_ctx(
+            "Traces viewed",
+            user_id=user.id,
+            action="admin_traces",
+            extra_data={"limit": limit}
+        )
+    
+    async def profile(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        user = update.effective_user
+        
+        if not self.is_admin(user.id):
+            await update.message.reply_text("❌ Bu komutu kullanma yetkiniz yok.")
+            return
+        
+        try:
+            seconds = int(context.args[0]) if context.args else 10
+        except ValueError:
+            await update.message.reply_text(
+                "❌ Kullanım: <code>/profile [saniye] [sampling|cprofile]</code>",
+                parse_mode=ParseMode.HTML
+            )
+            return
+        
+        mode = context.args[1].lower() if len(context.args) > 1 else "sampling"
+        if mode not in ("sampling", "cprofile"):
+            await update.message.reply_text("❌ Geçersiz mod. <code>sampling</code> veya <code>cprofile</code> kullanın.", parse_mode=ParseMode.HTML)
+            return
+        
+        if self.profiler.busy:
+            await update.message.reply_text("⏳ Zaten çalışan bir profil oturumu var.")
+            return
+        
+        seconds = max(1, min(seconds, self.profiler.max_seconds))
+        await update.message.reply_text(f"⏱️ {seconds} saniyelik profil başlatıldı ({mode})...")
+        
+        logger.info_ctx(
+            "Profiling started",
+            user_id=user.id,
+            action="admin_profile_start",
+            extra_data={"seconds": seconds, "mode": mode}
+        )
+        
+        result = await self.profiler.run(seconds, mode=mode)
+        
+        if result.mode == "sampling":
+            rows = "\n".join(
+                f"• <code>{cumulative:6.1%} {own:6.1%}</code> {html.escape(name)}"
+                for name, cumulative, own in result.top
+            )
+            header = (
+                f"Örnek: <code>{result.samples}</code> • Boşta: <code>{result.idle_ratio:.1%}</code>\n"
+                f"Ek yük: <code>{result.overhead_ratio:.2%}</code> CPU\n\n"
+                f"<b>Kümülatif / Kendi (meşgul örneklerin yüzdesi):</b>"
+            )
+        else:
+            rows = "\n".join(
+                f"• <code>{cumulative:8.3f}s {own:8.3f}s</code> {html.escape(name)}"
+                for name, cumulative, own in result.top
+            )
+            header = (
+                f"Çağrı: <code>{result.samples:,}</code>\n"
+                f"Tahmini ek yük: <code>{result.overhead_ratio:.2%}</code>\n\n"
+                f"<b>Kümülatif / Kendi süre:</b>"
+            )
+        
+        response = (
+            f"<b>🔬 Profil Sonucu ({result.mode}, {result.seconds:.1f}s)</b>\n\n"
+            f"{header}\n{rows or 'Kayıt yok'}\n\n"
+            f"Dosya: <code>{html.escape(result.path)}</code>"
+        )
+        if len(response) > 4000:
+            response = response[:3997] + "..."
+        
+        await update.message.reply_text(response, parse_mode=ParseMode.HTML)
+        
+        logger.info_ctx(
+            "Profiling finished",
+            user_id=user.id,
+            action="admin_profile",
+            extra_data={
+                "mode": result.mode,
+                "seconds": round(result.seconds, 2),
+                "samples": result.samples,
+                "overhead_ratio": round(result.overhead_ratio, 4),
+                "path": result.path
+            }
+        )
+    
+    async def prune(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        user = update.effective_user
+        
+        if not self.is_admin(user.id):
+            await update.message.reply_text("❌ Bu komutu kullanma yetkiniz yok.")
+            return
+        
+        if not self.retention.enabled:
+            await update.message.reply_text("⚪ Mesaj saklama limiti tanımlı değil.")
+            return
+        
+        if self.retention.busy:
+            await update.message.reply_text("⏳ Temizlik zaten çalışıyor.")
+            return
+        
+        await update.message.reply_text("🧹 Eski mesajlar temizleniyor...")
+        result = await self.retention.run()
+        
+        status = "✅ Tamamlandı" if result.complete else "⏳ Kısmi (sonraki çalışmada devam edecek)"
+        response = f"""
+<b>🧹 Mesaj Temizliği</b>
+
+<b>Durum:</b> {status}
+
+• Yaşa Göre Silinen: <code>{result.pruned_by_age:,}</code>
+• Limite Göre Silinen: <code>{result.pruned_by_cap:,}</code>
+• Arşivlenen: <code>{result.archived:,}</code>
+• Geri Kazanılan: <code>{result.bytes_reclaimed / 1024 / 1024:.2f} MB</code>
+• Boş Alan: <code>{result.free_bytes / 1024 / 1024:.2f} MB</code>
+• Süre: <code>{result.duration:.1f}s</code>
+"""
+        
+        await update.message.reply_text(response, parse_mode=ParseMode.HTML)
+        
+        logger.info_ctx(
+            "Manual prune finished",
+            user_id=user.id,
+            action="admin_prune",
+            extra_data={"pruned": result.pruned, "bytes_reclaimed": result.bytes_reclaimed}
+        )
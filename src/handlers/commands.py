@@ -1,28 +1,46 @@
-from telegram import Update
+import html
+from typing import Optional
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
-from src.services import SearchService
+from src.services import ConversationMemory, SearchService
 from src.database import Database
-from src.utils import RateLimiter, get_logger
-from src.utils.helpers import format_search_results
+from src.utils import BanList, RateLimiter, TokenQuota, get_logger
+from src.utils.helpers import format_message_hits, format_search_results
+from src.utils.inflight import InFlightRegistry
+from src.utils.tracing import traced, span, set_trace_attrs
 
 logger = get_logger("command_handler")
 
+HISTORY_PAGE_SIZE = 5
+HISTORY_SEARCHES_KEPT = 20
+
 
 class CommandHandler:
     def __init__(
         self,
         search_service: SearchService,
         database: Database,
-        rate_limiter: RateLimiter
+        rate_limiter: RateLimiter,
+        token_quota: TokenQuota,
+        ban_list: BanList,
+        memory: ConversationMemory,
+        inflight: InFlightRegistry
     ):
         self.search = search_service
         self.db = database
         self.rate_limiter = rate_limiter
+        self.token_quota = token_quota
+        self.ban_list = ban_list
+        self.memory = memory
+        self.inflight = inflight
     
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         user = update.effective_user
         
+        if self.ban_list.is_banned(user.id, "command"):
+            return
+        
         await self.db.get_or_create_user(
             user_id=user.id,
             username=user.username or "",
@@ -44,6 +62,7 @@ Ben yapay zeka destekli bir asistanım. Sana yardımcı olmak için buradayım.
 • /help - Yardım menüsü
 • /search - Web araması
 • /clear - Sohbet geçmişini temizle
+• /history - Geçmiş sohbetlerde ara
 • /stats - Kullanım istatistiklerin
 
 <b>🔹 Özellikler:</b>
@@ -73,6 +92,7 @@ Ben yapay zeka destekli bir asistanım. Sana yardımcı olmak için buradayım.
 • /help - Bu yardım menüsü
 • /search [sorgu] - Web'de arama yap
 • /clear - Sohbet geçmişini temizle
+• /history [sorgu] - Geçmiş sohbetlerde ara
 • /stats - Kullanım istatistiklerin
 
 <b>🔹 İpuçları:</b>
@@ -83,8 +103,13 @@ Ben yapay zeka destekli bir asistanım. Sana yardımcı olmak için buradayım.
         
         await update.message.reply_text(help_message, parse_mode=ParseMode.HTML)
     
+    @traced("command_search")
     async def search(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         user = update.effective_user
+        
+        if self.ban_list.is_banned(user.id, "command"):
+            return
+        
         chat = update.effective_chat
         
         if not context.args:
@@ -94,12 +119,15 @@ Ben yapay zeka destekli bir asistanım. Sana yardımcı olmak için buradayım.
             )
             return
         
+        set_trace_attrs(user_id=user.id, chat_id=chat.id, update_id=update.update_id, chat_type=chat.type)
+        
         is_group = chat.type in ["group", "supergroup"]
-        allowed, cooldown = await self.rate_limiter.check_rate_limit(
-            user_id=user.id,
-            chat_id=chat.id,
-            is_group=is_group
-        )
+        with span("rate_limit"):
+            allowed, cooldown = await self.rate_limiter.check_rate_limit(
+                user_id=user.id,
+                chat_id=chat.id,
+                is_group=is_group
+            )
         
         if not allowed:
             await update.message.reply_text(
@@ -111,13 +139,15 @@ Ben yapay zeka destekli bir asistanım. Sana yardımcı olmak için buradayım.
         
         await update.message.reply_text(f"🔍 <b>Aranıyor:</b> {query}", parse_mode=ParseMode.HTML)
         
-        results = await self.search.search_web(query, max_results=5)
+        with span("web_search"):
+            results = await self.search.search([query], news=self.search.is_news_query(query))
         
         if not results:
             await update.message.reply_text("❌ Arama sonucu bulunamadı.")
             return
         
         await self.db.update_stats(user.id, searches=1)
+        await self.db.record_usage(user.id, chat.id, searches=1)
         
         formatted = format_search_results(results)
         response = f"<b>🔍 Arama Sonuçları: {query}</b>\n\n{formatted}"
@@ -125,7 +155,8 @@ Ben yapay zeka destekli bir asistanım. Sana yardımcı olmak için buradayım.
         if len(response) > 4000:
             response = response[:3997] + "..."
         
-        await update.message.reply_text(response, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+        with span("reply"):
+            await update.message.reply_text(response, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
         
         logger.info_ctx(
             f"Search command executed",
@@ -137,9 +168,15 @@ Ben yapay zeka destekli bir asistanım. Sana yardımcı olmak için buradayım.
     
     async def clear(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         user = update.effective_user
+        
+        if self.ban_list.is_banned(user.id, "command"):
+            return
+        
         chat = update.effective_chat
         
+        self.inflight.clear(user.id, chat.id)
         deleted = await self.db.clear_conversation(user.id, chat.id)
+        self.memory.forget(user.id, chat.id)
         
         await update.message.reply_text(
             f"🗑️ Sohbet geçmişi temizlendi. ({deleted} mesaj silindi)"
@@ -153,11 +190,99 @@ Ben yapay zeka destekli bir asistanım. Sana yardımcı olmak için buradayım.
             extra_data={"deleted_count": deleted}
         )
     
+    async def history(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        user = update.effective_user
+        
+        if self.ban_list.is_banned(user.id, "command"):
+            return
+        
+        chat = update.effective_chat
+        
+        if not context.args:
+            await update.message.reply_text(
+                "❌ Arama sorgusu belirtmelisiniz.\n\nKullanım: <code>/history sorgunuz</code>",
+                parse_mode=ParseMode.HTML
+            )
+            return
+        
+        state = {
+            "query": " ".join(context.args),
+            "user_id": user.id,
+            "chat_id": None if chat.type == "private" else chat.id,
+            "after": None
+        }
+        text, markup = await self._history_page(state)
+        sent = await update.message.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=markup)
+        
+        if state["after"]:
+            searches = context.user_data.setdefault("history_search", {})
+            searches[sent.message_id] = state
+            while len(searches) > HISTORY_SEARCHES_KEPT:
+                searches.pop(next(iter(searches)))
+        
+        logger.info_ctx(
+            "History searched",
+            user_id=user.id,
+            chat_id=chat.id,
+            action="command_history",
+            extra_data={"query": state["query"]}
+        )
+    
+    async def history_next(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        query = update.callback_query
+        
+        if self.ban_list.is_banned(query.from_user.id, "command"):
+            await query.answer()
+            return
+        
+        searches = context.user_data.get("history_search", {})
+        state = searches.get(query.message.message_id)
+        
+        if not state or not state["after"]:
+            await query.answer("Arama süresi doldu, lütfen tekrar arayın.")
+            return
+        
+        await query.answer()
+        text, markup = await self._history_page(state)
+        if not state["after"]:
+            searches.pop(query.message.message_id, None)
+        await query.edit_message_text(text, parse_mode=ParseMode.HTML, reply_markup=markup)
+    
+    async def _history_page(self, state: dict) -> tuple[str, Optional[InlineKeyboardMarkup]]:
+        rows, state["after"] = await self.db.search_messages(
+            state["query"],
+            user_id=state["user_id"],
+            chat_id=state["chat_id"],
+            limit=HISTORY_PAGE_SIZE,
+            after=state["after"]
+        )
+        
+        if not rows:
+            return "❌ Eşleşen mesaj bulunamadı.", None
+        
+        response = f"<b>🗂 Geçmiş: {html.escape(state['query'])}</b>\n\n{format_message_hits(rows)}"
+        if len(response) > 4000:
+            response = response[:3997] + "..."
+        
+        markup = None
+        if state["after"]:
+            markup = InlineKeyboardMarkup([[InlineKeyboardButton("Sonraki ▶️", callback_data="history:next")]])
+        return response, markup
+    
+    def _format_quota(self, remaining, limit: int) -> str:
+        if remaining is None:
+            return "Sınırsız"
+        return f"{remaining:,}/{limit:,}"
+    
     async def stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         user = update.effective_user
         
+        if self.ban_list.is_banned(user.id, "command"):
+            return
+        
         user_stats = await self.db.get_user_stats(user.id)
         usage = await self.rate_limiter.get_user_usage(user.id)
+        quota = await self.token_quota.get_user_quota(user.id)
         
         if not user_stats:
             await update.message.reply_text("❌ İstatistik bulunamadı.")
@@ -176,6 +301,10 @@ Ben yapay zeka destekli bir asistanım. Sana yardımcı olmak için buradayım.
 • Kullanılan: <code>{usage['used']}/{usage['limit']}</code>
 • Kalan: <code>{usage['remaining']}</code>
 • Pencere: <code>{usage['window_seconds']} saniye</code>
+
+<b>🔹 Token Kotası:</b>
+• Dakikalık Kalan: <code>{self._format_quota(quota['minute_remaining'], quota['minute_limit'])}</code>
+• Günlük Kalan: <code>{self._format_quota(quota['day_remaining'], quota['day_limit'])}</code>
 """
         
         await update.message.reply_text(stats_message, parse_mode=ParseMode.HTML)
@@ -1,10 +1,16 @@
+import time
+from typing import Optional
 from telegram import Update
 from telegram.ext import ContextTypes
-from telegram.constants import ChatAction, ParseMode
-from src.services import AIService, SearchService
+from telegram.constants import ParseMode
+from src.services import AIService, ConversationMemory, MentionBatcher, SearchService
 from src.database import Database
-from src.utils import RateLimiter, get_logger
+from src.utils import BanList, RateLimiter, SendScheduler, StartupTracker, TokenQuota, UpdateTracker, get_logger
+from src.utils.ban_list import BANNED_DROPPED
+from src.utils.deadline import DEADLINE_SKIPPED, DeadlineExceeded, deadline_scope, has_budget, record_miss, reserve_budget, within_deadline
+from src.utils.inflight import GenerationCancelled, InFlightRegistry
 from src.utils.helpers import extract_bot_mention, is_reply_to_bot, truncate_text
+from src.utils.tracing import traced, span, set_trace_attrs, current_trace
 
 logger = get_logger("message_handler")
 
@@ -16,17 +22,44 @@ class MessageHandler:
         search_service: SearchService,
         database: Database,
         rate_limiter: RateLimiter,
+        token_quota: TokenQuota,
+        ban_list: BanList,
+        memory: ConversationMemory,
+        batcher: MentionBatcher,
+        sender: SendScheduler,
+        updates: UpdateTracker,
+        inflight: InFlightRegistry,
         bot_username: str,
-        context_window: int
+        context_window: int,
+        request_deadline: float = 0,
+        deadline_llm_reserve: float = 0,
+        deadline_search_min: float = 0,
+        startup: Optional[StartupTracker] = None
     ):
         self.ai = ai_service
         self.search = search_service
         self.db = database
         self.rate_limiter = rate_limiter
+        self.token_quota = token_quota
+        self.ban_list = ban_list
+        self.memory = memory
+        self.batcher = batcher
+        self.sender = sender
+        self.updates = updates
+        self.inflight = inflight
         self.bot_username = bot_username
         self.context_window = context_window
+        self.request_deadline = request_deadline
+        self.deadline_llm_reserve = deadline_llm_reserve
+        self.deadline_search_min = deadline_search_min
+        self.startup = startup
     
+    @traced("message")
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        with deadline_scope(self.request_deadline):
+            await self._handle_message(update, context)
+    
+    async def _handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         message = update.effective_message
         user = update.effective_user
         chat = update.effective_chat
@@ -41,6 +74,9 @@ class MessageHandler:
         if not is_reply and mentioned_text is None:
             return
         
+        if self.ban_list.is_banned(user.id, "message"):
+            return
+        
         user_message = mentioned_text if mentioned_text else message.text
         
         if is_reply and not mentioned_text:
@@ -49,36 +85,78 @@ class MessageHandler:
         if not user_message.strip():
             return
         
-        db_user = await self.db.get_or_create_user(
-            user_id=user.id,
-            username=user.username or "",
-            first_name=user.first_name,
-            last_name=user.last_name or ""
-        )
-        
-        if db_user.is_banned:
-            logger.warning_ctx(
-                "Banned user attempted to use bot",
+        if not self.updates.claim(update.update_id):
+            logger.info_ctx(
+                "Duplicate update dropped",
                 user_id=user.id,
                 chat_id=chat.id,
-                action="banned_attempt"
+                action="update_duplicate",
+                extra_data={"update_id": update.update_id}
             )
             return
         
-        is_group = chat.type in ["group", "supergroup"]
-        allowed, cooldown = await self.rate_limiter.check_rate_limit(
+        if self.updates.is_stale(message.date):
+            if self.updates.stale_notify:
+                self.sender.reply(
+                    message,
+                    "🕒 Bu mesaj bot çevrimdışıyken gönderildi. Hâlâ gerekiyorsa lütfen tekrar sorun."
+                )
+            return
+        
+        set_trace_attrs(
             user_id=user.id,
             chat_id=chat.id,
-            is_group=is_group
+            update_id=update.update_id,
+            chat_type=chat.type,
+            is_reply=is_reply,
+            message_length=len(user_message)
         )
         
+        with span("load_user"):
+            db_user = await self.db.get_or_create_user(
+                user_id=user.id,
+                username=user.username or "",
+                first_name=user.first_name,
+                last_name=user.last_name or ""
+            )
+        
+        if db_user.is_banned:
+            BANNED_DROPPED.labels("message").inc()
+            return
+        
+        is_group = chat.type in ["group", "supergroup"]
+        with span("rate_limit"):
+            allowed, cooldown = await self.rate_limiter.check_rate_limit(
+                user_id=user.id,
+                chat_id=chat.id,
+                is_group=is_group
+            )
+        
         if not allowed:
-            await message.reply_text(
+            self.sender.reply(
+                message,
                 f"⏳ Rate limit aşıldı. Lütfen {cooldown} saniye bekleyin.",
                 parse_mode=ParseMode.HTML
             )
             return
         
+        reserved = self.ai.estimate_request_tokens(user_message)
+        with span("token_quota"):
+            allowed, cooldown = await self.token_quota.check_quota(
+                user_id=user.id,
+                chat_id=chat.id,
+                is_group=is_group,
+                estimated_tokens=reserved
+            )
+        
+        if not allowed:
+            self.sender.reply(
+                message,
+                f"⏳ Token kotası aşıldı. Lütfen {cooldown} saniye bekleyin.",
+                parse_mode=ParseMode.HTML
+            )
+            return
+        
         logger.info_ctx(
             f"Processing message",
             user_id=user.id,
@@ -87,65 +165,85 @@ class MessageHandler:
             extra_data={"message_length": len(user_message)}
         )
         
-        await context.bot.send_chat_action(chat_id=chat.id, action=ChatAction.TYPING)
+        with span("typing"):
+            await self.sender.typing(context.bot, chat.id, is_group)
         
         try:
-            search_results = None
-            if await self.ai.should_search(user_message):
-                search_query = await self.ai.extract_search_query(user_message)
-                logger.info_ctx(
-                    f"Search query extracted",
+            started = time.monotonic()
+            response, tokens_used, search_results = await self.inflight.run(
+                user.id, chat.id, self._generate(user.id, chat.id, user_message, is_group)
+            )
+            set_trace_attrs(tokens=tokens_used)
+            
+            with span("persist"):
+                await self.token_quota.charge(
+                    user_id=user.id,
+                    chat_id=chat.id,
+                    is_group=is_group,
+                    tokens=tokens_used,
+                    reserved=reserved
+                )
+                reserved = 0
+                
+                if self.inflight.cleared_since(user.id, chat.id, started):
+                    raise GenerationCancelled("clear")
+                
+                await self.db.add_exchange(
+                    user_id=user.id,
+                    chat_id=chat.id,
+                    user_message=user_message,
+                    response=response,
+                    tokens_used=tokens_used,
+                    update_id=update.update_id
+                )
+                
+                if self.inflight.cleared_since(user.id, chat.id, started):
+                    raise GenerationCancelled("clear")
+                
+                self.memory.remember(user.id, chat.id, "user", user_message)
+                self.memory.remember(user.id, chat.id, "assistant", response)
+                
+                await self.db.update_stats(
                     user_id=user.id,
-                    action="search_query",
-                    extra_data={"original": user_message[:50], "query": search_query}
+                    messages=1,
+                    tokens=tokens_used,
+                    searches=1 if search_results else 0
+                )
+                
+                await self.db.record_usage(
+                    user_id=user.id,
+                    chat_id=chat.id,
+                    messages=1,
+                    tokens=tokens_used,
+                    searches=1 if search_results else 0,
+                    latency_ms=current_trace().duration_ms
                 )
-                search_results = await self.search.search_web(search_query)
-                if search_results:
-                    await self.db.update_stats(user.id, searches=1)
             
-            conversation_history = await self.db.get_conversation_history(
-                user_id=user.id,
-                chat_id=chat.id,
-                limit=self.context_window
-            )
+            response = truncate_text(response, 4000)
             
-            response, tokens_used = await self.ai.generate_response(
-                user_message=user_message,
-                conversation_history=conversation_history,
-                search_results=search_results
-            )
+            with span("reply"):
+                delivery = self.sender.reply(message, response)
             
-            await self.db.add_message(
-                user_id=user.id,
-                chat_id=chat.id,
-                role="user",
-                content=user_message
+            received = current_trace().start
+            delivery.add_done_callback(
+                lambda done: self._delivered(done, user.id, chat.id, tokens_used, received)
             )
             
-            await self.db.add_message(
+        except GenerationCancelled as e:
+            set_trace_attrs(cancelled=e.reason)
+            logger.info_ctx(
+                "Superseded message dropped",
                 user_id=user.id,
                 chat_id=chat.id,
-                role="assistant",
-                content=response,
-                tokens_used=tokens_used
+                action="message_cancelled",
+                extra_data={"reason": e.reason}
             )
             
-            await self.db.update_stats(
-                user_id=user.id,
-                messages=1,
-                tokens=tokens_used
-            )
-            
-            response = truncate_text(response, 4000)
-            
-            await message.reply_text(response)
-            
-            logger.info_ctx(
-                "Response sent",
-                user_id=user.id,
-                chat_id=chat.id,
-                action="response_sent",
-                extra_data={"tokens": tokens_used}
+        except DeadlineExceeded as e:
+            record_miss(e.stage, user_id=user.id, chat_id=chat.id)
+            self.sender.reply(
+                message,
+                "⌛ Yanıt zamanında hazırlanamadı. Lütfen tekrar deneyin."
             )
             
         except Exception as e:
@@ -155,6 +253,108 @@ class MessageHandler:
                 chat_id=chat.id,
                 action="message_error"
             )
-            await message.reply_text(
+            self.sender.reply(
+                message,
                 "❌ Bir hata oluştu. Lütfen daha sonra tekrar deneyin."
             )
+            
+        finally:
+            if reserved:
+                await self.token_quota.release(user.id, chat.id, is_group, reserved)
+    
+    def _delivered(self, delivery, user_id: int, chat_id: int, tokens: int, received: float) -> None:
+        if delivery.cancelled() or delivery.result() is None:
+            logger.error_ctx(
+                "Response not delivered",
+                user_id=user_id,
+                chat_id=chat_id,
+                action="response_failed",
+                extra_data={"tokens": tokens}
+            )
+            return
+        
+        latency = time.perf_counter() - received
+        if self.startup:
+            self.startup.record_reply(latency, user_id, chat_id)
+        
+        logger.info_ctx(
+            "Response sent",
+            user_id=user_id,
+            chat_id=chat_id,
+            action="response_sent",
+            extra_data={"tokens": tokens, "latency_ms": round(latency * 1000, 1)}
+        )
+    
+    async def _generate(self, user_id: int, chat_id: int, user_message: str, is_group: bool) -> tuple[str, int, Optional[list[dict]]]:
+        batched = is_group and self.batcher.enabled
+        if batched:
+            with span("batch"):
+                search_results, conversation_history, batch_size = await within_deadline(
+                    "batch", self.batcher.submit(chat_id=chat_id, user_id=user_id, text=user_message)
+                )
+            set_trace_attrs(batch_size=batch_size)
+        else:
+            search_results = await self._search(user_id, user_message)
+            with span("history"):
+                conversation_history = await within_deadline("history", self.db.get_conversation_history(
+                    user_id=user_id,
+                    chat_id=chat_id,
+                    limit=self.context_window
+                ))
+        
+        set_trace_attrs(searched=bool(search_results))
+        
+        with span("memory"):
+            memories = await within_deadline("memory", self.memory.recall(
+                user_id=user_id,
+                chat_id=chat_id,
+                query=user_message,
+                exclude_recent=self.ai.prompts.history_size(conversation_history, (user_id, chat_id))
+            ))
+        set_trace_attrs(memories=len(memories))
+        
+        with span("llm"):
+            async with self.batcher.llm_slot(batched):
+                response, tokens_used = await self.ai.generate_response(
+                    user_message=user_message,
+                    conversation_history=conversation_history,
+                    search_results=search_results,
+                    memories=memories,
+                    conversation=(user_id, chat_id),
+                    stream=self.inflight.enabled
+                )
+        
+        return response, tokens_used, search_results
+    
+    async def _search(self, user_id: int, user_message: str) -> Optional[list[dict]]:
+        with span("search"):
+            with span("should_search"):
+                needs_search = await self.ai.should_search(user_message)
+            if not needs_search:
+                return None
+            
+            if not has_budget(self.deadline_search_min + self.deadline_llm_reserve):
+                DEADLINE_SKIPPED.labels("search").inc()
+                set_trace_attrs(search_skipped=True)
+                return None
+            
+            try:
+                with reserve_budget(self.deadline_llm_reserve):
+                    with span("extract_query"):
+                        search_query = await within_deadline(
+                            "extract_query", self.ai.extract_search_query(user_message)
+                        )
+                    logger.info_ctx(
+                        f"Search query extracted",
+                        user_id=user_id,
+                        action="search_query",
+                        extra_data={"original": user_message[:50], "query": search_query}
+                    )
+                    with span("web_search"):
+                        return await self.search.search(
+                            [search_query, user_message],
+                            news=self.search.is_news_query(user_message)
+                        )
+            except DeadlineExceeded as e:
+                record_miss(e.stage, user_id=user_id, fatal=False)
+                return None
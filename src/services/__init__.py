@@ -1,4 +1,9 @@
 from .ai import AIService
+from .batcher import MentionBatcher
+from .export import ExportService, ExportResult
+from .prompt import PromptBuilder
 from .search import SearchService
+from .memory import ConversationMemory
+from .retention import RetentionService, RetentionResult
 
-__all__ = ["AIService", "SearchService"]
+__all__ = ["AIService", "MentionBatcher", "PromptBuilder", "SearchService", "ConversationMemory", "RetentionService", "RetentionResult", "ExportService", "ExportResult"]
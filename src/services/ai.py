@@ -1,95 +1,272 @@
+import asyncio
+import importlib
 import re
-from openai import AsyncOpenAI
+import time
 from typing import AsyncGenerator, Optional
 from src.utils import get_logger
-from src.utils.helpers import format_search_context
+from src.utils.deadline import DeadlineExceeded, current_deadline, remaining_time, within_deadline
+from src.utils.helpers import estimate_tokens
+from src.utils.metrics import counter, histogram
+from .prompt import PromptBuilder
 
 logger = get_logger("ai_service")
 
+DEADLINE_MIN_TOKENS = 128
+COMPLETION_SMOOTHING = 0.1
+
+LLM_TTFT_SECONDS = histogram(
+    "bot_llm_ttft_seconds", "Time until the first LLM token arrives in seconds", ("mode",)
+)
+LLM_SECONDS = histogram(
+    "bot_llm_seconds", "Total LLM call latency in seconds", ("mode",)
+)
+LLM_TOKENS = counter(
+    "bot_llm_tokens_total", "Tokens reported by the LLM API", ("mode",)
+)
+LLM_MAX_TOKENS_REDUCED = counter(
+    "bot_llm_max_tokens_reduced_total", "LLM calls whose max_tokens was lowered to fit the remaining deadline"
+)
+LLM_PROMPT_TOKENS = counter(
+    "bot_llm_prompt_tokens_total", "Prompt tokens reported by the LLM API", ("cache",)
+)
+LLM_CANCELLED = counter(
+    "bot_llm_cancelled_total", "LLM calls aborted because their request was cancelled", ("mode",)
+)
+LLM_TOKENS_SAVED = counter(
+    "bot_llm_tokens_saved_total", "Estimated completion tokens not generated because the LLM call was aborted", ("mode",)
+)
+
 
 class AIService:
-    def __init__(self, api_key: str, base_url: str, model: str, max_tokens: int, system_prompt: str):
-        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        model: str,
+        max_tokens: int,
+        system_prompt: str,
+        prompt_builder: Optional[PromptBuilder] = None,
+        tokens_per_second: float = 0,
+        keepalive_seconds: float = 5.0
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.keepalive_seconds = keepalive_seconds
+        self._client = None
         self.model = model
         self.max_tokens = max_tokens
         self.system_prompt = system_prompt
+        self.prompts = prompt_builder or PromptBuilder(system_prompt)
+        self.tokens_per_second = tokens_per_second
+        self.expected_completion_tokens = 0.0
+    
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+            
+            limits = httpx.Limits(max_connections=1000, max_keepalive_connections=100, keepalive_expiry=self.keepalive_seconds)
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=DefaultAsyncHttpxClient(limits=limits)
+            )
+        return self._client
+    
+    async def warm_up(self, timeout: float) -> bool:
+        await asyncio.to_thread(importlib.import_module, "openai")
+        try:
+            await asyncio.wait_for(self.client.models.list(), timeout)
+            return True
+        except Exception as e:
+            logger.warning_ctx(
+                f"LLM connection warm-up failed: {str(e)}",
+                action="warm_up_llm_error",
+                extra_data={"timeout": timeout}
+            )
+            return False
     
     async def generate_response(
         self,
         user_message: str,
         conversation_history: list[dict],
-        search_results: Optional[list[dict]] = None
+        search_results: Optional[list[dict]] = None,
+        memories: Optional[list[dict]] = None,
+        conversation: Optional[tuple[int, int]] = None,
+        stream: bool = False
     ) -> tuple[str, int]:
-        messages = [{"role": "system", "content": self.system_prompt}]
-        
-        if search_results:
-            search_context = format_search_context(search_results)
-            messages.append({
-                "role": "system",
-                "content": f"Kullanıcının sorusuyla ilgili güncel web arama sonuçları:\n\n{search_context}\n\nBu bilgileri kullanarak yanıt ver ve gerekirse kaynaklara atıfta bulun."
-            })
-        
-        messages.extend(conversation_history)
-        messages.append({"role": "user", "content": user_message})
+        prompt = self.prompts.build(user_message, conversation_history, search_results, memories, conversation)
+        messages = prompt.messages
+        mode = "stream" if stream else "complete"
         
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=self.max_tokens,
-                temperature=0.7
-            )
+            start = time.perf_counter()
+            max_tokens = self._token_budget()
+            if stream:
+                content, usage, chunks = await self._stream_completion(messages, max_tokens, start)
+            else:
+                response = await within_deadline("llm", self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=0.7
+                ))
+                LLM_TTFT_SECONDS.labels(mode).observe(time.perf_counter() - start)
+                content = response.choices[0].message.content or ""
+                usage, chunks = response.usage, 0
+            LLM_SECONDS.labels(mode).observe(time.perf_counter() - start)
             
-            content = response.choices[0].message.content or ""
-            tokens_used = response.usage.total_tokens if response.usage else 0
+            if usage:
+                tokens_used = usage.total_tokens
+                self._observe_completion(usage.completion_tokens or 0)
+            else:
+                tokens_used = sum(estimate_tokens(message["content"]) for message in messages) + chunks if stream else 0
+            LLM_TOKENS.labels(mode).inc(tokens_used)
+            cached_tokens = self._record_prompt_tokens(usage)
             
             logger.info_ctx(
                 "AI response generated",
                 action="ai_response",
-                extra_data={"model": self.model, "tokens": tokens_used}
+                extra_data={
+                    "model": self.model,
+                    "mode": mode,
+                    "tokens": tokens_used,
+                    "max_tokens": max_tokens,
+                    "cached_tokens": cached_tokens,
+                    "prefix_reuse": round(prompt.reuse_ratio, 3)
+                }
             )
             
             return content, tokens_used
             
+        except asyncio.CancelledError:
+            if not stream:
+                self._record_cancelled("complete", 0)
+            raise
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error_ctx(f"AI generation error: {str(e)}", action="ai_error")
             raise
     
+    async def _stream_completion(self, messages: list[dict], max_tokens: int, start: float) -> tuple[str, Optional[object], int]:
+        stream = None
+        parts: list[str] = []
+        usage = None
+        try:
+            stream = await within_deadline("llm", self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=0.7,
+                stream=True,
+                stream_options={"include_usage": True}
+            ))
+            
+            async for chunk in stream:
+                deadline = current_deadline()
+                if deadline and deadline.expired:
+                    await stream.close()
+                    raise DeadlineExceeded("llm")
+                if chunk.usage:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if not parts:
+                        LLM_TTFT_SECONDS.labels("stream").observe(time.perf_counter() - start)
+                    parts.append(chunk.choices[0].delta.content)
+            
+            return "".join(parts), usage, len(parts)
+            
+        except asyncio.CancelledError:
+            if stream is not None:
+                await stream.close()
+            self._record_cancelled("stream", len(parts))
+            raise
+    
     async def generate_response_stream(
         self,
         user_message: str,
         conversation_history: list[dict],
-        search_results: Optional[list[dict]] = None
+        search_results: Optional[list[dict]] = None,
+        memories: Optional[list[dict]] = None,
+        conversation: Optional[tuple[int, int]] = None
     ) -> AsyncGenerator[str, None]:
-        messages = [{"role": "system", "content": self.system_prompt}]
-        
-        if search_results:
-            search_context = format_search_context(search_results)
-            messages.append({
-                "role": "system",
-                "content": f"Kullanıcının sorusuyla ilgili güncel web arama sonuçları:\n\n{search_context}\n\nBu bilgileri kullanarak yanıt ver."
-            })
-        
-        messages.extend(conversation_history)
-        messages.append({"role": "user", "content": user_message})
+        prompt = self.prompts.build(user_message, conversation_history, search_results, memories, conversation)
+        messages = prompt.messages
         
+        stream = None
+        generated = 0
         try:
-            stream = await self.client.chat.completions.create(
+            start = time.perf_counter()
+            first_token = True
+            stream = await within_deadline("llm", self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
-                max_tokens=self.max_tokens,
+                max_tokens=self._token_budget(),
                 temperature=0.7,
                 stream=True
-            )
+            ))
             
             async for chunk in stream:
-                if chunk.choices[0].delta.content:
+                deadline = current_deadline()
+                if deadline and deadline.expired:
+                    await stream.close()
+                    raise DeadlineExceeded("llm")
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_token:
+                        LLM_TTFT_SECONDS.labels("stream").observe(time.perf_counter() - start)
+                        first_token = False
+                    generated += 1
                     yield chunk.choices[0].delta.content
+            
+            LLM_SECONDS.labels("stream").observe(time.perf_counter() - start)
+            self._observe_completion(generated)
                     
+        except (asyncio.CancelledError, GeneratorExit):
+            if stream is not None:
+                await stream.close()
+            self._record_cancelled("stream", generated)
+            raise
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error_ctx(f"AI stream error: {str(e)}", action="ai_stream_error")
             raise
     
+    def estimate_request_tokens(self, user_message: str) -> int:
+        return estimate_tokens(self.system_prompt) + estimate_tokens(user_message) + self._token_budget()
+    
+    def _token_budget(self) -> int:
+        remaining = remaining_time()
+        if remaining is None or not self.tokens_per_second:
+            return self.max_tokens
+        
+        affordable = int(remaining * self.tokens_per_second)
+        if affordable >= self.max_tokens:
+            return self.max_tokens
+        LLM_MAX_TOKENS_REDUCED.inc()
+        return max(DEADLINE_MIN_TOKENS, affordable)
+    
+    def _observe_completion(self, tokens: int) -> None:
+        if not self.expected_completion_tokens:
+            self.expected_completion_tokens = float(tokens)
+        else:
+            self.expected_completion_tokens += COMPLETION_SMOOTHING * (tokens - self.expected_completion_tokens)
+    
+    def _record_cancelled(self, mode: str, generated: int) -> None:
+        LLM_CANCELLED.labels(mode).inc()
+        LLM_TOKENS_SAVED.labels(mode).inc(max(0, int(self.expected_completion_tokens) - generated))
+    
+    def _record_prompt_tokens(self, usage) -> int:
+        if not usage:
+            return 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        LLM_PROMPT_TOKENS.labels("hit").inc(cached)
+        LLM_PROMPT_TOKENS.labels("miss").inc(max(0, (usage.prompt_tokens or 0) - cached))
+        return cached
+    
     async def should_search(self, user_message: str) -> bool:
         message_lower = user_message.lower()
         
@@ -134,6 +311,7 @@ class AIService:
     
     async def extract_search_query(self, user_message: str) -> str:
         try:
+            start = time.perf_counter()
             response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
@@ -146,6 +324,7 @@ class AIService:
                 max_tokens=50,
                 temperature=0.3
             )
+            LLM_SECONDS.labels("query_extract").observe(time.perf_counter() - start)
             
             content = response.choices[0].message.content
             if not content:
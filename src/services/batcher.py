@@ -0,0 +1,180 @@
+import asyncio
+import contextlib
+import contextvars
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+from src.database import Database
+from src.utils import get_logger
+from src.utils.deadline import DEADLINE_SKIPPED, DeadlineExceeded, current_deadline, deadline_scope, has_budget, record_miss, reserve_budget, within_deadline
+from src.utils.metrics import counter, histogram
+from src.utils.tracing import set_trace_attrs, span, traced
+from .ai import AIService
+from .search import SearchService
+
+logger = get_logger("mention_batcher")
+
+BATCH_SIZE = histogram(
+    "bot_mention_batch_size", "Group mentions sharing one search and history load",
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34)
+)
+BATCH_SAVED_CALLS = counter(
+    "bot_mention_batch_saved_calls_total", "Upstream calls avoided by batching group mentions", ("call",)
+)
+
+
+@dataclass
+class PendingMention:
+    user_id: int
+    text: str
+    expires_at: Optional[float] = None
+    future: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+@dataclass
+class MentionBatch:
+    chat_id: int
+    mentions: list[PendingMention] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class MentionBatcher:
+    def __init__(
+        self,
+        ai_service: AIService,
+        search_service: SearchService,
+        database: Database,
+        window_ms: int = 0,
+        max_batch: int = 10,
+        llm_concurrency: int = 8,
+        context_window: int = 20,
+        deadline_llm_reserve: float = 0,
+        deadline_search_min: float = 0
+    ):
+        self.ai = ai_service
+        self.search = search_service
+        self.db = database
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self.context_window = context_window
+        self.deadline_llm_reserve = deadline_llm_reserve
+        self.deadline_search_min = deadline_search_min
+        self._llm_slots = asyncio.Semaphore(max(1, llm_concurrency))
+        self._pending: dict[int, MentionBatch] = {}
+        self._tasks: set[asyncio.Task] = set()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+    
+    def llm_slot(self, batched: bool):
+        return self._llm_slots if batched else contextlib.nullcontext()
+    
+    async def submit(self, chat_id: int, user_id: int, text: str) -> tuple[Optional[list[dict]], list[dict], int]:
+        batch = self._pending.get(chat_id)
+        if batch is None:
+            batch = MentionBatch(chat_id)
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._dispatch, chat_id)
+            self._pending[chat_id] = batch
+        
+        deadline = current_deadline()
+        mention = PendingMention(user_id, text, deadline.expires_at if deadline else None)
+        batch.mentions.append(mention)
+        if len(batch.mentions) >= self.max_batch:
+            batch.timer.cancel()
+            self._dispatch(chat_id)
+        
+        return await mention.future
+    
+    def _dispatch(self, chat_id: int) -> None:
+        batch = self._pending.pop(chat_id, None)
+        if batch is None:
+            return
+        task = asyncio.create_task(self._run(batch), context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    @traced("mention_batch")
+    async def _run(self, batch: MentionBatch) -> None:
+        mentions = batch.mentions
+        BATCH_SIZE.observe(len(mentions))
+        set_trace_attrs(chat_id=batch.chat_id, batch_size=len(mentions))
+        try:
+            with deadline_scope(self._budget(mentions)):
+                await self._collect(batch)
+        except Exception as e:
+            logger.error_ctx(
+                f"Mention batch failed: {str(e)}",
+                chat_id=batch.chat_id,
+                action="mention_batch_error",
+                extra_data={"size": len(mentions)}
+            )
+            for mention in mentions:
+                if not mention.future.done():
+                    mention.future.set_exception(e)
+    
+    async def _collect(self, batch: MentionBatch) -> None:
+        mentions = batch.mentions
+        with span("should_search"):
+            needs_search = [await self.ai.should_search(mention.text) for mention in mentions]
+        searching = [mention.text for mention, needed in zip(mentions, needs_search) if needed]
+        
+        search_task = asyncio.create_task(self._search(batch.chat_id, searching))
+        try:
+            with span("history"):
+                histories = await within_deadline("history", self.db.get_conversation_histories(
+                    chat_id=batch.chat_id,
+                    user_ids=list({mention.user_id for mention in mentions}),
+                    limit=self.context_window
+                ))
+            self._resolve(mentions, needs_search, False, None, histories)
+            search_results = await search_task
+        finally:
+            search_task.cancel()
+        self._resolve(mentions, needs_search, True, search_results, histories)
+        
+        if len(searching) > 1:
+            BATCH_SAVED_CALLS.labels("search").inc(len(searching) - 1)
+        BATCH_SAVED_CALLS.labels("history").inc(len(mentions) - 1)
+    
+    def _budget(self, mentions: list[PendingMention]) -> Optional[float]:
+        if any(mention.expires_at is None for mention in mentions):
+            return None
+        return max(max(mention.expires_at for mention in mentions) - time.monotonic(), 0.001)
+    
+    def _resolve(
+        self,
+        mentions: list[PendingMention],
+        needs_search: list[bool],
+        searched: bool,
+        search_results: Optional[list[dict]],
+        histories: dict[int, list[dict]]
+    ) -> None:
+        for mention, needed in zip(mentions, needs_search):
+            if needed == searched and not mention.future.done():
+                mention.future.set_result((search_results, histories.get(mention.user_id, []), len(mentions)))
+    
+    async def _search(self, chat_id: int, texts: list[str]) -> Optional[list[dict]]:
+        if not texts:
+            return None
+        
+        with span("search"):
+            if not has_budget(self.deadline_search_min + self.deadline_llm_reserve):
+                DEADLINE_SKIPPED.labels("search").inc()
+                set_trace_attrs(search_skipped=True)
+                return None
+            
+            try:
+                with reserve_budget(self.deadline_llm_reserve):
+                    with span("extract_query"):
+                        query = await within_deadline(
+                            "extract_query", self.ai.extract_search_query("\n".join(texts))
+                        )
+                    with span("web_search"):
+                        return await within_deadline("web_search", self.search.search(
+                            [query, *texts],
+                            news=any(self.search.is_news_query(text) for text in texts)
+                        ))
+            except DeadlineExceeded as e:
+                record_miss(e.stage, chat_id=chat_id, fatal=False)
+                return None
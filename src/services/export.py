@@ -0,0 +1,111 @@
+import asyncio
+import csv
+import gzip
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import IO, Optional
+from src.database import Database
+from src.utils import get_logger
+from src.utils.metrics import counter
+
+logger = get_logger("export")
+
+EXPORTED_ROWS = counter(
+    "bot_export_rows_total", "Rows written by admin exports", ("kind",)
+)
+
+EXPORT_FIELDS = {
+    "messages": ("id", "user_id", "chat_id", "role", "content", "tokens_used", "created_at"),
+    "usage": ("bucket", "user_id", "chat_id", "messages", "tokens", "searches", "latency_ms_sum")
+}
+EXPORT_FORMATS = ("jsonl", "csv")
+EXPORT_COMPRESSION = 6
+
+
+@dataclass
+class ExportResult:
+    path: str
+    kind: str
+    fmt: str
+    rows: int = 0
+    size: int = 0
+    duration: float = 0.0
+
+
+class ExportService:
+    def __init__(self, database: Database, export_dir: str, batch_size: int = 5000, batch_pause: float = 0.01):
+        self.db = database
+        self.export_dir = export_dir
+        self.batch_size = max(1, batch_size)
+        self.batch_pause = batch_pause
+        self._lock = asyncio.Lock()
+    
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+    
+    async def export(
+        self,
+        kind: str,
+        fmt: str = "jsonl",
+        user_id: Optional[int] = None,
+        chat_id: Optional[int] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        granularity: str = "day"
+    ) -> ExportResult:
+        if kind not in EXPORT_FIELDS or fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export: {kind} as {fmt}")
+        
+        async with self._lock:
+            started = time.perf_counter()
+            os.makedirs(self.export_dir, exist_ok=True)
+            name = f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}.{fmt}.gz"
+            result = ExportResult(os.path.join(self.export_dir, name), kind, fmt)
+            filters = {"user_id": user_id, "chat_id": chat_id, "start": start, "end": end, "batch_size": self.batch_size}
+            if kind == "messages":
+                batches = self.db.export_messages(**filters)
+            else:
+                batches = self.db.export_usage(granularity, **filters)
+            
+            f = await asyncio.to_thread(gzip.open, result.path, "wt", EXPORT_COMPRESSION, encoding="utf-8", newline="")
+            try:
+                writer = csv.writer(f) if fmt == "csv" else None
+                if writer:
+                    writer.writerow(EXPORT_FIELDS[kind])
+                async for rows in batches:
+                    await asyncio.to_thread(self._write, f, writer, kind, rows)
+                    result.rows += len(rows)
+                    EXPORTED_ROWS.labels(kind).inc(len(rows))
+                    if self.batch_pause:
+                        await asyncio.sleep(self.batch_pause)
+            except BaseException:
+                await batches.aclose()
+                await asyncio.to_thread(f.close)
+                await asyncio.to_thread(os.remove, result.path)
+                raise
+            await asyncio.to_thread(f.close)
+            
+            result.size = os.path.getsize(result.path)
+            result.duration = time.perf_counter() - started
+            logger.info_ctx(
+                f"Export written: {kind}",
+                action="export",
+                extra_data={
+                    "format": fmt,
+                    "rows": result.rows,
+                    "bytes": result.size,
+                    "duration": round(result.duration, 2),
+                    **{key: value for key, value in filters.items() if value is not None and key != "batch_size"}
+                }
+            )
+            return result
+    
+    def _write(self, f: IO[str], writer, kind: str, rows: list[dict]) -> None:
+        if writer:
+            fields = EXPORT_FIELDS[kind]
+            writer.writerows([row[field] for field in fields] for row in rows)
+        else:
+            f.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
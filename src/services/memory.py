@@ -0,0 +1,207 @@
+import asyncio
+import contextvars
+import heapq
+import math
+import re
+from collections import OrderedDict, deque
+from src.database import Database
+from src.utils import get_logger
+from src.utils.helpers import estimate_tokens
+from src.utils.metrics import counter, histogram
+
+MEMORY_RECALL_SECONDS = histogram(
+    "bot_memory_recall_seconds", "Relevant-turn retrieval latency in seconds",
+    buckets=(0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+MEMORY_RECALLED = counter(
+    "bot_memory_recalled_turns_total", "Older turns added to prompts by relevance"
+)
+MEMORY_INDEX_BUILDS = counter(
+    "bot_memory_index_builds_total", "Conversation indexes loaded from the database"
+)
+MEMORY_INDEX_MISSES = counter(
+    "bot_memory_index_misses_total", "Recalls answered without older turns while the conversation index builds in the background"
+)
+
+logger = get_logger("memory")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+COMMON_TERM_RATIO = 0.5
+
+
+def tokenize(text: str) -> list[str]:
+    return [term for term in re.findall(r"\w+", text.lower().replace("\u0307", "")) if len(term) > 1]
+
+
+class ConversationIndex:
+    def __init__(self, max_turns: int = 0):
+        self.max_turns = max_turns
+        self.first = 0
+        self.turns: deque[dict] = deque()
+        self.lengths: deque[int] = deque()
+        self.postings: dict[str, dict[int, int]] = {}
+        self.total_length = 0
+        self._norm_cache: list[float] = []
+        self._norm_first = -1
+    
+    def add(self, role: str, content: str) -> None:
+        doc = self.first + len(self.turns)
+        terms = tokenize(content)
+        self.turns.append({"role": role, "content": content})
+        self.lengths.append(len(terms))
+        self.total_length += len(terms)
+        for term in terms:
+            postings = self.postings.setdefault(term, {})
+            postings[doc] = postings.get(doc, 0) + 1
+        
+        if self.max_turns and len(self.turns) > self.max_turns:
+            self._evict()
+    
+    def turn(self, doc: int) -> dict:
+        return self.turns[doc - self.first]
+    
+    def search(self, query: str, limit: int, exclude_recent: int) -> list[tuple[float, int]]:
+        count = len(self.turns)
+        cutoff = self.first + count - exclude_recent
+        if count - exclude_recent <= 0 or limit <= 0:
+            return []
+        
+        terms = [self.postings[term] for term in set(tokenize(query)) if term in self.postings]
+        informative = [postings for postings in terms if len(postings) <= count * COMMON_TERM_RATIO]
+        norms = self._norms()
+        
+        scores: dict[int, float] = {}
+        for postings in informative or terms:
+            weight = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5)) * (BM25_K1 + 1)
+            for doc, tf in postings.items():
+                scores[doc] = scores.get(doc, 0.0) + weight * tf / (tf + norms[doc - self.first])
+        
+        return heapq.nlargest(limit, ((score, doc) for doc, score in scores.items() if doc < cutoff))
+    
+    def _evict(self) -> None:
+        doc = self.first
+        turn = self.turns.popleft()
+        self.total_length -= self.lengths.popleft()
+        self.first += 1
+        for term in set(tokenize(turn["content"])):
+            postings = self.postings[term]
+            del postings[doc]
+            if not postings:
+                del self.postings[term]
+    
+    def _norms(self) -> list[float]:
+        if len(self._norm_cache) != len(self.lengths) or self._norm_first != self.first:
+            avg_length = self.total_length / len(self.lengths) or 1.0
+            self._norm_cache = [
+                BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length) for length in self.lengths
+            ]
+            self._norm_first = self.first
+        return self._norm_cache
+
+
+class ConversationMemory:
+    def __init__(
+        self,
+        database: Database,
+        top_k: int = 4,
+        token_budget: int = 600,
+        max_conversations: int = 500,
+        max_turns: int = 5000
+    ):
+        self.db = database
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.max_conversations = max_conversations
+        self.max_turns = max_turns
+        self._indexes: OrderedDict[tuple[int, int], ConversationIndex] = OrderedDict()
+        self._builds: dict[tuple[int, int], asyncio.Task] = {}
+        self._stale: set[tuple[int, int]] = set()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.top_k > 0 and self.token_budget > 0
+    
+    async def recall(self, user_id: int, chat_id: int, query: str, exclude_recent: int) -> list[dict]:
+        if not self.enabled:
+            return []
+        
+        key = (user_id, chat_id)
+        index = self._indexes.get(key)
+        if index is None:
+            self._schedule_build(key)
+            MEMORY_INDEX_MISSES.inc()
+            return []
+        self._indexes.move_to_end(key)
+        
+        with MEMORY_RECALL_SECONDS.time():
+            ranked = index.search(query, self.top_k, exclude_recent)
+            
+            selected = []
+            budget = self.token_budget
+            for _, doc in ranked:
+                cost = estimate_tokens(index.turn(doc)["content"])
+                if cost > budget:
+                    continue
+                budget -= cost
+                selected.append(doc)
+        
+        MEMORY_RECALLED.inc(len(selected))
+        return [index.turn(doc) for doc in sorted(selected)]
+    
+    def remember(self, user_id: int, chat_id: int, role: str, content: str) -> None:
+        key = (user_id, chat_id)
+        index = self._indexes.get(key)
+        if index is not None:
+            index.add(role, content)
+        elif key in self._builds:
+            self._stale.add(key)
+    
+    def forget(self, user_id: int, chat_id: int) -> None:
+        key = (user_id, chat_id)
+        self._indexes.pop(key, None)
+        if key in self._builds:
+            self._stale.add(key)
+    
+    async def preload(self, conversations: list[tuple[int, int]]) -> int:
+        if not self.enabled:
+            return 0
+        for key in conversations[:self.max_conversations]:
+            if key not in self._indexes:
+                await self._schedule_build(key)
+        return min(len(conversations), self.max_conversations)
+    
+    def _schedule_build(self, key: tuple[int, int]) -> asyncio.Task:
+        task = self._builds.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key), context=contextvars.Context())
+            self._builds[key] = task
+        return task
+    
+    async def _load(self, key: tuple[int, int]) -> None:
+        try:
+            history = await self.db.get_conversation_history(key[0], key[1], limit=self.max_turns)
+            built = await asyncio.to_thread(self._build, history)
+            if key in self._stale or key in self._indexes:
+                return
+            
+            self._indexes[key] = built
+            MEMORY_INDEX_BUILDS.inc()
+            while len(self._indexes) > self.max_conversations:
+                self._indexes.popitem(last=False)
+        except Exception as e:
+            logger.error_ctx(
+                f"Memory index build failed: {str(e)}",
+                user_id=key[0],
+                chat_id=key[1],
+                action="memory_index_error"
+            )
+        finally:
+            self._builds.pop(key, None)
+            self._stale.discard(key)
+    
+    def _build(self, history: list[dict]) -> ConversationIndex:
+        index = ConversationIndex(self.max_turns)
+        for turn in history:
+            index.add(turn["role"], turn["content"])
+        return index
@@ -0,0 +1,108 @@
+import json
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+from src.utils.helpers import format_memory_context, format_search_context
+from src.utils.metrics import counter, histogram
+
+PROMPT_PREFIX_REUSE = histogram(
+    "bot_prompt_prefix_reuse_ratio", "Share of prompt bytes identical to the previous prompt of the conversation",
+    buckets=(0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 1.0)
+)
+PROMPT_BYTES = counter(
+    "bot_prompt_bytes_total", "Serialized prompt bytes sent to the LLM", ("part",)
+)
+
+SEARCH_INSTRUCTION = "Bu bilgileri kullanarak yanıt ver ve gerekirse kaynaklara atıfta bulun."
+
+
+@dataclass
+class CachedPrefix:
+    messages: list[dict] = field(default_factory=list)
+    serialized: list[str] = field(default_factory=list)
+
+
+@dataclass
+class Prompt:
+    messages: list[dict]
+    reused_bytes: int
+    total_bytes: int
+    
+    @property
+    def reuse_ratio(self) -> float:
+        return self.reused_bytes / self.total_bytes if self.total_bytes else 0.0
+
+
+class PromptBuilder:
+    def __init__(self, system_prompt: str, context_window: int = 20, history_step: int = 0, max_conversations: int = 1000):
+        self.system_prompt = system_prompt
+        self.context_window = context_window
+        self.history_step = max(0, history_step)
+        self.max_conversations = max_conversations
+        self._prefixes: OrderedDict[tuple[int, int], CachedPrefix] = OrderedDict()
+    
+    @property
+    def history_limit(self) -> int:
+        return self.context_window + self.history_step
+    
+    def build(
+        self,
+        user_message: str,
+        conversation_history: list[dict],
+        search_results: Optional[list[dict]] = None,
+        memories: Optional[list[dict]] = None,
+        conversation: Optional[tuple[int, int]] = None
+    ) -> Prompt:
+        cached = self._prefixes.get(conversation) if conversation else None
+        history = self._select_history(conversation_history, cached)
+        stable = [{"role": "system", "content": self.system_prompt}] + history
+        
+        volatile = []
+        context_parts = []
+        if memories:
+            context_parts.append(format_memory_context(memories))
+        if search_results:
+            context_parts.append(
+                f"Kullanıcının sorusuyla ilgili güncel web arama sonuçları:\n\n"
+                f"{format_search_context(search_results)}\n\n{SEARCH_INSTRUCTION}"
+            )
+        if context_parts:
+            volatile.append({"role": "system", "content": "\n\n".join(context_parts)})
+        volatile.append({"role": "user", "content": user_message})
+        
+        reused = 0
+        serialized = []
+        for position, message in enumerate(stable):
+            if cached and position < len(cached.messages) and cached.messages[position] == message:
+                serialized.append(cached.serialized[position])
+                reused += len(serialized[-1])
+            else:
+                cached = None
+                serialized.append(json.dumps(message, ensure_ascii=False))
+        total = sum(len(item) for item in serialized) + sum(
+            len(json.dumps(message, ensure_ascii=False)) for message in volatile
+        )
+        
+        if conversation:
+            self._prefixes[conversation] = CachedPrefix(stable, serialized)
+            self._prefixes.move_to_end(conversation)
+            while len(self._prefixes) > self.max_conversations:
+                self._prefixes.popitem(last=False)
+        
+        prompt = Prompt(stable + volatile, reused, total)
+        PROMPT_PREFIX_REUSE.observe(prompt.reuse_ratio)
+        PROMPT_BYTES.labels("reused").inc(reused)
+        PROMPT_BYTES.labels("new").inc(total - reused)
+        return prompt
+    
+    def history_size(self, conversation_history: list[dict], conversation: Optional[tuple[int, int]] = None) -> int:
+        cached = self._prefixes.get(conversation) if conversation else None
+        return len(self._select_history(conversation_history, cached))
+    
+    def _select_history(self, history: list[dict], cached: Optional[CachedPrefix]) -> list[dict]:
+        if cached and len(cached.messages) > 1:
+            previous = cached.messages[1:]
+            for start in range(max(0, len(history) - self.history_limit), len(history) - len(previous) + 1):
+                if history[start:start + len(previous)] == previous:
+                    return history[start:]
+        return history[-self.context_window:] if self.context_window else []
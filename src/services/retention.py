@@ -0,0 +1,163 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+from src.database import Database
+from src.utils import get_logger
+from src.utils.metrics import counter
+from .memory import ConversationMemory
+
+logger = get_logger("retention")
+
+PRUNED_TOTAL = counter(
+    "bot_retention_pruned_total", "Messages removed by the retention job", ("reason",)
+)
+RECLAIMED_BYTES = counter(
+    "bot_retention_reclaimed_bytes_total", "Bytes returned to the filesystem by incremental vacuum"
+)
+
+MAX_BATCH_SIZE = 900
+
+
+@dataclass
+class RetentionResult:
+    pruned_by_age: int = 0
+    pruned_by_cap: int = 0
+    pruned_usage_rows: int = 0
+    archived: int = 0
+    bytes_reclaimed: int = 0
+    free_bytes: int = 0
+    duration: float = 0.0
+    complete: bool = True
+    
+    @property
+    def pruned(self) -> int:
+        return self.pruned_by_age + self.pruned_by_cap
+
+
+class RetentionService:
+    def __init__(
+        self,
+        database: Database,
+        max_messages: int = 0,
+        max_age_days: int = 0,
+        batch_size: int = 500,
+        max_batches: int = 200,
+        batch_pause: float = 0.05,
+        archive_dir: str = "",
+        vacuum_pages: int = 2000,
+        usage_hourly_days: int = 0,
+        memory: Optional[ConversationMemory] = None
+    ):
+        self.db = database
+        self.max_messages = max_messages
+        self.max_age_days = max_age_days
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.max_batches = max_batches
+        self.batch_pause = batch_pause
+        self.archive_dir = archive_dir
+        self.vacuum_pages = vacuum_pages
+        self.usage_hourly_days = usage_hourly_days
+        self.memory = memory
+        self.last_result: Optional[RetentionResult] = None
+        self._lock = asyncio.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_messages > 0 or self.max_age_days > 0 or self.usage_hourly_days > 0
+    
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+    
+    async def run(self, context=None) -> RetentionResult:
+        async with self._lock:
+            start = time.perf_counter()
+            result = RetentionResult()
+            batches = 0
+            
+            if self.max_age_days > 0:
+                cutoff = datetime.now() - timedelta(days=self.max_age_days)
+                while batches < self.max_batches:
+                    rows = await self.db.fetch_expired_messages(cutoff, self.batch_size)
+                    if not rows:
+                        break
+                    result.pruned_by_age += await self._remove(rows, result)
+                    batches += 1
+                    await asyncio.sleep(self.batch_pause)
+            
+            if self.max_messages > 0 and batches < self.max_batches:
+                conversations = await self.db.find_oversized_conversations(self.max_messages)
+                for user_id, chat_id, _ in conversations:
+                    while batches < self.max_batches:
+                        rows = await self.db.fetch_overflow_messages(
+                            user_id, chat_id, self.max_messages, self.batch_size
+                        )
+                        if not rows:
+                            break
+                        result.pruned_by_cap += await self._remove(rows, result)
+                        batches += 1
+                        await asyncio.sleep(self.batch_pause)
+            
+            if self.usage_hourly_days > 0:
+                cutoff = int((datetime.now() - timedelta(days=self.usage_hourly_days)).timestamp())
+                result.pruned_usage_rows = await self.db.prune_usage("hour", cutoff)
+            
+            result.complete = batches < self.max_batches
+            await self._vacuum(result)
+            result.duration = time.perf_counter() - start
+            
+            PRUNED_TOTAL.labels("age").inc(result.pruned_by_age)
+            PRUNED_TOTAL.labels("cap").inc(result.pruned_by_cap)
+            RECLAIMED_BYTES.inc(result.bytes_reclaimed)
+            self.last_result = result
+            
+            logger.info_ctx(
+                "Retention run finished",
+                action="retention_run",
+                extra_data={
+                    "pruned_by_age": result.pruned_by_age,
+                    "pruned_by_cap": result.pruned_by_cap,
+                    "pruned_usage_rows": result.pruned_usage_rows,
+                    "archived": result.archived,
+                    "bytes_reclaimed": result.bytes_reclaimed,
+                    "free_bytes": result.free_bytes,
+                    "complete": result.complete,
+                    "duration_ms": round(result.duration * 1000, 1)
+                }
+            )
+            return result
+    
+    async def _remove(self, rows: list[dict], result: RetentionResult) -> int:
+        if self.archive_dir:
+            await asyncio.to_thread(self._archive, rows)
+            result.archived += len(rows)
+        if self.memory:
+            for user_id, chat_id in {(row["user_id"], row["chat_id"]) for row in rows}:
+                self.memory.forget(user_id, chat_id)
+        return await self.db.delete_messages([row["id"] for row in rows])
+    
+    def _archive(self, rows: list[dict]) -> None:
+        os.makedirs(self.archive_dir, exist_ok=True)
+        by_month: dict[str, list[str]] = {}
+        for row in rows:
+            month = datetime.fromtimestamp(row["created_at"]).strftime("%Y-%m")
+            by_month.setdefault(month, []).append(json.dumps(row, ensure_ascii=False))
+        for month, lines in by_month.items():
+            path = os.path.join(self.archive_dir, f"messages-{month}.jsonl.gz")
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+    
+    async def _vacuum(self, result: RetentionResult) -> None:
+        before = await self.db.storage_info()
+        if self.vacuum_pages > 0 and before["auto_vacuum"] == 2:
+            await self.db.incremental_vacuum(self.vacuum_pages)
+            after = await self.db.storage_info()
+        else:
+            after = before
+        result.bytes_reclaimed = max(0, before["page_count"] - after["page_count"]) * after["page_size"]
+        result.free_bytes = after["freelist_count"] * after["page_size"]
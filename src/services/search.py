@@ -1,22 +1,136 @@
-from duckduckgo_search import DDGS
 from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
 import asyncio
+import importlib
+import re
 from src.utils import get_logger
+from src.utils.deadline import remaining_time
+from src.utils.metrics import counter, histogram
 
 logger = get_logger("search_service")
 
+SEARCH_SECONDS = histogram(
+    "bot_search_seconds", "Search backend latency in seconds", ("kind",)
+)
+SEARCH_BRANCHES = counter(
+    "bot_search_branches_total", "Search fan-out branches by outcome", ("kind", "outcome")
+)
+SEARCH_DUPLICATES = counter(
+    "bot_search_duplicates_total", "Search results dropped as duplicates of a higher ranked result"
+)
+
+NEWS_KEYWORDS = (
+    "haber", "son dakika", "gündem", "güncel", "bugün", "dün", "açıklama", "seçim", "deprem", "maç", "skor",
+    "news", "breaking", "latest", "today", "yesterday", "announced", "election", "earthquake", "match", "score"
+)
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "ref", "ocid")
+RANK_OFFSET = 60
+TITLE_SIMILARITY = 0.8
+
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    for prefix in ("www.", "m.", "amp."):
+        host = host.removeprefix(prefix)
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ))
+    path = parts.path.rstrip("/")
+    return f"{host}{path}?{query}" if query else f"{host}{path}"
+
+
+def title_tokens(title: str) -> frozenset[str]:
+    return frozenset(re.findall(r"\w+", title.lower()))
+
+
+def similar_titles(first: frozenset[str], second: frozenset[str]) -> bool:
+    if len(first) < 3 or len(second) < 3:
+        return first == second and bool(first)
+    return len(first & second) / len(first | second) >= TITLE_SIMILARITY
+
 
 class SearchService:
-    def __init__(self):
-        pass
+    def __init__(self, branch_timeout: float = 4.0, news_enabled: bool = True, max_queries: int = 1):
+        self.branch_timeout = branch_timeout
+        self.news_enabled = news_enabled
+        self.max_queries = max(1, max_queries)
+    
+    async def warm_up(self) -> None:
+        await asyncio.to_thread(importlib.import_module, "duckduckgo_search")
+    
+    def is_news_query(self, text: str) -> bool:
+        text_lower = text.lower()
+        return any(keyword in text_lower for keyword in NEWS_KEYWORDS)
+    
+    async def search(self, queries: list[str], news: bool = False, max_results: int = 5) -> list[dict]:
+        queries = list(dict.fromkeys(query.strip()[:100] for query in queries if query.strip()))[:self.max_queries]
+        branches = [("web", query) for query in queries]
+        if news and self.news_enabled:
+            branches += [("news", query) for query in queries]
+        
+        ranked = await asyncio.gather(*(self._branch(kind, query, max_results) for kind, query in branches))
+        return self.merge(ranked, max_results)
+    
+    def merge(self, ranked: list[list[dict]], max_results: int = 5) -> list[dict]:
+        merged: list[dict] = []
+        scores: list[float] = []
+        urls: dict[str, int] = {}
+        titles: list[frozenset[str]] = []
+        
+        for results in ranked:
+            for rank, result in enumerate(results):
+                score = 1 / (RANK_OFFSET + rank)
+                url = normalize_url(result.get("href", result.get("url", "")))
+                tokens = title_tokens(result.get("title", ""))
+                
+                position = urls.get(url) if url else None
+                if position is None:
+                    position = next(
+                        (i for i, seen in enumerate(titles) if similar_titles(tokens, seen)), None
+                    )
+                
+                if position is not None:
+                    scores[position] += score
+                    SEARCH_DUPLICATES.inc()
+                    continue
+                
+                if url:
+                    urls[url] = len(merged)
+                merged.append(result)
+                scores.append(score)
+                titles.append(tokens)
+        
+        order = sorted(range(len(merged)), key=lambda i: -scores[i])
+        return [merged[i] for i in order[:max_results]]
+    
+    async def _branch(self, kind: str, query: str, max_results: int) -> list[dict]:
+        fetch = self.search_news if kind == "news" else self.search_web
+        timeout = remaining_time(self.branch_timeout)
+        try:
+            results = await asyncio.wait_for(fetch(query, max_results=max_results), timeout)
+        except asyncio.TimeoutError:
+            SEARCH_BRANCHES.labels(kind, "timeout").inc()
+            logger.warning_ctx(
+                f"Search branch timed out: {query}",
+                action="search_timeout",
+                extra_data={"kind": kind, "timeout": round(timeout, 3)}
+            )
+            return []
+        
+        SEARCH_BRANCHES.labels(kind, "ok" if results else "empty").inc()
+        return results
     
     async def search_web(self, query: str, max_results: int = 5) -> list[dict]:
         try:
             def _search():
+                from duckduckgo_search import DDGS
                 with DDGS() as ddgs:
                     return list(ddgs.text(query, max_results=max_results))
             
-            results = await asyncio.to_thread(_search)
+            with SEARCH_SECONDS.labels("web").time():
+                results = await asyncio.to_thread(_search)
             
             logger.info_ctx(
                 f"Web search completed: {query}",
@@ -33,10 +147,12 @@ class SearchService:
     async def search_news(self, query: str, max_results: int = 5) -> list[dict]:
         try:
             def _search_news():
+                from duckduckgo_search import DDGS
                 with DDGS() as ddgs:
                     return list(ddgs.news(query, max_results=max_results))
             
-            results = await asyncio.to_thread(_search_news)
+            with SEARCH_SECONDS.labels("news").time():
+                results = await asyncio.to_thread(_search_news)
             
             logger.info_ctx(
                 f"News search completed: {query}",
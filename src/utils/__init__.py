@@ -1,9 +1,15 @@
-from .logger import setup_logger, get_logger
+from .logger import setup_logger, get_logger, configure_logging, shutdown_logging
 from .rate_limiter import RateLimiter
+from .token_quota import TokenQuota
+from .ban_list import BanList
+from .send_scheduler import SendScheduler
+from .update_tracker import UpdateTracker
+from .startup import StartupTracker
+from .metrics import MetricsServer
 from .helpers import extract_bot_mention, is_reply_to_bot, format_search_results
 
 __all__ = [
-    "setup_logger", "get_logger", 
-    "RateLimiter",
+    "setup_logger", "get_logger", "configure_logging", "shutdown_logging",
+    "RateLimiter", "TokenQuota", "BanList", "SendScheduler", "UpdateTracker", "StartupTracker", "MetricsServer",
     "extract_bot_mention", "is_reply_to_bot", "format_search_results"
 ]
@@ -0,0 +1,76 @@
+import asyncio
+import os
+from array import array
+from typing import Iterable
+from .logger import get_logger
+from .metrics import counter, gauge
+
+logger = get_logger("ban_list")
+
+BANNED_DROPPED = counter(
+    "bot_banned_dropped_total", "Updates from banned users dropped before any work", ("handler",)
+)
+BANNED_USERS = gauge(
+    "bot_banned_users", "Users in the in-memory ban list"
+)
+
+
+class BanList:
+    def __init__(self, snapshot_path: str = ""):
+        self.snapshot_path = snapshot_path
+        self._banned: set[int] = set()
+        self._snapshot_mtime = 0.0
+    
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._banned
+    
+    def __len__(self) -> int:
+        return len(self._banned)
+    
+    def load(self, user_ids: Iterable[int]) -> None:
+        self._banned = set(user_ids)
+        BANNED_USERS.set(len(self._banned))
+    
+    def is_banned(self, user_id: int, handler: str) -> bool:
+        if user_id in self._banned:
+            BANNED_DROPPED.labels(handler).inc()
+            return True
+        return False
+    
+    async def publish(self, user_ids: Iterable[int]) -> None:
+        self.load(user_ids)
+        if self.snapshot_path:
+            self._snapshot_mtime = await asyncio.to_thread(self._write_snapshot, sorted(self._banned))
+    
+    async def refresh(self, context=None) -> None:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        
+        mtime = os.path.getmtime(self.snapshot_path)
+        if mtime == self._snapshot_mtime:
+            return
+        
+        user_ids = await asyncio.to_thread(self._read_snapshot)
+        self.load(user_ids)
+        self._snapshot_mtime = mtime
+        logger.info_ctx(
+            "Ban list reloaded from snapshot",
+            action="ban_list_reload",
+            extra_data={"banned": len(user_ids)}
+        )
+    
+    def _write_snapshot(self, user_ids: list[int]) -> float:
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            array("q", user_ids).tofile(f)
+        os.replace(tmp_path, self.snapshot_path)
+        return os.path.getmtime(self.snapshot_path)
+    
+    def _read_snapshot(self) -> array:
+        user_ids = array("q")
+        with open(self.snapshot_path, "rb") as f:
+            user_ids.frombytes(f.read())
+        return user_ids
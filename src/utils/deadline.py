@@ -0,0 +1,126 @@
+import asyncio
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, Optional, TypeVar
+from .logger import get_logger
+from .metrics import counter
+from .tracing import current_trace
+
+logger = get_logger("deadline")
+
+DEADLINE_EXCEEDED = counter(
+    "bot_deadline_exceeded_total", "Request stages cut short by the per-update deadline", ("stage",)
+)
+DEADLINE_SKIPPED = counter(
+    "bot_deadline_skipped_total", "Optional stages skipped for lack of remaining budget", ("stage",)
+)
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    __slots__ = ("budget", "start", "expires_at")
+    
+    def __init__(self, budget: float, expires_at: Optional[float] = None):
+        self.budget = budget
+        self.start = time.monotonic()
+        self.expires_at = expires_at if expires_at is not None else self.start + budget
+    
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+    
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def remaining_time(default: Optional[float] = None) -> Optional[float]:
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return default
+    remaining = max(0.0, deadline.remaining())
+    return remaining if default is None else min(default, remaining)
+
+
+def has_budget(seconds: float) -> bool:
+    remaining = remaining_time()
+    return remaining is None or remaining >= seconds
+
+
+@contextmanager
+def deadline_scope(budget: Optional[float]) -> Iterator[Optional[Deadline]]:
+    parent = _current_deadline.get()
+    if budget is None or budget <= 0:
+        yield parent
+        return
+    
+    deadline = Deadline(budget)
+    if parent is not None and parent.expires_at < deadline.expires_at:
+        deadline = Deadline(budget, parent.expires_at)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+@contextmanager
+def reserve_budget(seconds: float) -> Iterator[Optional[Deadline]]:
+    remaining = remaining_time()
+    with deadline_scope(None if remaining is None else max(remaining - seconds, 0.001)) as deadline:
+        yield deadline
+
+
+async def within_deadline(stage: str, awaitable: Awaitable[T]) -> T:
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return await awaitable
+    
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        if inspect.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(stage)
+    
+    try:
+        return await asyncio.wait_for(awaitable, remaining)
+    except asyncio.TimeoutError:
+        if deadline.expired:
+            raise DeadlineExceeded(stage)
+        raise
+
+
+def record_miss(stage: str, user_id: Optional[int] = None, chat_id: Optional[int] = None, fatal: bool = True) -> None:
+    DEADLINE_EXCEEDED.labels(stage).inc()
+    deadline = _current_deadline.get()
+    trace = current_trace()
+    logger.warning_ctx(
+        f"Deadline exceeded during {stage}",
+        user_id=user_id,
+        chat_id=chat_id,
+        action="deadline_exceeded",
+        extra_data={
+            "stage": stage,
+            "fatal": fatal,
+            "budget": deadline.budget if deadline else None,
+            "elapsed_ms": round((time.monotonic() - deadline.start) * 1000, 2) if deadline else None,
+            "spans": {
+                name: round(duration, 2) for name, duration in trace.span_durations().items()
+            } if trace else {}
+        }
+    )
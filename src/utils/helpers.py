@@ -1,7 +1,12 @@
+import html
 import re
+from datetime import datetime
 from typing import Optional
 from telegram import Message
 
+SNIPPET_START = "\x02"
+SNIPPET_END = "\x03"
+
 
 def extract_bot_mention(text: str, bot_username: str) -> Optional[str]:
     if not text or not bot_username:
@@ -57,12 +62,40 @@ def format_search_context(results: list[dict], max_results: int = 5) -> str:
     return "\n".join(context_parts)
 
 
+def format_memory_context(turns: list[dict]) -> str:
+    context_parts = ["Bu sohbetin önceki bölümlerinden ilgili mesajlar:"]
+    for turn in turns:
+        speaker = "Kullanıcı" if turn["role"] == "user" else "Asistan"
+        context_parts.append(f"- {speaker}: {turn['content']}")
+    
+    return "\n".join(context_parts)
+
+
+def format_message_hits(rows: list[dict], show_owner: bool = False) -> str:
+    formatted = []
+    for row in rows:
+        snippet = html.escape(row["snippet"]).replace(SNIPPET_START, "<b>").replace(SNIPPET_END, "</b>")
+        icon = "👤" if row["role"] == "user" else "🤖"
+        header = f"{icon} <code>{datetime.fromtimestamp(row['created_at']).strftime('%Y-%m-%d %H:%M')}</code>"
+        if show_owner:
+            header += f" • user <code>{row['user_id']}</code> • chat <code>{row['chat_id']}</code>"
+        formatted.append(f"{header}\n{snippet}")
+    
+    return "\n\n".join(formatted)
+
+
 def truncate_text(text: str, max_length: int = 4000) -> str:
     if len(text) <= max_length:
         return text
     return text[:max_length - 3] + "..."
 
 
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
 def escape_markdown(text: str) -> str:
     escape_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
     for char in escape_chars:
@@ -0,0 +1,82 @@
+import asyncio
+import time
+from typing import Coroutine, Optional, TypeVar
+from .logger import get_logger
+from .metrics import counter, gauge
+
+logger = get_logger("inflight")
+
+GENERATIONS_CANCELLED = counter(
+    "bot_generations_cancelled_total", "In-flight generations cancelled before they finished", ("reason",)
+)
+GENERATIONS_IN_FLIGHT = gauge(
+    "bot_generations_in_flight", "Generations currently running, at most one per conversation"
+)
+
+T = TypeVar("T")
+
+CLEAR_MARKER_SECONDS = 600.0
+
+
+class GenerationCancelled(Exception):
+    def __init__(self, reason: str):
+        super().__init__(f"Generation cancelled: {reason}")
+        self.reason = reason
+
+
+class InFlightRegistry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._tasks: dict[tuple[int, int], asyncio.Task] = {}
+        self._reasons: dict[asyncio.Task, str] = {}
+        self._cleared: dict[tuple[int, int], float] = {}
+    
+    def clear(self, user_id: int, chat_id: int) -> bool:
+        now = time.monotonic()
+        for key, cleared_at in list(self._cleared.items()):
+            if now - cleared_at > CLEAR_MARKER_SECONDS:
+                del self._cleared[key]
+        self._cleared[(user_id, chat_id)] = now
+        return self.cancel(user_id, chat_id, "clear")
+    
+    def cleared_since(self, user_id: int, chat_id: int, started: float) -> bool:
+        return self._cleared.get((user_id, chat_id), float("-inf")) >= started
+    
+    def cancel(self, user_id: int, chat_id: int, reason: str) -> bool:
+        task = self._tasks.get((user_id, chat_id))
+        if task is None or task.done():
+            return False
+        
+        self._reasons[task] = reason
+        task.cancel()
+        GENERATIONS_CANCELLED.labels(reason).inc()
+        logger.info_ctx(
+            "In-flight generation cancelled",
+            user_id=user_id,
+            chat_id=chat_id,
+            action="generation_cancelled",
+            extra_data={"reason": reason}
+        )
+        return True
+    
+    async def run(self, user_id: int, chat_id: int, coro: Coroutine[None, None, T]) -> T:
+        if not self.enabled:
+            return await coro
+        
+        key = (user_id, chat_id)
+        self.cancel(user_id, chat_id, "superseded")
+        task = asyncio.create_task(coro)
+        self._tasks[key] = task
+        GENERATIONS_IN_FLIGHT.set(len(self._tasks))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            reason: Optional[str] = self._reasons.get(task)
+            if reason is None or asyncio.current_task().cancelling():
+                raise
+            raise GenerationCancelled(reason) from None
+        finally:
+            self._reasons.pop(task, None)
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+            GENERATIONS_IN_FLIGHT.set(len(self._tasks))
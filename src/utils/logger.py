@@ -1,14 +1,37 @@
+import atexit
 import logging
+import logging.handlers
 import json
+import queue
+import random
 import sys
+import threading
 from datetime import datetime
-from typing import Any
+from typing import Any, Optional, TextIO
+from .tracing import current_trace_id
+from .metrics import counter
+
+try:
+    import orjson
+    
+    def _dumps(data: dict) -> str:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+except ImportError:
+    def _dumps(data: dict) -> str:
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+LOG_RECORDS_DROPPED = counter(
+    "bot_log_records_dropped_total", "Log records dropped because the log queue was full"
+)
+LOG_RECORDS_SAMPLED = counter(
+    "bot_log_records_sampled_total", "Log records skipped by per-action sampling", ("action",)
+)
 
 
 class JSONFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         log_data = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": datetime.utcfromtimestamp(record.created).isoformat() + "Z",
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -20,13 +43,98 @@ class JSONFormatter(logging.Formatter):
             log_data["chat_id"] = record.chat_id
         if hasattr(record, "action"):
             log_data["action"] = record.action
+        if hasattr(record, "trace_id"):
+            log_data["trace_id"] = record.trace_id
         if hasattr(record, "extra_data"):
             log_data["data"] = record.extra_data
         
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
         
-        return json.dumps(log_data, ensure_ascii=False)
+        return _dumps(log_data)
+
+
+class SamplingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue: queue.Queue, sample_rates: Optional[dict[str, float]] = None):
+        super().__init__(log_queue)
+        self.sample_rates = sample_rates or {}
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.sample_rates and record.levelno < logging.WARNING:
+            action = getattr(record, "action", None)
+            rate = self.sample_rates.get(action)
+            if rate is not None and random.random() >= rate:
+                LOG_RECORDS_SAMPLED.labels(action).inc()
+                return
+        self.enqueue(record)
+
+
+class BatchingQueueListener(threading.Thread):
+    _sentinel = None
+    
+    def __init__(self, log_queue: queue.Queue, handler: SamplingQueueHandler, stream: TextIO, batch_size: int = 256):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue = log_queue
+        self.handler = handler
+        self.stream = stream
+        self.batch_size = batch_size
+        self.formatter = JSONFormatter()
+        self._reported_drops = 0
+    
+    def run(self) -> None:
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            if self._sentinel in batch:
+                running = False
+                batch = [record for record in batch if record is not self._sentinel]
+            
+            lines = []
+            for record in batch:
+                try:
+                    lines.append(self.formatter.format(record))
+                except Exception:
+                    continue
+            
+            dropped = self.handler.dropped
+            if dropped != self._reported_drops:
+                lines.append(self.formatter.format(logging.makeLogRecord({
+                    "name": "logger",
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": "Log records dropped, queue full",
+                    "action": "log_dropped",
+                    "extra_data": {"dropped_total": dropped, "dropped_since_last": dropped - self._reported_drops}
+                })))
+                self._reported_drops = dropped
+            
+            if lines:
+                try:
+                    self.stream.write("\n".join(lines) + "\n")
+                    self.stream.flush()
+                except Exception:
+                    pass
+    
+    def stop(self) -> None:
+        self.queue.put(self._sentinel)
+        self.join(timeout=5)
 
 
 class BotLogger(logging.Logger):
@@ -49,6 +157,9 @@ class BotLogger(logging.Logger):
             extra["action"] = action
         if extra_data:
             extra["extra_data"] = extra_data
+        trace_id = current_trace_id()
+        if trace_id:
+            extra["trace_id"] = trace_id
         kwargs["extra"] = extra
         super().log(level, msg, **kwargs)
     
@@ -68,6 +179,61 @@ class BotLogger(logging.Logger):
 logging.setLoggerClass(BotLogger)
 
 _loggers: dict[str, BotLogger] = {}
+_queue_handler: Optional[SamplingQueueHandler] = None
+_listener: Optional[BatchingQueueListener] = None
+
+
+def _create_handler() -> logging.Handler:
+    if _queue_handler is not None:
+        return _queue_handler
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JSONFormatter())
+    return handler
+
+
+def configure_logging(
+    async_mode: bool = True,
+    queue_size: int = 10000,
+    batch_size: int = 256,
+    sample_rates: Optional[dict[str, float]] = None
+) -> None:
+    global _queue_handler, _listener
+    
+    if not async_mode or _listener is not None:
+        return
+    
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    _queue_handler = SamplingQueueHandler(log_queue, sample_rates)
+    _listener = BatchingQueueListener(log_queue, _queue_handler, sys.stdout, batch_size)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    
+    for logger in _loggers.values():
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        logger.addHandler(_queue_handler)
+
+
+def shutdown_logging() -> None:
+    global _queue_handler, _listener
+    
+    if _listener is None:
+        return
+    
+    queue_handler = _queue_handler
+    _queue_handler = None
+    for logger in _loggers.values():
+        if queue_handler in logger.handlers:
+            logger.removeHandler(queue_handler)
+            logger.addHandler(_create_handler())
+    
+    _listener.stop()
+    _listener = None
+
+
+def get_dropped_count() -> int:
+    return _queue_handler.dropped if _queue_handler else 0
 
 
 def setup_logger(name: str = "bot", level: str = "INFO") -> BotLogger:
@@ -78,9 +244,7 @@ def setup_logger(name: str = "bot", level: str = "INFO") -> BotLogger:
     logger.setLevel(getattr(logging, level.upper(), logging.INFO))
     
     if not logger.handlers:
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setFormatter(JSONFormatter())
-        logger.addHandler(handler)
+        logger.addHandler(_create_handler())
     
     logger.propagate = False
     _loggers[name] = logger
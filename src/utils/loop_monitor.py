@@ -0,0 +1,146 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+from .logger import get_logger
+from .metrics import counter, gauge, histogram
+
+logger = get_logger("loop_monitor")
+
+LOOP_LAG_SECONDS = histogram(
+    "bot_event_loop_lag_seconds", "Event loop scheduling lag measured by the heartbeat task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_LAG_LAST = gauge(
+    "bot_event_loop_lag_last_seconds", "Most recent event loop scheduling lag"
+)
+SLOW_CALLBACKS = counter(
+    "bot_event_loop_slow_callbacks_total", "Callbacks that blocked the event loop longer than the threshold"
+)
+
+
+@dataclass
+class SlowCallback:
+    detected_at: float
+    duration: float
+    stack: list[str] = field(default_factory=list)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 0.25, slow_threshold: float = 0.1, history: int = 1200, max_events: int = 20):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self._lags: deque[float] = deque(maxlen=history)
+        self._events: deque[SlowCallback] = deque(maxlen=max_events)
+        self._slow_total = 0
+        self._pending: Optional[SlowCallback] = None
+        self._last_beat = time.monotonic()
+        self._thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+    
+    async def stop(self) -> None:
+        self._stop_event.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+    
+    async def _heartbeat(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._last_beat = time.monotonic()
+            
+            self._lags.append(lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            LOOP_LAG_LAST.set(lag)
+            
+            pending = self._pending
+            if pending is not None:
+                self._pending = None
+                pending.duration = max(pending.duration, lag)
+                logger.warning_ctx(
+                    "Slow callback blocked the event loop",
+                    action="loop_slow_callback",
+                    extra_data={
+                        "duration_ms": round(pending.duration * 1000, 1),
+                        "stack": pending.stack
+                    }
+                )
+    
+    def _watch(self) -> None:
+        poll = max(0.01, self.slow_threshold / 2)
+        captured_beat = None
+        while not self._stop_event.wait(poll):
+            last_beat = self._last_beat
+            stalled = time.monotonic() - last_beat - self.interval
+            if stalled < self.slow_threshold or captured_beat == last_beat:
+                continue
+            
+            captured_beat = last_beat
+            frame = sys._current_frames().get(self._thread_id)
+            event = SlowCallback(
+                detected_at=time.time(),
+                duration=stalled,
+                stack=self._format_stack(frame)
+            )
+            self._events.append(event)
+            self._slow_total += 1
+            SLOW_CALLBACKS.inc()
+            self._pending = event
+    
+    def _format_stack(self, frame, limit: int = 12) -> list[str]:
+        stack = []
+        while frame is not None and len(stack) < limit:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno}({code.co_name})")
+            frame = frame.f_back
+        return stack
+    
+    def snapshot(self) -> dict:
+        lags = list(self._lags)
+        last_event = self._events[-1] if self._events else None
+        return {
+            "running": self.running,
+            "samples": len(lags),
+            "lag_p50": _percentile(lags, 0.5),
+            "lag_p99": _percentile(lags, 0.99),
+            "lag_max": max(lags) if lags else 0.0,
+            "slow_callbacks": self._slow_total,
+            "last_slow_callback": last_event
+        }
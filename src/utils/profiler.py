@@ -0,0 +1,201 @@
+import asyncio
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+_INTERNAL_PATHS = (
+    os.path.join("asyncio", ""),
+    "selectors.py",
+    "threading.py",
+    "runpy.py",
+    "cProfile.py",
+)
+
+
+def _is_internal(filename: str, name: str) -> bool:
+    return name == "<module>" or any(part in filename for part in _INTERNAL_PATHS)
+
+
+def _label(filename: str, lineno: int, name: str) -> str:
+    return f"{os.path.basename(filename)}:{lineno}({name})"
+
+
+@dataclass
+class ProfileResult:
+    mode: str
+    seconds: float
+    path: str
+    samples: int = 0
+    idle_ratio: float = 0.0
+    overhead_ratio: float = 0.0
+    top: list[tuple[str, float, float]] = field(default_factory=list)
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, target_thread_id: int, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.samples = 0
+        self.idle_samples = 0
+        self.self_counts: Counter = Counter()
+        self.cumulative_counts: Counter = Counter()
+        self.folded: Counter = Counter()
+        self.cpu_seconds = 0.0
+        self._stop_event = threading.Event()
+    
+    def run(self) -> None:
+        cpu_start = time.thread_time()
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is None:
+                continue
+            
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            
+            self.samples += 1
+            self.folded[";".join(_label(*key) for key in reversed(stack))] += 1
+            
+            if stack[0][0].endswith("selectors.py"):
+                self.idle_samples += 1
+                continue
+            
+            self.self_counts[stack[0]] += 1
+            for key in set(stack):
+                self.cumulative_counts[key] += 1
+        self.cpu_seconds = time.thread_time() - cpu_start
+    
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class Profiler:
+    def __init__(self, output_dir: str, max_seconds: int = 60, interval: float = 0.005):
+        self.output_dir = output_dir
+        self.max_seconds = max_seconds
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._call_overhead: Optional[float] = None
+    
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+    
+    @property
+    def sampling_available(self) -> bool:
+        return hasattr(sys, "_current_frames")
+    
+    def _output_path(self, mode: str, extension: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        return os.path.join(self.output_dir, f"profile-{stamp}-{mode}.{extension}")
+    
+    async def run(self, seconds: float, mode: str = "sampling", limit: int = 15) -> ProfileResult:
+        seconds = max(1.0, min(float(seconds), float(self.max_seconds)))
+        if mode == "sampling" and not self.sampling_available:
+            mode = "cprofile"
+        
+        async with self._lock:
+            if mode == "cprofile":
+                return await self._run_cprofile(seconds, limit)
+            return await self._run_sampling(seconds, limit)
+    
+    async def _run_sampling(self, seconds: float, limit: int) -> ProfileResult:
+        sampler = _Sampler(threading.get_ident(), self.interval)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.to_thread(sampler.stop)
+        elapsed = time.perf_counter() - start
+        
+        path = self._output_path("sampling", "folded")
+        lines = [f"{stack} {count}" for stack, count in sampler.folded.most_common()]
+        await asyncio.to_thread(self._write_text, path, "\n".join(lines) + "\n")
+        
+        busy = max(1, sampler.samples - sampler.idle_samples)
+        top = [
+            (_label(*key), count / busy, sampler.self_counts[key] / busy)
+            for key, count in sampler.cumulative_counts.most_common()
+            if not _is_internal(key[0], key[2])
+        ][:limit]
+        
+        return ProfileResult(
+            mode="sampling",
+            seconds=elapsed,
+            path=path,
+            samples=sampler.samples,
+            idle_ratio=sampler.idle_samples / sampler.samples if sampler.samples else 0.0,
+            overhead_ratio=sampler.cpu_seconds / elapsed if elapsed else 0.0,
+            top=top
+        )
+    
+    async def _run_cprofile(self, seconds: float, limit: int) -> ProfileResult:
+        if self._call_overhead is None:
+            self._call_overhead = self._calibrate()
+        
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+        elapsed = time.perf_counter() - start
+        
+        path = self._output_path("cprofile", "prof")
+        await asyncio.to_thread(profile.dump_stats, path)
+        
+        stats = pstats.Stats(profile).stats
+        total_calls = sum(entry[1] for entry in stats.values())
+        ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+        top = [
+            (_label(*key), entry[3], entry[2])
+            for key, entry in ranked
+            if not _is_internal(key[0], key[2]) and not key[0].startswith("~")
+        ][:limit]
+        
+        return ProfileResult(
+            mode="cprofile",
+            seconds=elapsed,
+            path=path,
+            samples=total_calls,
+            overhead_ratio=total_calls * self._call_overhead / elapsed if elapsed else 0.0,
+            top=top
+        )
+    
+    def _calibrate(self, iterations: int = 20000) -> float:
+        def noop():
+            pass
+        
+        start = time.perf_counter()
+        for _ in range(iterations):
+            noop()
+        plain = time.perf_counter() - start
+        
+        profile = cProfile.Profile()
+        profile.enable()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            noop()
+        profiled = time.perf_counter() - start
+        profile.disable()
+        
+        return max(0.0, (profiled - plain) / iterations)
+    
+    def _write_text(self, path: str, content: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
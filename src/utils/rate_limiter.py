@@ -2,6 +2,15 @@ import asyncio
 from collections import defaultdict
 from datetime import datetime, timedelta
 from typing import Optional
+from .metrics import counter, histogram
+
+RATE_LIMIT_SECONDS = histogram(
+    "bot_rate_limit_check_seconds", "Rate limiter check latency in seconds",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+)
+RATE_LIMIT_REJECTIONS = counter(
+    "bot_rate_limit_rejections_total", "Requests rejected by the rate limiter", ("reason",)
+)
 
 
 class RateLimiter:
@@ -42,6 +51,13 @@ class RateLimiter:
             del self._cooldowns[uid]
     
     async def check_rate_limit(self, user_id: int, chat_id: int, is_group: bool = False) -> tuple[bool, Optional[int]]:
+        with RATE_LIMIT_SECONDS.time():
+            allowed, cooldown, reason = await self._check_rate_limit(user_id, chat_id, is_group)
+        if not allowed:
+            RATE_LIMIT_REJECTIONS.labels(reason).inc()
+        return allowed, cooldown
+    
+    async def _check_rate_limit(self, user_id: int, chat_id: int, is_group: bool) -> tuple[bool, Optional[int], Optional[str]]:
         async with self._lock:
             now = datetime.now()
             
@@ -50,7 +66,7 @@ class RateLimiter:
             if user_id in self._cooldowns:
                 if now < self._cooldowns[user_id]:
                     remaining = (self._cooldowns[user_id] - now).seconds
-                    return False, remaining
+                    return False, remaining, "cooldown"
                 else:
                     del self._cooldowns[user_id]
             
@@ -61,7 +77,7 @@ class RateLimiter:
             if len(self._user_requests[user_id]) >= self.user_limit:
                 cooldown_time = 30
                 self._cooldowns[user_id] = now + timedelta(seconds=cooldown_time)
-                return False, cooldown_time
+                return False, cooldown_time, "user"
             
             if is_group:
                 self._group_requests[chat_id] = await self._cleanup_old_requests(
@@ -69,12 +85,12 @@ class RateLimiter:
                 )
                 
                 if len(self._group_requests[chat_id]) >= self.group_limit:
-                    return False, 10
+                    return False, 10, "group"
                 
                 self._group_requests[chat_id].append(now)
             
             self._user_requests[user_id].append(now)
-            return True, None
+            return True, None, None
     
     async def get_user_usage(self, user_id: int) -> dict:
         async with self._lock:
@@ -0,0 +1,225 @@
+import asyncio
+import contextvars
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional
+from telegram.constants import ChatAction
+from telegram.error import RetryAfter
+from .logger import get_logger
+from .metrics import counter, histogram
+
+logger = get_logger("send_scheduler")
+
+TELEGRAM_SEND_SECONDS = histogram(
+    "bot_telegram_send_seconds", "Telegram Bot API send latency in seconds", ("method",)
+)
+SEND_QUEUE_SECONDS = histogram(
+    "bot_send_queue_seconds", "Time an outbound message waited for its chat and global send budget", ("scope",)
+)
+SEND_RETRY_AFTER = counter(
+    "bot_send_retry_after_total", "RetryAfter flood-control responses from Telegram", ("scope",)
+)
+TYPING_COLLAPSED = counter(
+    "bot_typing_collapsed_total", "Typing actions skipped because one is already showing or the chat is busy"
+)
+SEND_DROPPED = counter(
+    "bot_send_dropped_total", "Outbound messages dropped instead of delivered", ("reason",)
+)
+SEND_QUEUE_DEPTH = histogram(
+    "bot_send_queue_depth", "Messages already waiting in a chat's send queue when a new one was added",
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100)
+)
+
+TYPING_SECONDS = 5.0
+IDLE_CHAT_SECONDS = 600.0
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+    
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+    
+    async def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+@dataclass
+class ChatState:
+    bucket: TokenBucket
+    queue: deque = field(default_factory=deque)
+    worker: Optional[asyncio.Task] = None
+    blocked_until: float = 0.0
+    typing_until: float = 0.0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class SendScheduler:
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        group_rate_per_minute: float = 20.0,
+        private_rate: float = 1.0,
+        chat_burst: int = 3,
+        max_retries: int = 3,
+        max_chats: int = 10000,
+        max_queue: int = 100
+    ):
+        self.group_rate = group_rate_per_minute / 60
+        self.private_rate = private_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self.max_queue = max_queue
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: dict[int, ChatState] = {}
+    
+    def reply(self, message, text: str, **kwargs) -> asyncio.Future:
+        return self.send(
+            message.chat.id,
+            message.chat.type in ("group", "supergroup"),
+            "reply_text",
+            lambda: message.reply_text(text, **kwargs)
+        )
+    
+    def send(self, chat_id: int, is_group: bool, method: str, call: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        chat = self._chat(chat_id, is_group)
+        future = asyncio.get_running_loop().create_future()
+        SEND_QUEUE_DEPTH.observe(len(chat.queue))
+        if len(chat.queue) >= self.max_queue:
+            SEND_DROPPED.labels("queue_full").inc()
+            logger.error_ctx(
+                "Send queue full, message dropped",
+                chat_id=chat_id,
+                action="send_dropped",
+                extra_data={"method": method, "reason": "queue_full", "queued": len(chat.queue)}
+            )
+            future.set_result(None)
+            return future
+        
+        chat.queue.append((method, call, future, time.monotonic()))
+        chat.last_used = time.monotonic()
+        if chat.worker is None:
+            chat.worker = asyncio.create_task(self._drain(chat_id, chat, is_group), context=contextvars.Context())
+        return future
+    
+    async def flush(self, chat_id: Optional[int] = None, timeout: Optional[float] = None) -> None:
+        chats = [self._chats.get(chat_id)] if chat_id is not None else list(self._chats.values())
+        workers = [chat.worker for chat in chats if chat is not None and chat.worker is not None]
+        if workers:
+            await asyncio.wait(workers, timeout=timeout)
+    
+    async def _drain(self, chat_id: int, chat: ChatState, is_group: bool) -> None:
+        try:
+            while chat.queue:
+                method, call, future, queued = chat.queue.popleft()
+                result = None
+                try:
+                    result = await self._deliver(chat_id, chat, is_group, method, call, queued)
+                except RetryAfter as e:
+                    SEND_DROPPED.labels("flood").inc()
+                    logger.error_ctx(
+                        "Flood control persisted, message dropped",
+                        chat_id=chat_id,
+                        action="send_dropped",
+                        extra_data={"method": method, "reason": "flood", "retry_after": str(e.retry_after)}
+                    )
+                except Exception as e:
+                    SEND_DROPPED.labels("error").inc()
+                    logger.error_ctx(
+                        f"Send failed: {str(e)}",
+                        chat_id=chat_id,
+                        action="send_error",
+                        extra_data={"method": method}
+                    )
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            chat.worker = None
+    
+    async def _deliver(
+        self, chat_id: int, chat: ChatState, is_group: bool, method: str, call: Callable[[], Awaitable[Any]], queued: float
+    ) -> Any:
+        for attempt in range(self.max_retries + 1):
+            blocked = chat.blocked_until - time.monotonic()
+            if blocked > 0:
+                await asyncio.sleep(blocked)
+            await chat.bucket.acquire()
+            SEND_QUEUE_SECONDS.labels("chat").observe(time.monotonic() - queued)
+            
+            global_queued = time.monotonic()
+            await self._global.acquire()
+            SEND_QUEUE_SECONDS.labels("global").observe(time.monotonic() - global_queued)
+            
+            try:
+                with TELEGRAM_SEND_SECONDS.labels(method).time():
+                    result = await call()
+            except RetryAfter as e:
+                self._pause(chat_id, chat, is_group, e, method, attempt + 1)
+                if attempt == self.max_retries:
+                    raise
+                queued = time.monotonic()
+                continue
+            
+            chat.typing_until = 0.0
+            chat.last_used = time.monotonic()
+            return result
+    
+    async def typing(self, bot, chat_id: int, is_group: bool) -> None:
+        chat = self._chat(chat_id, is_group)
+        now = time.monotonic()
+        if now < chat.typing_until or now < chat.blocked_until or chat.worker is not None:
+            TYPING_COLLAPSED.inc()
+            return
+        
+        chat.typing_until = now + TYPING_SECONDS
+        chat.last_used = now
+        try:
+            with TELEGRAM_SEND_SECONDS.labels("send_chat_action").time():
+                await bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+        except RetryAfter as e:
+            self._pause(chat_id, chat, is_group, e, "send_chat_action", 1)
+    
+    def _pause(self, chat_id: int, chat: ChatState, is_group: bool, error: RetryAfter, method: str, attempt: int) -> None:
+        retry_after = error.retry_after
+        seconds = retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+        chat.blocked_until = time.monotonic() + seconds
+        SEND_RETRY_AFTER.labels("group" if is_group else "private").inc()
+        logger.warning_ctx(
+            f"Telegram flood control, chat paused for {seconds}s",
+            chat_id=chat_id,
+            action="send_retry_after",
+            extra_data={"method": method, "attempt": attempt, "retry_after": seconds}
+        )
+    
+    def _chat(self, chat_id: int, is_group: bool) -> ChatState:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if len(self._chats) >= self.max_chats:
+                self._prune()
+            rate = self.group_rate if is_group else self.private_rate
+            chat = ChatState(TokenBucket(rate, self.chat_burst))
+            self._chats[chat_id] = chat
+        return chat
+    
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - IDLE_CHAT_SECONDS
+        for chat_id, chat in list(self._chats.items()):
+            if chat.last_used < cutoff and chat.worker is None and chat.blocked_until < cutoff:
+                del self._chats[chat_id]
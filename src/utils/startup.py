@@ -0,0 +1,76 @@
+import time
+from typing import Awaitable, Optional, TypeVar
+from .logger import get_logger
+from .metrics import gauge
+
+logger = get_logger("startup")
+
+COLD_START_SECONDS = gauge(
+    "bot_cold_start_seconds", "Seconds from process start until the bot reported ready"
+)
+WARM_UP_SECONDS = gauge(
+    "bot_warm_up_seconds", "Duration of each startup warm-up step in seconds", ("step",)
+)
+FIRST_REPLY_SECONDS = gauge(
+    "bot_first_reply_seconds", "Latency of the first answered message after startup in seconds"
+)
+READY = gauge(
+    "bot_ready", "1 once warm-up finished and the bot is polling for updates"
+)
+
+T = TypeVar("T")
+
+
+class StartupTracker:
+    def __init__(self, started: float):
+        self.started = started
+        self.steps: dict[str, float] = {}
+        self.ready_at: Optional[float] = None
+        self.first_reply: Optional[float] = None
+    
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+    
+    def mark(self, step: str, since: Optional[float] = None) -> None:
+        now = time.perf_counter()
+        self.steps[step] = now - (since if since is not None else self.started)
+    
+    async def step(self, name: str, awaitable: Awaitable[T]) -> T:
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.mark(name, start)
+            WARM_UP_SECONDS.labels(name).set(self.steps[name])
+    
+    def mark_ready(self) -> float:
+        self.ready_at = time.perf_counter()
+        cold_start = self.ready_at - self.started
+        COLD_START_SECONDS.set(cold_start)
+        READY.set(1)
+        logger.info_ctx(
+            "Bot ready",
+            action="bot_ready",
+            extra_data={
+                "cold_start": round(cold_start, 3),
+                "steps": {name: round(seconds, 3) for name, seconds in self.steps.items()}
+            }
+        )
+        return cold_start
+    
+    def record_reply(self, seconds: float, user_id: int, chat_id: int) -> None:
+        if self.first_reply is not None:
+            return
+        self.first_reply = seconds
+        FIRST_REPLY_SECONDS.set(seconds)
+        logger.info_ctx(
+            "First reply after startup",
+            user_id=user_id,
+            chat_id=chat_id,
+            action="first_reply",
+            extra_data={
+                "latency": round(seconds, 3),
+                "since_ready": round(time.perf_counter() - self.ready_at, 3) if self.ready_at else None
+            }
+        )
@@ -0,0 +1,134 @@
+import asyncio
+import math
+import time
+from typing import Optional
+
+MINUTE_SECONDS = 60
+DAY_SECONDS = 86400
+
+
+class TokenQuota:
+    def __init__(self, user_minute: int, user_day: int, group_minute: int, group_day: int):
+        self._limits: dict[str, tuple[int, int]] = {
+            "user": (user_minute, user_day),
+            "chat": (group_minute, group_day)
+        }
+        self._periods = (MINUTE_SECONDS, DAY_SECONDS)
+        self._buckets: dict[tuple[str, int], list[float]] = {}
+        self._dirty: set[tuple[str, int]] = set()
+        self._lock = asyncio.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return any(limit > 0 for limits in self._limits.values() for limit in limits)
+    
+    def _refill(self, scope: str, key_id: int, now: float) -> list[float]:
+        limits = self._limits[scope]
+        bucket = self._buckets.get((scope, key_id))
+        
+        if bucket is None:
+            bucket = [float(limits[0]), float(limits[1]), now]
+            self._buckets[(scope, key_id)] = bucket
+            return bucket
+        
+        elapsed = max(0.0, now - bucket[2])
+        for i, (limit, period) in enumerate(zip(limits, self._periods)):
+            if limit > 0:
+                bucket[i] = min(float(limit), bucket[i] + elapsed * limit / period)
+        bucket[2] = now
+        return bucket
+    
+    def _wait_seconds(self, scope: str, bucket: list[float], tokens: int) -> int:
+        wait = 0.0
+        for i, (limit, period) in enumerate(zip(self._limits[scope], self._periods)):
+            if limit <= 0:
+                continue
+            needed = min(tokens, limit)
+            if bucket[i] < needed:
+                wait = max(wait, (needed - bucket[i]) * period / limit)
+        return math.ceil(wait)
+    
+    def _scopes(self, user_id: int, chat_id: int, is_group: bool) -> list[tuple[str, int]]:
+        scopes = [("user", user_id)]
+        if is_group:
+            scopes.append(("chat", chat_id))
+        return scopes
+    
+    async def check_quota(self, user_id: int, chat_id: int, is_group: bool, estimated_tokens: int) -> tuple[bool, Optional[int]]:
+        if not self.enabled:
+            return True, None
+        
+        async with self._lock:
+            now = time.time()
+            wait = 0
+            for scope, key_id in self._scopes(user_id, chat_id, is_group):
+                bucket = self._refill(scope, key_id, now)
+                wait = max(wait, self._wait_seconds(scope, bucket, estimated_tokens))
+            
+            if wait > 0:
+                return False, wait
+            
+            for scope, key_id in self._scopes(user_id, chat_id, is_group):
+                self._take(scope, key_id, now, estimated_tokens)
+            return True, None
+    
+    async def charge(self, user_id: int, chat_id: int, is_group: bool, tokens: int, reserved: int = 0) -> None:
+        if not self.enabled or tokens == reserved:
+            return
+        
+        async with self._lock:
+            now = time.time()
+            for scope, key_id in self._scopes(user_id, chat_id, is_group):
+                self._take(scope, key_id, now, tokens - reserved)
+    
+    async def release(self, user_id: int, chat_id: int, is_group: bool, reserved: int) -> None:
+        await self.charge(user_id, chat_id, is_group, 0, reserved)
+    
+    def _take(self, scope: str, key_id: int, now: float, tokens: float) -> None:
+        bucket = self._refill(scope, key_id, now)
+        for i, limit in enumerate(self._limits[scope]):
+            if limit > 0:
+                bucket[i] = min(float(limit), max(-float(limit), bucket[i] - tokens))
+        self._dirty.add((scope, key_id))
+    
+    async def get_usage(self, scope: str, key_id: int) -> dict:
+        async with self._lock:
+            bucket = self._refill(scope, key_id, time.time())
+            minute_limit, day_limit = self._limits[scope]
+            return {
+                "minute_limit": minute_limit,
+                "minute_remaining": max(0, int(bucket[0])) if minute_limit > 0 else None,
+                "day_limit": day_limit,
+                "day_remaining": max(0, int(bucket[1])) if day_limit > 0 else None
+            }
+    
+    async def get_user_quota(self, user_id: int) -> dict:
+        return await self.get_usage("user", user_id)
+    
+    async def drain_dirty(self) -> list[tuple[str, int, float, float, float]]:
+        async with self._lock:
+            rows = [
+                (scope, key_id, *self._buckets[(scope, key_id)])
+                for scope, key_id in self._dirty
+                if (scope, key_id) in self._buckets
+            ]
+            self._dirty.clear()
+            self._prune_idle(time.time())
+            return rows
+    
+    async def restore(self, rows: list[tuple[str, int, float, float, float]]) -> None:
+        async with self._lock:
+            now = time.time()
+            for scope, key_id, minute_tokens, day_tokens, updated_at in rows:
+                if scope not in self._limits:
+                    continue
+                self._buckets[(scope, key_id)] = [minute_tokens, day_tokens, updated_at]
+                self._refill(scope, key_id, now)
+    
+    def _prune_idle(self, now: float) -> None:
+        idle = [
+            key for key, bucket in self._buckets.items()
+            if now - bucket[2] >= DAY_SECONDS and key not in self._dirty
+        ]
+        for key in idle:
+            del self._buckets[key]
@@ -0,0 +1,192 @@
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Iterator, Optional
+
+
+class Span:
+    __slots__ = ("name", "parent", "depth", "start", "end")
+    
+    def __init__(self, name: str, parent: Optional["Span"], start: float):
+        self.name = name
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 0
+        self.start = start
+        self.end: Optional[float] = None
+    
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+
+class Trace:
+    def __init__(self, name: str, **attrs):
+        self.trace_id = os.urandom(8).hex()
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.end: Optional[float] = None
+        self.spans: list[Span] = []
+    
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+    
+    def span_durations(self) -> dict[str, float]:
+        durations: dict[str, float] = {}
+        for item in self.spans:
+            durations[item.name] = durations.get(item.name, 0.0) + item.duration_ms
+        return durations
+    
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 2),
+            "attrs": self.attrs,
+            "spans": [
+                {
+                    "name": item.name,
+                    "parent": item.parent.name if item.parent else None,
+                    "depth": item.depth,
+                    "offset_ms": round((item.start - self.start) * 1000, 2),
+                    "duration_ms": round(item.duration_ms, 2)
+                }
+                for item in self.spans
+            ]
+        }
+
+
+class TraceBuffer:
+    def __init__(self, maxlen: int = 200):
+        self._traces: deque[Trace] = deque(maxlen=maxlen)
+    
+    @property
+    def maxlen(self) -> int:
+        return self._traces.maxlen
+    
+    def add(self, trace: Trace) -> None:
+        self._traces.append(trace)
+    
+    def slowest(self, n: int = 10) -> list[Trace]:
+        return sorted(self._traces, key=lambda t: t.duration_ms, reverse=True)[:n]
+    
+    def __iter__(self) -> Iterator[Trace]:
+        return iter(list(self._traces))
+    
+    def __len__(self) -> int:
+        return len(self._traces)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+trace_buffer = TraceBuffer()
+_listeners: list[Callable[[Trace], None]] = []
+
+
+def configure_tracing(buffer_size: int) -> None:
+    global trace_buffer
+    trace_buffer = TraceBuffer(buffer_size)
+
+
+def add_trace_listener(listener: Callable[[Trace], None]) -> None:
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def remove_trace_listener(listener: Callable[[Trace], None]) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def get_trace_buffer() -> TraceBuffer:
+    return trace_buffer
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def set_trace_attrs(**attrs) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+@contextmanager
+def span(name: str) -> Iterator[Optional[Span]]:
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    
+    item = Span(name, _current_span.get(), time.perf_counter())
+    trace.spans.append(item)
+    token = _current_span.set(item)
+    try:
+        yield item
+    finally:
+        item.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def _finish_trace(trace: Trace) -> None:
+    trace.end = time.perf_counter()
+    if not trace.spans:
+        return
+    
+    trace_buffer.add(trace)
+    
+    from .logger import get_logger
+    for listener in _listeners:
+        try:
+            listener(trace)
+        except Exception as e:
+            get_logger("tracing").error_ctx(
+                f"Trace listener failed: {str(e)}",
+                action="trace_listener_error"
+            )
+    
+    get_logger("tracing").info_ctx(
+        f"Request trace: {trace.name}",
+        user_id=trace.attrs.get("user_id"),
+        chat_id=trace.attrs.get("chat_id"),
+        action="trace_summary",
+        extra_data={
+            "duration_ms": round(trace.duration_ms, 2),
+            "spans": [
+                [item.name, item.depth, round(item.duration_ms, 2)]
+                for item in trace.spans
+            ]
+        }
+    )
+
+
+def traced(name: str) -> Callable:
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            trace = Trace(name)
+            trace_token = _current_trace.set(trace)
+            span_token = _current_span.set(None)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _finish_trace(trace)
+                _current_span.reset(span_token)
+                _current_trace.reset(trace_token)
+        return wrapper
+    return decorator
@@ -0,0 +1,125 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import random
+from datetime import datetime
+from typing import Iterator, Optional
+from .logger import get_logger
+from .metrics import counter
+from .tracing import Trace, add_trace_listener, remove_trace_listener
+
+logger = get_logger("traffic_recorder")
+
+RECORDED_TOTAL = counter(
+    "bot_traffic_recorded_total", "Requests written to the traffic recording"
+)
+
+UPSTREAM_SPANS = ("should_search", "extract_query", "web_search", "history", "llm", "typing", "reply")
+
+
+def read_recording(path: str) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class TrafficRecorder:
+    def __init__(
+        self,
+        output_dir: str,
+        salt: str = "",
+        sample_rate: float = 1.0,
+        trace_name: str = "message",
+        max_pending: int = 10000
+    ):
+        self.output_dir = output_dir
+        self.salt = (salt or os.urandom(16).hex()).encode("utf-8")
+        self.sample_rate = sample_rate
+        self.trace_name = trace_name
+        self.max_pending = max_pending
+        self.path: Optional[str] = None
+        self.recorded = 0
+        self.dropped = 0
+        self._pending: list[str] = []
+        self._lock = asyncio.Lock()
+    
+    @property
+    def active(self) -> bool:
+        return self.path is not None
+    
+    def start(self) -> str:
+        if self.path is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            self.path = os.path.join(self.output_dir, f"traffic-{stamp}.jsonl.gz")
+            add_trace_listener(self.record)
+            logger.info_ctx(
+                "Traffic recording started",
+                action="traffic_record_start",
+                extra_data={"path": self.path, "sample_rate": self.sample_rate}
+            )
+        return self.path
+    
+    async def stop(self) -> None:
+        if self.path is None:
+            return
+        remove_trace_listener(self.record)
+        await self.flush()
+        logger.info_ctx(
+            "Traffic recording stopped",
+            action="traffic_record_stop",
+            extra_data={"path": self.path, "recorded": self.recorded, "dropped": self.dropped}
+        )
+        self.path = None
+    
+    def _hash(self, value) -> Optional[str]:
+        if value is None:
+            return None
+        return hashlib.blake2b(str(value).encode("utf-8"), key=self.salt[:64], digest_size=8).hexdigest()
+    
+    def to_record(self, trace: Trace) -> dict:
+        attrs = trace.attrs
+        durations = trace.span_durations()
+        return {
+            "ts": round(trace.started_at, 3),
+            "user": self._hash(attrs.get("user_id")),
+            "chat": self._hash(attrs.get("chat_id")),
+            "chat_type": attrs.get("chat_type"),
+            "is_reply": bool(attrs.get("is_reply")),
+            "length": attrs.get("message_length", 0),
+            "searched": bool(attrs.get("searched")),
+            "tokens": attrs.get("tokens", 0),
+            "completed": "reply" in durations,
+            "duration_ms": round(trace.duration_ms, 2),
+            "upstream_ms": {
+                name: round(durations[name], 2)
+                for name in UPSTREAM_SPANS if name in durations
+            }
+        }
+    
+    def record(self, trace: Trace) -> None:
+        if trace.name != self.trace_name or "user_id" not in trace.attrs:
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append(json.dumps(self.to_record(trace), separators=(",", ":")))
+        self.recorded += 1
+        RECORDED_TOTAL.inc()
+    
+    async def flush(self, context=None) -> None:
+        if not self._pending or self.path is None:
+            return
+        async with self._lock:
+            lines, self._pending = self._pending, []
+            await asyncio.to_thread(self._append, self.path, lines)
+    
+    def _append(self, path: str, lines: list[str]) -> None:
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
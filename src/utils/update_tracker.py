@@ -0,0 +1,59 @@
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+from .metrics import counter
+
+DUPLICATE_UPDATES = counter(
+    "bot_duplicate_updates_total", "Redelivered updates dropped before any work"
+)
+STALE_UPDATES = counter(
+    "bot_stale_updates_total", "Backlog updates older than the configured age", ("action",)
+)
+
+REDELIVERY_SECONDS = 86400
+
+
+class UpdateTracker:
+    def __init__(self, window: int = 1000, stale_seconds: int = 0, stale_notify: bool = False):
+        self.window = window
+        self.stale_seconds = stale_seconds
+        self.stale_notify = stale_notify
+        self._seen: set[int] = set()
+        self._high_water = 0
+        self._high_water_at = 0.0
+    
+    def load(self, updates: Iterable[tuple[int, int]]) -> None:
+        for update_id, processed_at in updates:
+            self._seen.add(update_id)
+            if update_id > self._high_water:
+                self._high_water = update_id
+                self._high_water_at = processed_at
+    
+    def claim(self, update_id: int) -> bool:
+        if self._is_duplicate(update_id):
+            DUPLICATE_UPDATES.inc()
+            return False
+        
+        self._seen.add(update_id)
+        if update_id > self._high_water:
+            self._high_water = update_id
+            self._high_water_at = time.time()
+        if len(self._seen) > self.window * 2:
+            floor = self._high_water - self.window
+            self._seen = {seen for seen in self._seen if seen >= floor}
+        return True
+    
+    def is_stale(self, sent_at: Optional[datetime]) -> bool:
+        if not self.stale_seconds or sent_at is None:
+            return False
+        age = (datetime.now(timezone.utc) - sent_at).total_seconds()
+        if age <= self.stale_seconds:
+            return False
+        STALE_UPDATES.labels("notify" if self.stale_notify else "skip").inc()
+        return True
+    
+    def _is_duplicate(self, update_id: int) -> bool:
+        if update_id in self._seen:
+            return True
+        recent = time.time() - self._high_water_at < REDELIVERY_SECONDS
+        return recent and update_id < self._high_water - self.window
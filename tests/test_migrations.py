@@ -0,0 +1,111 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import aiosqlite
+
+from src.database import Database
+from src.database.migrations import migrate
+
+START = datetime(2024, 5, 1, 12, 0)
+
+
+async def legacy_database(path: str, users: int, messages: int) -> None:
+    connection = await aiosqlite.connect(path)
+    await migrate(connection, target=1)
+    await connection.executemany(
+        "INSERT INTO users (user_id, username, first_name, last_name, created_at, updated_at) VALUES (?, ?, ?, '', ?, ?)",
+        [(user_id, f"user{user_id}", "Ad", START.isoformat(), START.isoformat()) for user_id in range(1, users + 1)]
+    )
+    await connection.executemany(
+        "INSERT INTO stats (user_id, total_messages, last_active) VALUES (?, 0, ?)",
+        [(user_id, START.isoformat()) for user_id in range(1, users + 1)]
+    )
+    await connection.executemany(
+        "INSERT INTO messages (user_id, chat_id, role, content, created_at) VALUES (?, ?, 'user', ?, ?)",
+        [
+            (i % users + 1, -100, f"eski mesaj {i}", (START + timedelta(minutes=i)).isoformat())
+            for i in range(messages)
+        ]
+    )
+    await connection.commit()
+    await connection.close()
+
+
+async def column_types(database: Database, table: str, column: str) -> set[str]:
+    cursor = await database._connection.execute(f"SELECT DISTINCT typeof({column}) FROM {table}")
+    return {row[0] for row in await cursor.fetchall()}
+
+
+def test_small_database_is_rebuilt_at_startup(tmp_path):
+    path = os.path.join(tmp_path, "bot.db")
+    
+    async def scenario():
+        await legacy_database(path, users=3, messages=10)
+        database = Database(path, migration_batch_size=100)
+        await database.connect()
+        try:
+            assert not database.legacy_timestamps
+            assert await column_types(database, "messages", "created_at") == {"integer"}
+            assert await column_types(database, "users", "updated_at") == {"integer"}
+            assert (await database.get_user_stats(1)).last_active == START
+        finally:
+            await database.close()
+    
+    asyncio.run(scenario())
+
+
+def test_large_database_is_rebuilt_online(tmp_path):
+    path = os.path.join(tmp_path, "bot.db")
+    
+    async def scenario():
+        await legacy_database(path, users=5, messages=50)
+        database = Database(path, migration_batch_size=8)
+        await database.connect()
+        try:
+            assert database.legacy_timestamps
+            assert (await database.get_user_by_username("user2")).created_at == START
+            assert (await database.get_user_stats(2)).last_active == START
+            
+            await database.add_exchange(user_id=1, chat_id=-100, user_message="yeni soru", response="yeni cevap")
+            await database.update_stats(user_id=3, messages=1)
+            await database.clear_conversation(user_id=5, chat_id=-100)
+            
+            expired = await database.fetch_expired_messages(START + timedelta(minutes=5), limit=100)
+            assert [row["created_at"] for row in expired] == [
+                int((START + timedelta(minutes=i)).timestamp()) for i in range(5) if i % 5 != 4
+            ]
+            rows, _ = await database.search_messages("yeni", limit=5)
+            assert all(isinstance(row["created_at"], int) for row in rows)
+            
+            steps = 0
+            while database.legacy_timestamps:
+                await database.continue_migrations(8)
+                steps += 1
+            assert steps > 1
+            
+            assert await column_types(database, "messages", "created_at") == {"integer"}
+            assert await column_types(database, "stats", "last_active") == {"integer"}
+            cursor = await database._connection.execute("SELECT COUNT(*) FROM messages")
+            assert (await cursor.fetchone())[0] == 50 - 10 + 2
+            assert (await database.get_user_stats(3)).total_messages == 1
+            assert (await database.get_user_stats(3)).last_active > START
+            
+            cursor = await database._connection.execute(
+                "SELECT name FROM sqlite_master WHERE name GLOB '*_new' OR name GLOB 'trg_*_rebuild_*'"
+            )
+            assert await cursor.fetchall() == []
+            cursor = await database._connection.execute("SELECT name FROM sqlite_master WHERE tbl_name = 'messages'")
+            names = {row[0] for row in await cursor.fetchall()}
+            assert {"idx_messages_conversation", "idx_messages_created", "trg_messages_fts_insert"} <= names
+            
+            await database.add_exchange(user_id=1, chat_id=-100, user_message="son soru", response="son cevap")
+            cursor = await database._connection.execute("SELECT MIN(id), MAX(id) FROM messages WHERE content GLOB 'son *'")
+            first, last = await cursor.fetchone()
+            assert first == 53 and last == 54
+            rows, _ = await database.search_messages("son", limit=5)
+            assert len(rows) == 2
+        finally:
+            await database.close()
+    
+    asyncio.run(scenario())
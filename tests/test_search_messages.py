@@ -0,0 +1,97 @@
+import asyncio
+import os
+
+from src.database import Database
+
+
+async def seed(database: Database, chats: list[int], per_chat: int) -> None:
+    for chat_id in chats:
+        for i in range(per_chat):
+            await database.add_exchange(
+                user_id=abs(chat_id) % 7,
+                chat_id=chat_id,
+                user_message=f"kedi mama {chat_id} {i}",
+                response=f"köpek {chat_id} {i}"
+            )
+
+
+async def collect(database: Database, query: str, limit: int, **filters) -> list[list[dict]]:
+    pages = []
+    after = None
+    while True:
+        rows, after = await database.search_messages(query, limit=limit, after=after, **filters)
+        pages.append(rows)
+        if after is None:
+            return pages
+
+
+def ids(pages: list[list[dict]]) -> list[int]:
+    return [row["id"] for page in pages for row in page]
+
+
+def test_pages_cover_every_match_once():
+    async def scenario():
+        database = Database(":memory:")
+        await database.connect()
+        try:
+            await seed(database, [1, 2, 3], 5)
+            pages = await collect(database, "kedi", limit=4)
+            assert [len(page) for page in pages] == [4, 4, 4, 3]
+            assert len(set(ids(pages))) == 15
+            
+            keys = [(row["score"], row["id"]) for page in pages for row in page]
+            assert keys == sorted(keys)
+            
+            everything, after = await database.search_messages("kedi", limit=100)
+            assert after is None
+            assert [row["id"] for row in everything] == ids(pages)
+        finally:
+            await database.close()
+    
+    asyncio.run(scenario())
+
+
+def test_exact_page_boundary_has_no_cursor():
+    async def scenario():
+        database = Database(":memory:")
+        await database.connect()
+        try:
+            await seed(database, [1], 4)
+            rows, after = await database.search_messages("kedi", limit=4)
+            assert len(rows) == 4
+            assert after is None
+            
+            assert await database.search_messages("???", limit=4) == ([], None)
+        finally:
+            await database.close()
+    
+    asyncio.run(scenario())
+
+
+def test_pages_merge_across_shards(tmp_path):
+    async def scenario():
+        database = Database(os.path.join(tmp_path, "bot.db"), shards=4)
+        await database.connect()
+        try:
+            chats = [-100 - i for i in range(12)]
+            assert len({database._shard_index(chat_id) for chat_id in chats}) > 1
+            await seed(database, chats, 3)
+            
+            pages = await collect(database, "kedi", limit=5)
+            assert all(len(page) == 5 for page in pages[:-1])
+            found = ids(pages)
+            assert len(found) == len(set(found)) == 36
+            
+            keys = [(row["score"], row["id"]) for page in pages for row in page]
+            assert keys == sorted(keys)
+            
+            for row in (row for page in pages for row in page):
+                assert row["id"] % database.shard_count == database._shard_index(row["chat_id"])
+            
+            chat_pages = await collect(database, "kedi", limit=2, chat_id=chats[0])
+            assert {row["chat_id"] for page in chat_pages for row in page} == {chats[0]}
+            assert len(ids(chat_pages)) == 3
+        finally:
+            await database.close()
+    
+    asyncio.run(scenario())
@@ -0,0 +1,94 @@
+import asyncio
+import os
+
+import pytest
+
+from src.database import Database
+
+
+async def count(connection, table: str = "messages") -> int:
+    cursor = await connection.execute(f"SELECT COUNT(*) FROM {table}")
+    return (await cursor.fetchone())[0]
+
+
+def test_shard_index_is_stable():
+    database = Database("unused.db", shards=4)
+    chats = [1, -1, 42, -1001234567890, 2**40]
+    first = [database._shard_index(chat_id) for chat_id in chats]
+    assert first == [database._shard_index(chat_id) for chat_id in chats]
+    assert all(0 <= index < 4 for index in first)
+    assert Database("unused.db")._shard_index(-1001234567890) == 0
+
+
+@pytest.mark.parametrize("shards", [1, 3, 8])
+def test_global_id_round_trip(shards):
+    database = Database("unused.db", shards=shards)
+    seen = set()
+    for index in range(shards):
+        for local_id in (1, 2, 1000, 2**31):
+            global_id = database._global_id(index, local_id)
+            assert global_id == local_id * shards + index
+            assert divmod(global_id, shards) == (local_id, index)
+            seen.add(global_id)
+    assert len(seen) == shards * 4
+
+
+def test_central_messages_move_once(tmp_path):
+    path = os.path.join(tmp_path, "bot.db")
+    chats = [-100 - i for i in range(10)]
+    
+    async def scenario():
+        database = Database(path)
+        await database.connect()
+        for chat_id in chats:
+            await database.add_exchange(user_id=1, chat_id=chat_id, user_message="soru", response="cevap")
+        cursor = await database._connection.execute("SELECT * FROM messages ORDER BY id")
+        original = [tuple(row) for row in await cursor.fetchall()]
+        await database.close()
+        
+        database = Database(path, shards=4, migration_batch_size=3)
+        await database.connect()
+        try:
+            assert await count(database._connection) == 0
+            assert sum([await count(shard) for shard in database._shards]) == 20
+            
+            for row in original:
+                shard = database._shards[database._shard_index(row[2])]
+                cursor = await shard.execute("SELECT * FROM messages WHERE id = ?", (row[0],))
+                assert tuple(await cursor.fetchone()) == row
+            
+            await database._connection.executemany(
+                """INSERT INTO messages
+                   (id, user_id, chat_id, role, content, tokens_used, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                original[:7]
+            )
+            await database._connection.commit()
+            await database._move_central_messages()
+            assert await count(database._connection) == 0
+            assert sum([await count(shard) for shard in database._shards]) == 20
+        finally:
+            await database.close()
+    
+    asyncio.run(scenario())
+
+
+def test_changed_shard_count_is_refused(tmp_path):
+    path = os.path.join(tmp_path, "bot.db")
+    
+    async def scenario():
+        database = Database(path, shards=4)
+        await database.connect()
+        await database.close()
+        
+        for shards in (1, 2, 8):
+            database = Database(path, shards=shards)
+            with pytest.raises(RuntimeError, match="changing DATABASE_SHARDS"):
+                await database.connect()
+            assert database._shards == []
+        
+        database = Database(path, shards=4)
+        await database.connect()
+        assert len(database._shards) == 4
+        await database.close()
+    
+    asyncio.run(scenario())
@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+from src.database import Database
+from src.utils import token_quota
+from src.utils.token_quota import DAY_SECONDS, TokenQuota
+
+
+@pytest.fixture
+def quota(clock, monkeypatch) -> TokenQuota:
+    monkeypatch.setattr(token_quota, "time", clock)
+    return TokenQuota(user_minute=1000, user_day=5000, group_minute=3000, group_day=0)
+
+
+def test_check_reserves_estimate(quota):
+    async def scenario():
+        assert await quota.check_quota(1, 10, False, 400) == (True, None)
+        assert await quota.check_quota(1, 10, False, 400) == (True, None)
+        allowed, wait = await quota.check_quota(1, 10, False, 400)
+        assert not allowed
+        assert wait == 12
+        
+        usage = await quota.get_user_quota(1)
+        assert usage["minute_remaining"] == 200
+        assert usage["day_remaining"] == 4200
+    
+    asyncio.run(scenario())
+
+
+def test_charge_settles_reservation(quota):
+    async def scenario():
+        await quota.check_quota(1, 10, False, 400)
+        await quota.charge(1, 10, False, tokens=100, reserved=400)
+        assert (await quota.get_user_quota(1))["minute_remaining"] == 900
+        
+        await quota.check_quota(1, 10, False, 100)
+        await quota.charge(1, 10, False, tokens=600, reserved=100)
+        assert (await quota.get_user_quota(1))["minute_remaining"] == 300
+    
+    asyncio.run(scenario())
+
+
+def test_release_refunds_reservation(quota):
+    async def scenario():
+        await quota.check_quota(1, 10, False, 700)
+        await quota.release(1, 10, False, 700)
+        usage = await quota.get_user_quota(1)
+        assert usage["minute_remaining"] == 1000
+        assert usage["day_remaining"] == 5000
+    
+    asyncio.run(scenario())
+
+
+def test_group_scope_shared_across_users(quota):
+    async def scenario():
+        for user_id in (1, 2, 3):
+            assert (await quota.check_quota(user_id, -10, True, 900))[0]
+        allowed, wait = await quota.check_quota(4, -10, True, 900)
+        assert not allowed
+        assert wait == 12
+        assert (await quota.check_quota(4, 20, False, 900))[0]
+    
+    asyncio.run(scenario())
+
+
+def test_negative_balance_refills(quota, clock):
+    async def scenario():
+        await quota.charge(1, 10, False, tokens=2500)
+        usage = await quota.get_user_quota(1)
+        assert usage["minute_remaining"] == 0
+        assert usage["day_remaining"] == 2500
+        
+        allowed, wait = await quota.check_quota(1, 10, False, 100)
+        assert not allowed
+        assert wait == 66
+        
+        clock.advance(wait)
+        assert await quota.check_quota(1, 10, False, 100) == (True, None)
+    
+    asyncio.run(scenario())
+
+
+def test_charge_clamps_at_negative_limit(quota, clock):
+    async def scenario():
+        await quota.charge(1, 10, False, tokens=50_000)
+        clock.advance(120)
+        assert (await quota.get_user_quota(1))["minute_remaining"] == 1000
+    
+    asyncio.run(scenario())
+
+
+def test_disabled_quota_allows_everything(clock, monkeypatch):
+    monkeypatch.setattr(token_quota, "time", clock)
+    quota = TokenQuota(0, 0, 0, 0)
+    
+    async def scenario():
+        assert not quota.enabled
+        assert await quota.check_quota(1, 10, False, 10**9) == (True, None)
+        await quota.charge(1, 10, False, tokens=10**9)
+        assert await quota.drain_dirty() == []
+    
+    asyncio.run(scenario())
+
+
+def test_drain_dirty_prunes_idle_buckets(quota, clock):
+    async def scenario():
+        await quota.charge(1, 10, False, tokens=100)
+        rows = await quota.drain_dirty()
+        assert [(scope, key_id) for scope, key_id, *_ in rows] == [("user", 1)]
+        assert await quota.drain_dirty() == []
+        
+        clock.advance(DAY_SECONDS)
+        await quota.charge(2, 10, False, tokens=100)
+        quota._prune_idle(clock.time())
+        assert set(quota._buckets) == {("user", 2)}
+    
+    asyncio.run(scenario())
+
+
+def test_prune_keeps_dirty_buckets(quota, clock):
+    async def scenario():
+        await quota.charge(1, 10, False, tokens=100)
+        clock.advance(DAY_SECONDS * 2)
+        quota._prune_idle(clock.time())
+        assert ("user", 1) in quota._buckets
+    
+    asyncio.run(scenario())
+
+
+def test_buckets_survive_restart(quota, clock):
+    async def scenario():
+        database = Database(":memory:")
+        await database.connect()
+        try:
+            await quota.charge(1, 10, False, tokens=600)
+            await quota.charge(2, -10, True, tokens=1000)
+            await database.save_quota_buckets(await quota.drain_dirty())
+            await database.save_quota_buckets([("user", 3, 0.0, 0.0, clock.time() - DAY_SECONDS - 1)])
+            
+            rows = await database.load_quota_buckets()
+            assert {(scope, key_id) for scope, key_id, *_ in rows} == {("user", 1), ("user", 2), ("chat", -10)}
+            
+            restored = TokenQuota(user_minute=1000, user_day=5000, group_minute=3000, group_day=0)
+            await restored.restore(rows)
+            assert (await restored.get_user_quota(1))["day_remaining"] == 4400
+            assert (await restored.get_usage("chat", -10))["minute_remaining"] == 2000
+            assert (await restored.get_user_quota(3))["day_remaining"] == 5000
+        finally:
+            await database.close()
+    
+    asyncio.run(scenario())
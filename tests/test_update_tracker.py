@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.utils import update_tracker
+from src.utils.update_tracker import REDELIVERY_SECONDS, UpdateTracker
+
+
+@pytest.fixture(autouse=True)
+def fake_time(clock, monkeypatch):
+    monkeypatch.setattr(update_tracker, "time", clock)
+
+
+def test_duplicate_update_is_dropped():
+    tracker = UpdateTracker(window=10)
+    assert tracker.claim(100)
+    assert not tracker.claim(100)
+    assert tracker.claim(101)
+    assert tracker.claim(99)
+    assert not tracker.claim(99)
+
+
+def test_update_below_window_is_duplicate_while_recent(clock):
+    tracker = UpdateTracker(window=10)
+    assert tracker.claim(100)
+    assert not tracker.claim(89)
+    assert tracker.claim(90)
+    
+    clock.advance(REDELIVERY_SECONDS)
+    assert tracker.claim(50)
+
+
+def test_seen_set_is_trimmed_to_window():
+    tracker = UpdateTracker(window=10)
+    for update_id in range(1, 100):
+        assert tracker.claim(update_id)
+    assert len(tracker._seen) <= 20
+    assert not tracker.claim(95)
+    assert not tracker.claim(5)
+
+
+def test_load_restores_processed_updates(clock):
+    tracker = UpdateTracker(window=10)
+    tracker.load([(200, int(clock.time()) - 60), (205, int(clock.time()) - 30)])
+    assert not tracker.claim(200)
+    assert not tracker.claim(205)
+    assert not tracker.claim(190)
+    assert tracker.claim(206)
+
+
+def test_load_of_old_high_water_accepts_lower_ids(clock):
+    tracker = UpdateTracker(window=10)
+    tracker.load([(200, int(clock.time()) - REDELIVERY_SECONDS - 1)])
+    assert not tracker.claim(200)
+    assert tracker.claim(5)
+
+
+def test_stale_updates():
+    now = datetime.now(timezone.utc)
+    assert not UpdateTracker().is_stale(now - timedelta(days=1))
+    
+    tracker = UpdateTracker(stale_seconds=300)
+    assert not tracker.is_stale(None)
+    assert not tracker.is_stale(now - timedelta(seconds=60))
+    assert tracker.is_stale(now - timedelta(seconds=600))
+    assert not tracker.stale_notify